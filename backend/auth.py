@@ -4,25 +4,38 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from enum import Enum
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+import hashlib
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from starlette.concurrency import run_in_threadpool
 
 # Настройки для JWT
 SECRET_KEY = "your-secret-key-change-in-production"  # В продакшене использовать переменную окружения
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 дней
+# Сколько проверенных токенов держать в памяти
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
 
 # Настройки для хеширования паролей
 # Используем pbkdf2_sha256 как основную схему, так как она более надежна и не имеет проблем совместимости
 pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto")
+# Сколько паролей хешируется/проверяется одновременно (остальные ждут в очереди пула)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
 
-# Файл для хранения пользователей
-USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json")
+# Файл пользователей лежит в каталоге данных (HPV_DATA_DIR, по умолчанию — каталог backend)
+USERS_FILE = os.path.join(os.environ.get("HPV_DATA_DIR") or os.path.dirname(__file__), "users.json")
 
 # Безопасность для JWT токенов
 security = HTTPBearer()
+# Для потоков событий: EventSource в браузере не передаёт заголовки, токен приходит в ?token=
+optional_security = HTTPBearer(auto_error=False)
 
 # Роли пользователей
 class UserRole(str, Enum):
@@ -75,6 +88,42 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class PasswordWorkerPool:
+    """
+    Отдельный пул потоков для операций с паролями (pbkdf2 занимает десятки миллисекунд).
+    Вход пользователей не блокирует event loop и не занимает общий пул потоков.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+
+    async def run(self, func, *args):
+        with self._lock:
+            self._pending += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self._pending,
+            "queue_depth": max(0, self._pending - self.workers),
+            "peak_in_flight": self.peak_pending,
+            "completed": self.completed
+        }
+
+password_pool = PasswordWorkerPool(PASSWORD_HASH_WORKERS)
+
 # Функции для работы с JWT
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -86,12 +135,171 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class TokenCache:
+    """
+    LRU проверенных токенов: sha256 токена -> claims.
+    Запись живёт не дольше exp токена и удаляется при смене роли или статуса пользователя.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # digest -> (claims, exp)
+        self._by_user = {}  # username -> set(digest)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                claims, exp = entry
+                if exp is None or exp >= time.time():
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return claims
+                self._discard(digest)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict):
+        digest = self._digest(token)
+        exp = claims.get("exp")
+        with self._lock:
+            self._entries[digest] = (claims, exp if isinstance(exp, (int, float)) else None)
+            self._entries.move_to_end(digest)
+            username = claims.get("sub")
+            if username is not None:
+                self._by_user.setdefault(username, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def evict_user(self, username: str):
+        """Удалить все токены пользователя"""
+        with self._lock:
+            for digest in self._by_user.pop(username, ()):
+                self._entries.pop(digest, None)
+
+    def _discard(self, digest: bytes):
+        claims, _ = self._entries.pop(digest)
+        digests = self._by_user.get(claims.get("sub"))
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[claims.get("sub")]
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
 def decode_access_token(token: str) -> Optional[dict]:
+    claims = token_cache.get(token)
+    if claims is not None:
+        return dict(claims)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+    token_cache.put(token, dict(payload))
+    return payload
+
+# Справочник пользователей в памяти
+class UserRecord:
+    """Запись пользователя в справочнике (уже приведённая к типам модели User)"""
+    __slots__ = ("username", "email", "full_name", "hashed_password", "role", "is_active", "created_at")
+
+    def __init__(self, username: str, user_data: dict):
+        # Преобразуем role в UserRole enum если нужно
+        role = user_data.get("role", UserRole.USER)
+        if isinstance(role, str):
+            role = UserRole.USER if role == "user" else UserRole.ADMIN
+        self.username = user_data.get("username", username)
+        self.email = user_data.get("email")
+        self.full_name = user_data.get("full_name")
+        self.hashed_password = user_data.get("hashed_password", "")
+        self.role = role
+        self.is_active = user_data.get("is_active", True)
+        self.created_at = user_data.get("created_at")
+
+    def to_user(self) -> User:
+        # Значения уже проверены при загрузке, поэтому модель собирается без валидации
+        return User.model_construct(
+            username=self.username,
+            email=self.email,
+            full_name=self.full_name,
+            hashed_password=self.hashed_password,
+            role=self.role,
+            is_active=self.is_active,
+            created_at=self.created_at
+        )
+
+class UserDirectory:
+    """
+    Справочник пользователей: словарь по имени и индекс по email.
+    Обновляется из save_users() и при изменении users.json в обход API
+    (проверка mtime/size не чаще раза в STAT_INTERVAL секунд).
+    """
+    STAT_INTERVAL = 1.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._by_username = {}
+        self._by_email = {}
+        self._stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[UserRecord]:
+        self.check_file()
+        return self._by_username.get(username)
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        self.check_file()
+        return self._by_email.get(email)
+
+    def check_due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.STAT_INTERVAL
+
+    def check_file(self):
+        """Перечитать файл, если он изменился с последней загрузки"""
+        if not self.check_due():
+            return
+        self._checked_at = time.monotonic()
+        if self._file_stamp() != self._stamp:
+            self.reload()
+
+    def reload(self, users: Optional[dict] = None):
+        """Построить справочник заново (из переданного словаря или из файла)"""
+        with self._lock:
+            stamp = self._file_stamp()
+            if users is None:
+                users = load_users()
+            by_username = {}
+            by_email = {}
+            for username, user_data in users.items():
+                record = UserRecord(username, user_data)
+                by_username[username] = record
+                if record.email:
+                    by_email.setdefault(record.email, record)
+            self._by_username = by_username
+            self._by_email = by_email
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+user_directory = UserDirectory(USERS_FILE)
 
 # Функции для работы с файлом пользователей
 def load_users() -> dict:
@@ -108,29 +316,17 @@ def save_users(users: dict):
         os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
         with open(USERS_FILE, "w", encoding="utf-8") as f:
             json.dump(users, f, ensure_ascii=False, indent=2)
+        user_directory.reload(users)
     except Exception as e:
         print(f"Ошибка при сохранении пользователей: {e}")
         raise
 
 def get_user(username: str) -> Optional[User]:
     """Получить пользователя по имени"""
-    users = load_users()
-    user_data = users.get(username)
-    if user_data:
-        # Преобразуем role в UserRole enum если нужно
-        role = user_data.get("role", UserRole.USER)
-        if isinstance(role, str):
-            role = UserRole.USER if role == "user" else UserRole.ADMIN
-        return User(
-            username=user_data.get("username", username),
-            email=user_data.get("email"),
-            full_name=user_data.get("full_name"),
-            hashed_password=user_data.get("hashed_password", ""),
-            role=role,
-            is_active=user_data.get("is_active", True),
-            created_at=user_data.get("created_at")
-        )
-    return None
+    record = user_directory.get(username)
+    if record is None:
+        return None
+    return record.to_user()
 
 def create_user(user_data: UserCreate) -> User:
     """Создать нового пользователя"""
@@ -141,7 +337,8 @@ def create_user(user_data: UserCreate) -> User:
         if user_data.username in users:
             raise ValueError("Пользователь с таким именем уже существует")
         
-        # Проверяем email, если указан
+        # Проверяем email, если указан (по только что прочитанному файлу: справочник
+        # может ещё не видеть пользователя, созданного другим воркером)
         if user_data.email:
             for username, user in users.items():
                 if user.get("email") == user_data.email:
@@ -192,6 +389,11 @@ def update_user(user: User) -> User:
         raise ValueError("Пользователь не найден")
     
     user_data = users[user.username]
+    # Смена роли или блокировка должна сразу действовать на уже выданные токены
+    access_changed = (
+        user_data.get("role") != (user.role.value if isinstance(user.role, UserRole) else user.role)
+        or user_data.get("is_active", True) != user.is_active
+    )
     
     # Обновляем поля
     user_data["email"] = user.email
@@ -202,6 +404,8 @@ def update_user(user: User) -> User:
     
     users[user.username] = user_data
     save_users(users)
+    if access_changed:
+        token_cache.evict_user(user.username)
     
     # Возвращаем пользователя с правильным типом роли
     role = user_data.get("role", UserRole.USER)
@@ -221,6 +425,7 @@ def authenticate_user(username: str, password: str) -> Optional[User]:
     """Аутентифицировать пользователя"""
     try:
         print(f"[AUTH] Попытка входа для пользователя: {username}")
+        ensure_default_admin()
         user = get_user(username)
         if not user:
             print(f"[AUTH] Пользователь {username} не найден")
@@ -246,6 +451,18 @@ def authenticate_user(username: str, password: str) -> Optional[User]:
         traceback.print_exc()
         return None
 
+async def authenticate_user_async(username: str, password: str) -> Optional[User]:
+    """authenticate_user() в пуле операций с паролями"""
+    return await password_pool.run(authenticate_user, username, password)
+
+async def create_user_async(user_data: UserCreate) -> User:
+    """create_user() в пуле операций с паролями (хеширование и запись users.json)"""
+    return await password_pool.run(create_user, user_data)
+
+async def get_user_async(username: str) -> Optional[User]:
+    """get_user() в пуле потоков: справочник может перечитать изменённый users.json"""
+    return await run_in_threadpool(get_user, username)
+
 def init_default_admin():
     """Инициализировать администратора по умолчанию"""
     try:
@@ -295,6 +512,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="Недействительный токен",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        # Перечитывание изменённого users.json — в пуле потоков, а не в event loop
+        if user_directory.check_due():
+            await run_in_threadpool(user_directory.check_file)
         user = get_user(username)
         if user is None:
             print(f"[AUTH] Пользователь {username} не найден в базе")
@@ -326,6 +546,21 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         )
     return current_user
 
+async def get_current_stream_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> User:
+    """Активный пользователь по заголовку Authorization или параметру token (для SSE)"""
+    token = credentials.credentials if credentials else request.query_params.get("token")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Требуется авторизация",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user = await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+    return await get_current_active_user(user)
+
 async def get_current_active_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
     """Проверить, что текущий пользователь - активный администратор"""
     if current_user.role != UserRole.ADMIN:
@@ -335,10 +570,24 @@ async def get_current_active_admin_user(current_user: User = Depends(get_current
         )
     return current_user
 
-# Инициализация при импорте (с обработкой ошибок)
-try:
-    init_default_admin()
-except Exception as e:
-    print(f"[WARNING] Ошибка при инициализации администратора: {e}")
-    print(f"[INFO] Сервер продолжит работу, но администратор не был создан автоматически")
+# Администратор по умолчанию создаётся не при импорте (чтение users.json и хеширование пароля
+# задерживали запуск), а в фоне при старте сервера или при первой попытке входа
+_admin_bootstrap_lock = threading.Lock()
+_admin_bootstrapped = False
+
+
+def ensure_default_admin():
+    """Один раз за процесс проверить/создать администратора по умолчанию"""
+    global _admin_bootstrapped
+    if _admin_bootstrapped:
+        return
+    with _admin_bootstrap_lock:
+        if _admin_bootstrapped:
+            return
+        try:
+            init_default_admin()
+        except Exception as e:
+            print(f"[WARNING] Ошибка при инициализации администратора: {e}")
+            print(f"[INFO] Сервер продолжит работу, но администратор не был создан автоматически")
+        _admin_bootstrapped = True
 
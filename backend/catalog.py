@@ -0,0 +1,1690 @@
+"""
+Каталог тарифов: загрузка JSON файлов разделов, преобразование в формат планов
+и скомпилированный снимок каталога, который хранится в памяти процесса.
+
+Путь чтения (/api/plans) работает только со снимком и не читает файлы с диска.
+Снимок пересобирается после записи через API (write-through) и фоновым
+наблюдателем, который сравнивает mtime/size файлов данных (ручные правки,
+cleanup_pains.py). Записи других воркеров замечаются по общему счётчику
+версий (см. shared_version.py) на каждом запросе.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from functools import lru_cache
+from typing import Optional, List, Dict, Tuple
+
+try:
+    import brotli  # необязательная зависимость: pip install brotli
+except ImportError:
+    brotli = None
+
+# Каталог с JSON файлами разделов (HPV_DATA_DIR — вынести данные из каталога кода)
+DATA_DIR = os.path.abspath(os.environ.get("HPV_DATA_DIR") or os.path.dirname(os.path.abspath(__file__)))
+
+# Файлы в каталоге данных, которые не являются разделами
+NON_SECTION_FILES = {"users.json"}
+
+# Период фоновой проверки файлов данных (секунды)
+CATALOG_POLL_INTERVAL = float(os.environ.get("CATALOG_POLL_INTERVAL", "2"))
+
+# Пауза перед пересборкой по запросу хранилища: серия правок подряд собирается одной пересборкой (секунды)
+CATALOG_REFRESH_DEBOUNCE = float(os.environ.get("CATALOG_REFRESH_DEBOUNCE", "0.05"))
+
+# Сколько последних версий каталога хранится в журнале изменений (/api/plans/changes)
+CATALOG_CHANGES_LIMIT = int(os.environ.get("CATALOG_CHANGES_LIMIT", "256"))
+
+# Пока идёт пересборка после правки в другом воркере, отдавать запросам предыдущую версию,
+# а не ждать сборку (stale-while-revalidate). По умолчанию ждут: правка видна сразу
+CATALOG_STALE_WHILE_REVALIDATE = os.environ.get("CATALOG_STALE_WHILE_REVALIDATE", "").lower() in ("1", "true", "yes")
+
+# Общий снимок собранного каталога: публикуется после сборки, воркеры отображают его в память
+# (быстрый старт и одна копия готовых ответов на машину; пустое значение — не использовать)
+SNAPSHOT_FILE = os.environ.get("CATALOG_SNAPSHOT_FILE", os.path.join(DATA_DIR, ".catalog.snapshot"))
+
+# Степень сжатия готовых ответов (сжимаются один раз на версию каталога)
+GZIP_LEVEL = int(os.environ.get("CATALOG_GZIP_LEVEL", "9"))
+BROTLI_QUALITY = int(os.environ.get("CATALOG_BROTLI_QUALITY", "9"))
+# Ответы на выборки вне готовой таблицы сжимаются при запросе — быстрым уровнем
+FALLBACK_GZIP_LEVEL = int(os.environ.get("CATALOG_FALLBACK_GZIP_LEVEL", "5"))
+FALLBACK_BROTLI_QUALITY = int(os.environ.get("CATALOG_FALLBACK_BROTLI_QUALITY", "4"))
+
+
+# Маппинг названий тарифов
+PLAN_NAMES = {
+    "standard": "Стандарт",
+    "expert": "Эксперт",
+    "optimal": "Оптима",
+    "express": "Экспресс",
+    "ultra": "Ультра"
+}
+
+# Маппинг названий разделов (table_name -> читаемое название)
+TABLE_NAME_MAPPING = {
+    "gibkost": "Гибкость команды",
+    "srochnost": "Срочность",
+    "безопасность": "Безопасность",
+    "целевой сервис": "Целевой сервис",
+    "Бухгалтерия": "Бухгалтерия",
+    "Прозрачная отчетность": "Прозрачная отчетность",
+    "Конструкторское бюро": "Конструкторское бюро",
+    "gisp": "ГИСП",
+    "izmeneniya": "Изменения",
+    "tpp": "ТПП",
+    "podryadchiki": "Подрядчики",
+    "Подрядчики": "Подрядчики",
+    "kommunikacii": "Коммуникации",
+    "Коммуникации": "Коммуникации",
+    "podderjka": "Поддержка",
+    "Поддержка": "Поддержка"
+}
+
+# Список JSON файлов для загрузки
+def get_all_json_files(data_dir: Optional[str] = None) -> list:
+    """Получить список всех JSON файлов с данными (динамически)"""
+    json_files = []
+    for filename in os.listdir(data_dir or DATA_DIR):
+        if filename.endswith('.json') and filename not in NON_SECTION_FILES:
+            json_files.append(filename)
+    return json_files
+
+
+def __getattr__(name):
+    # Для обратной совместимости: JSON_FILES — динамический список, каталог данных
+    # читается при обращении, а не при импорте модуля
+    if name == "JSON_FILES":
+        return get_all_json_files()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def load_table_data(filename: str) -> Dict:
+    """Загрузить данные из JSON файла таблицы"""
+    file_path = os.path.join(DATA_DIR, filename)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+VALID_PAIN_CATEGORIES = {"Легкость", "Безопасность", "Экономия", "Скорость"}
+
+
+def normalize_category(cat: str) -> str:
+    """Нормализация категорий болей"""
+    if not cat:
+        return ""
+    cat = cat.strip()
+    
+    # Если уже валидная категория — возвращаем как есть
+    if cat in VALID_PAIN_CATEGORIES:
+        return cat
+    
+    # Проверяем по началу строки (регистронезависимо)
+    lower = cat.lower()
+    
+    # Легкость
+    if lower.startswith("лёгк") or lower.startswith("легк") or lower.startswith("лек"):
+        return "Легкость"
+    
+    # Безопасность
+    if lower.startswith("безоп"):
+        return "Безопасность"
+    
+    # Экономия
+    if lower.startswith("эконом"):
+        return "Экономия"
+    
+    # Скорость
+    if lower.startswith("скор") or lower.startswith("срок"):
+        return "Скорость"
+    
+    # Если не распознано — возвращаем как есть (не теряем данные)
+    return cat
+
+
+def deduplicate_pains(pains_str: str) -> str:
+    """Нормализует и удаляет дубликаты из строки болей"""
+    if not pains_str:
+        return ""
+    parts = [normalize_category(p.strip()) for p in pains_str.split(",") if p.strip()]
+    # Убираем дубликаты, сохраняя порядок
+    seen = set()
+    unique = []
+    for cat in parts:
+        if cat and cat not in seen:
+            seen.add(cat)
+            unique.append(cat)
+    return ", ".join(unique)
+
+
+# Битовые маски категорий болей: по биту на каждую категорию из VALID_PAIN_CATEGORIES
+PAIN_CATEGORY_BITS = {
+    "Легкость": 1,
+    "Безопасность": 2,
+    "Экономия": 4,
+    "Скорость": 8
+}
+# Непустое поле болей с нераспознанными значениями (не участвует в фильтре по категориям)
+PAIN_OTHER_BIT = 16
+
+
+def pain_mask(pains_str: str) -> int:
+    """Маска категорий для строки болей через запятую"""
+    mask = 0
+    if not pains_str:
+        return mask
+    for part in pains_str.split(","):
+        if part.strip():
+            mask |= PAIN_CATEGORY_BITS.get(normalize_category(part), PAIN_OTHER_BIT)
+    return mask
+
+
+def category_query_mask(category_list: List[str]) -> Optional[int]:
+    """Маска запрошенных категорий; None, если среди них есть нераспознанные написания"""
+    mask = 0
+    for cat in category_list:
+        if not cat:
+            continue  # пустая категория ни с чем не пересекается
+        bit = PAIN_CATEGORY_BITS.get(normalize_category(cat))
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+# Шаблоны сокращений (компилируются один раз при импорте)
+MIN_PER_DAY_RE = re.compile(r'Мин\s+(\d+)\s+рд', re.IGNORECASE)
+MAX_PER_DAY_RE = re.compile(r'Макс\s+(\d+)\s+рд', re.IGNORECASE)
+MIN_PREFIX_RE = re.compile(r'^Мин\s+', re.IGNORECASE)
+MAX_PREFIX_RE = re.compile(r'^Макс\s+', re.IGNORECASE)
+PER_DAY_RE = re.compile(r'\s+рд\b', re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def expand_abbreviations(value: str) -> str:
+    """Расшифровка сокращений в значениях (значения в таблицах сильно повторяются — результат кэшируется)"""
+    if not value or value == "-" or value == "+":
+        return value
+    
+    value = value.strip()
+    
+    # Мин/Макс с числами и "рд" (например: "Мин 10 рд" -> "Минимум 10 раз в день")
+    value = MIN_PER_DAY_RE.sub(r'Минимум \1 раз в день', value)
+    value = MAX_PER_DAY_RE.sub(r'Максимум \1 раз в день', value)
+    
+    # Общие замены (если не было совпадения выше)
+    if "Минимум" not in value and "Максимум" not in value:
+        value = MIN_PREFIX_RE.sub('Минимум ', value)
+        value = MAX_PREFIX_RE.sub('Максимум ', value)
+    
+    # Замены для "рд" (если еще не заменено)
+    if "раз в день" not in value:
+        value = PER_DAY_RE.sub(' раз в день', value)
+        value = value.replace(" р/д", " раз в день")
+        value = value.replace(" р.д.", " раз в день")
+        value = value.replace(" р.д", " раз в день")
+    
+    return value
+
+
+# ===== Числовые значения и шкала прогресс-бара =====
+
+# Число: разряды через пробел ("1 350 000") или целое/дробное ("10", "1,5")
+NUMBER_RE = re.compile(r'\d{1,3}(?:[ \u00a0]\d{3})+(?!\d)|\d+(?:[.,]\d+)?')
+# Единица — слова после числа до скобки, "|", запятой или следующего числа ("раз в день", "часа")
+UNIT_RE = re.compile(r'\s*([^\d(|,;]*)')
+# Явный процент шапки "Сроки": "текст (75%)", "текст | 75" или число в конце
+EXPLICIT_PERCENT_RES = (re.compile(r'\((\d+)%?\)'), re.compile(r'\|\s*(\d+)'), re.compile(r'(\d+)%?\s*$'))
+
+
+@lru_cache(maxsize=4096)
+def parse_magnitude(value: str) -> Optional[Tuple[float, str]]:
+    """
+    Первое число значения и его единица ("Минимум 10 раз в день" -> (10, "раз в день"));
+    None для "+", "-" и значений без чисел. Целые числа возвращаются как int.
+    """
+    if not value or value in ("-", "+"):
+        return None
+    match = NUMBER_RE.search(value)
+    if not match:
+        return None
+    number = float(match.group().replace(",", ".").replace(" ", "").replace("\u00a0", ""))
+    unit = UNIT_RE.match(value, match.end()).group(1).strip()
+    return (int(number) if number.is_integer() else number), unit
+
+
+def explicit_percent(value: str) -> Optional[int]:
+    """Процент заполнения, указанный в самом значении (формат шапки "Сроки")"""
+    for pattern in EXPLICIT_PERCENT_RES:
+        match = pattern.search(value)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def scale_row(chars: List[Dict]):
+    """
+    Числа, единицы и шкала строки во всех тарифах: "диапазон" — [мин, макс] чисел строки,
+    "шкала" — положение числа тарифа в диапазоне от 0 до 1 (1, если числа равны; None без числа).
+    Для "Сроки" шкала берётся из явного процента в значении, если он указан.
+    """
+    magnitudes = [parse_magnitude(char["значение"]) for char in chars]
+    numbers = [magnitude[0] for magnitude in magnitudes if magnitude]
+    low, high = (min(numbers), max(numbers)) if numbers else (None, None)
+    for char, magnitude in zip(chars, magnitudes):
+        number, unit = magnitude or (None, None)
+        score = None
+        if number is not None:
+            score = 1.0 if high == low else round((number - low) / (high - low), 4)
+        if char["характеристика"] == "Сроки" and char["значение"] not in ("-", "+"):
+            percent = explicit_percent(char["значение"])
+            if percent is not None:
+                score = min(percent, 100) / 100
+        char["число"] = number
+        char["единица"] = unit
+        char["шкала"] = score
+        char["диапазон"] = [low, high] if numbers else None
+
+
+PERSONAL_PAIN_KEYS = ("personal_pain", "column11", "column12")
+CORPORATE_PAIN_KEYS = ("corporate_pain", "column14", "column15", "column16")
+
+
+def resolve_rows(rows: List[Dict]):
+    """
+    Строки таблицы с характеристиками: (row, название, is_continuation, is_section_header).
+    Строки-заголовки и пустые строки пропускаются; строка с пустым grouping и данными
+    продолжает предыдущую характеристику ("Максимум сроков" после "Сроки").
+    """
+    last_grouping = None  # Сохраняем последнее название для строк с пустым grouping
+    for row in rows:
+        grouping = row.get("grouping", "").strip() if row.get("grouping") else ""
+        
+        # Пропускаем строки-заголовки
+        if grouping in ["Группировка", "Характеристики 2"]:
+            continue
+        
+        # Если grouping пустой, но есть данные в других полях, используем последнее название
+        is_continuation = False
+        if not grouping:
+            # Проверяем, есть ли хотя бы одно значение тарифа
+            has_data = any([
+                row.get("standard"), row.get("expert"), row.get("optimal"),
+                row.get("express"), row.get("ultra")
+            ])
+            if has_data and last_grouping:
+                grouping = last_grouping
+                is_continuation = True  # Это продолжение предыдущей строки
+            else:
+                continue
+        else:
+            last_grouping = grouping  # Сохраняем для следующих строк
+        
+        characteristic_name = grouping
+        
+        # Если это продолжение строки "Сроки", определяем что это максимум по значениям
+        if is_continuation and last_grouping == "Сроки":
+            # Проверяем значения на наличие "Макс"
+            values = [row.get("standard"), row.get("expert"), row.get("optimal"), 
+                     row.get("express"), row.get("ultra")]
+            if any(v and "Макс" in str(v) for v in values):
+                characteristic_name = "Максимум сроков"
+        
+        # Заголовок секции — только "Стоимость" и "Сроки", не продолжения
+        is_section_header = characteristic_name in ["Стоимость", "Сроки"] and not is_continuation
+        yield row, characteristic_name, is_continuation, is_section_header
+
+
+def collect_pains(row: Dict, keys) -> List[str]:
+    """Нормализованные категории болей из основных и дополнительных колонок без дубликатов"""
+    raw = []
+    for key in keys:
+        if row.get(key):
+            # Разбиваем строку по запятым
+            raw.extend(row.get(key).split(","))
+    seen = set()
+    unique = []
+    for p in raw:
+        cat = normalize_category(p.strip()) if p else ""
+        if cat and cat not in seen:
+            seen.add(cat)
+            unique.append(cat)
+    return unique
+
+
+def convert_table_to_plans_format(table_data: Dict) -> List[Dict]:
+    """
+    Преобразовать данные из формата таблицы в формат планов
+    """
+    if not table_data or "rows" not in table_data:
+        return []
+    
+    # Получаем название раздела с маппингом
+    raw_table_name = table_data.get("table_name", "Прочее")
+    table_name = TABLE_NAME_MAPPING.get(raw_table_name, raw_table_name)
+    # Если table_name не найден в маппинге, используем raw_table_name
+    if table_name == raw_table_name and raw_table_name not in TABLE_NAME_MAPPING:
+        # Пытаемся найти по имени файла (если передано)
+        pass
+    rows = table_data.get("rows", [])
+    
+    # Создаем структуру для каждого тарифа
+    plans_dict = {
+        "Стандарт": [],
+        "Эксперт": [],
+        "Оптима": [],
+        "Экспресс": [],
+        "Ультра": []
+    }
+    
+    for row, characteristic_name, is_continuation, is_section_header in resolve_rows(rows):
+        personal_pain = ", ".join(collect_pains(row, PERSONAL_PAIN_KEYS))
+        corporate_pain = ", ".join(collect_pains(row, CORPORATE_PAIN_KEYS))
+        
+        characteristics_desc = row.get("characteristics", "") or ""
+        advantages = row.get("advantages", "") or ""
+        questions = row.get("questions", "") or ""
+        objection = row.get("objection", "") or ""
+        
+        # Добавляем характеристику в каждый тариф с соответствующим значением
+        row_chars = []
+        for plan_key, plan_name in PLAN_NAMES.items():
+            value = row.get(plan_key, "-") or "-"
+            
+            # Удаляем формулы Excel (начинающиеся с =)
+            if isinstance(value, str) and value.strip().startswith("="):
+                value = "-"
+            
+            # Расшифровываем сокращения
+            expanded_value = expand_abbreviations(value)
+            
+            char_data = {
+                "id": row.get("row_id"),  # постоянный id строки (для правок по id)
+                "раздел": table_name,
+                "характеристика": characteristic_name,
+                "описание": advantages or characteristics_desc,  # Используем advantages как описание
+                "значение": expanded_value,
+                "возражения": objection,
+                "сравнение": "",  # Можно добавить из column6 если нужно
+                "сомнения": questions,  # Вопросы идут в сомнения
+                "личные_боли": personal_pain,
+                "корпоративные_боли": corporate_pain,
+                "вопросы": questions,  # Сохраняем вопросы отдельно
+                "is_section_header": is_section_header,  # Флаг заголовка секции
+                "raw_value": value  # Исходное значение из таблицы (до расшифровки сокращений)
+            }
+            
+            plans_dict[plan_name].append(char_data)
+            row_chars.append(char_data)
+        scale_row(row_chars)
+    
+    # Преобразуем в список планов
+    plans = []
+    for plan_name, characteristics in plans_dict.items():
+        if characteristics:  # Добавляем только если есть характеристики
+            plans.append({
+                "название": plan_name,
+                "цена": get_plan_price(plan_name),
+                "характеристики": characteristics
+            })
+    
+    return plans
+
+
+def get_plan_price(plan_name: str) -> str:
+    """Получить цену тарифа (пока заглушка, можно вынести в отдельный файл)"""
+    prices = {
+        "Стандарт": "220000",
+        "Эксперт": "400000",
+        "Оптима": "600000",
+        "Экспресс": "900000",
+        "Ультра": "1350000"
+    }
+    return prices.get(plan_name, "0")
+
+
+def iter_tables(file_data: Dict) -> List[Dict]:
+    """Таблицы файла: массив tables (как buhotch.json) или сам файл с одной таблицей"""
+    if "tables" in file_data and isinstance(file_data["tables"], list):
+        return file_data["tables"]
+    return [file_data]
+
+
+def merge_plans(files_data) -> List[Dict]:
+    """Объединить тарифы из данных нескольких файлов"""
+    all_plans_dict = {
+        "Стандарт": [],
+        "Эксперт": [],
+        "Оптима": [],
+        "Экспресс": [],
+        "Ультра": []
+    }
+    
+    for file_data in files_data:
+        if not file_data:
+            continue
+        
+        for table_data in iter_tables(file_data):
+            plans = convert_table_to_plans_format(table_data)
+            # Объединяем характеристики по тарифам
+            for plan in plans:
+                plan_name = plan["название"]
+                if plan_name in all_plans_dict:
+                    all_plans_dict[plan_name].extend(plan["характеристики"])
+    
+    # Преобразуем в список планов
+    result_plans = []
+    for plan_name, characteristics in all_plans_dict.items():
+        if characteristics:
+            result_plans.append({
+                "название": plan_name,
+                "цена": get_plan_price(plan_name),
+                "характеристики": characteristics
+            })
+    
+    return result_plans
+
+
+def load_all_plans(filenames: Optional[List[str]] = None) -> List[Dict]:
+    """Загрузить все тарифы из всех JSON файлов и объединить"""
+    return merge_plans(load_table_data(filename) for filename in (get_all_json_files() if filenames is None else filenames))
+
+
+def compile_sections(files: List[Tuple[str, Dict]]) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    """Список разделов и характеристики каждого раздела (как их отдают /api/sections)"""
+    sections = []
+    characteristics = {}
+    for filename, file_data in files:
+        if not file_data:
+            continue
+        for table_data in iter_tables(file_data):
+            table_name = table_data.get("table_name", "")
+            if not table_name:
+                continue
+            rows = table_data.get("rows", [])
+            sections.append({
+                "name": table_name,
+                "filename": filename,
+                "characteristics_count": len(rows) - 1  # -1 for header
+            })
+            # Раздел с тем же названием в следующих файлах не используется (как в get_section_filename)
+            if table_name not in characteristics:
+                # Пропускаем заголовок (первую строку)
+                characteristics[table_name] = [
+                    {
+                        "index": i,
+                        "id": row.get("row_id"),
+                        "name": row.get("grouping", ""),
+                        "personal_pain": row.get("personal_pain", ""),
+                        "corporate_pain": row.get("corporate_pain", "")
+                    }
+                    for i, row in enumerate(rows[1:], start=1)
+                ]
+    return sections, characteristics
+
+
+def filter_plans(plans: List[Dict], pain_type: Optional[str], categories: Optional[str]) -> List[Dict]:
+    """Построчный фильтр тарифов по типу боли и категориям (работает с любыми написаниями категорий)"""
+    filtered_plans = []
+    category_list = [c.strip() for c in categories.split(",")] if categories else []
+    
+    for plan in plans:
+        filtered_characteristics = []
+        
+        for char in plan.get("характеристики", []):
+            should_include = True
+            
+            # Фильтр по типу боли
+            if pain_type:
+                if pain_type == "personal":
+                    pain_field = char.get("личные_боли", "")
+                else:  # corporate
+                    pain_field = char.get("корпоративные_боли", "")
+                
+                if not pain_field or not pain_field.strip():
+                    should_include = False
+                elif category_list:
+                    # Проверяем, есть ли хотя бы одна категория в поле боли
+                    pain_categories = [normalize_category(c) for c in pain_field.split(",") if c.strip()]
+                    normalized_category_list = [normalize_category(cat) for cat in category_list]
+                    # Проверяем пересечение списков
+                    if not set(normalized_category_list) & set(pain_categories):
+                        should_include = False
+            elif category_list:
+                # Если указаны только категории, проверяем оба типа болей
+                personal_pain = char.get("личные_боли", "")
+                corporate_pain = char.get("корпоративные_боли", "")
+                
+                personal_categories = [normalize_category(c) for c in personal_pain.split(",") if personal_pain and c.strip()]
+                corporate_categories = [normalize_category(c) for c in corporate_pain.split(",") if corporate_pain and c.strip()]
+                
+                all_categories = personal_categories + corporate_categories
+                normalized_category_list = [normalize_category(cat) for cat in category_list]
+                if not set(normalized_category_list) & set(all_categories):
+                    should_include = False
+            
+            if should_include:
+                filtered_characteristics.append(char)
+        
+        # Добавляем план только если есть отфильтрованные характеристики
+        if filtered_characteristics:
+            plan_copy = plan.copy()
+            plan_copy["характеристики"] = filtered_characteristics
+            filtered_plans.append(plan_copy)
+    
+    return filtered_plans
+
+
+class PainIndex:
+    """
+    Индекс болей по строкам каталога.
+
+    Характеристики всех тарифов идут в одном порядке (каждая строка таблицы
+    добавляется в каждый тариф), поэтому маски и списки вхождений строятся
+    один раз по позиции характеристики.
+    """
+
+    __slots__ = ("masks", "postings")
+
+    KINDS = ("personal", "corporate", "any")
+
+    def __init__(self, characteristics: List[Dict]):
+        personal = array("B", (pain_mask(char.get("личные_боли", "")) for char in characteristics))
+        corporate = array("B", (pain_mask(char.get("корпоративные_боли", "")) for char in characteristics))
+        combined = array("B", (p | c for p, c in zip(personal, corporate)))
+        self.masks = {"personal": personal, "corporate": corporate, "any": combined}
+        # Списки вхождений: категория -> позиции характеристик с этой категорией
+        self.postings = {
+            kind: {
+                bit: array("I", (i for i, m in enumerate(masks) if m & bit))
+                for bit in PAIN_CATEGORY_BITS.values()
+            }
+            for kind, masks in self.masks.items()
+        }
+
+    def positions(self, kind: Optional[str], query: int) -> Optional[List[int]]:
+        """Позиции для канонического ключа запроса (None — фильтр не нужен)"""
+        if kind is None:
+            return self.select("any", query) if query else None
+        return self.select(kind, query or None)
+
+    def select(self, kind: str, query: Optional[int]) -> List[int]:
+        """Позиции характеристик: с непустым полем болей (query=None) или пересекающиеся с маской"""
+        masks = self.masks[kind]
+        if query is None:
+            return [i for i, m in enumerate(masks) if m]
+        if query in self.postings[kind]:
+            return list(self.postings[kind][query])
+        return [i for i, m in enumerate(masks) if m & query]
+
+
+def pain_kind(pain_type: Optional[str]) -> Optional[str]:
+    """Тип боли так, как его понимает фильтр: любое значение кроме personal — corporate"""
+    if not pain_type:
+        return None
+    return "personal" if pain_type == "personal" else "corporate"
+
+
+def canonical_plans_query(pain_type: Optional[str], categories: Optional[str]) -> Optional[Tuple]:
+    """
+    Канонический ключ запроса /api/plans: (тип боли, маска категорий).
+    Маска 0 означает «категории не указаны». None — запрос вне конечного
+    пространства фильтров (нераспознанные или только пустые категории).
+    """
+    kind = pain_kind(pain_type)
+    if not categories:
+        return (kind, 0)
+    category_list = [c.strip() for c in categories.split(",")]
+    query = category_query_mask(category_list)
+    if not query:
+        return None
+    return (kind, query)
+
+
+def slice_plans(plans: List[Dict], positions: Optional[List[int]]) -> List[Dict]:
+    """Тарифы только с характеристиками на указанных позициях (None — без фильтра)"""
+    filtered_plans = []
+    for plan in plans:
+        characteristics = plan.get("характеристики", [])
+        if positions is not None:
+            characteristics = [characteristics[i] for i in positions]
+        if characteristics:
+            plan_copy = plan.copy()
+            plan_copy["характеристики"] = characteristics
+            filtered_plans.append(plan_copy)
+    return filtered_plans
+
+
+def filter_plans_indexed(plans: List[Dict], index: PainIndex,
+                         pain_type: Optional[str], categories: Optional[str]) -> Optional[List[Dict]]:
+    """
+    Фильтр тарифов по индексу болей. Результат совпадает с filter_plans();
+    возвращает None, если запрос нельзя свести к маске категорий.
+    """
+    key = canonical_plans_query(pain_type, categories)
+    if key is None:
+        return None
+    return slice_plans(plans, index.positions(*key))
+
+
+# ===== Проекция полей и выборка разделов/тарифов =====
+
+# Поля характеристики в ответе /api/plans (в порядке convert_table_to_plans_format)
+CHARACTERISTIC_FIELDS = ("id", "раздел", "характеристика", "описание", "значение", "возражения",
+                         "сравнение", "сомнения", "личные_боли", "корпоративные_боли", "вопросы",
+                         "is_section_header", "raw_value", "число", "единица", "шкала", "диапазон")
+
+
+def parse_list_param(value: Optional[str]) -> Optional[List[str]]:
+    """Значения параметра через запятую; None, если параметр не задан"""
+    if not value:
+        return None
+    items = [item.strip() for item in value.split(",")]
+    return [item for item in items if item] or None
+
+
+def normalize_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Поля для проекции в каноническом порядке (id включается всегда); ValueError для неизвестных"""
+    names = parse_list_param(fields)
+    if names is None:
+        return None
+    unknown = [name for name in names if name not in CHARACTERISTIC_FIELDS]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    selected = set(names) | {"id"}
+    return tuple(field for field in CHARACTERISTIC_FIELDS if field in selected)
+
+
+def normalize_plan_names(plans: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Тарифы по названию ("Стандарт") или ключу ("standard") в порядке PLAN_NAMES; ValueError для неизвестных"""
+    names = parse_list_param(plans)
+    if names is None:
+        return None
+    selected = set()
+    for name in names:
+        plan_name = PLAN_NAMES.get(name.lower(), name)
+        if plan_name not in PLAN_NAMES.values():
+            raise ValueError(f"Неизвестный тариф: {name}")
+        selected.add(plan_name)
+    return tuple(plan_name for plan_name in PLAN_NAMES.values() if plan_name in selected)
+
+
+def normalize_sections(sections: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Разделы по читаемому названию или table_name (через TABLE_NAME_MAPPING)"""
+    names = parse_list_param(sections)
+    if names is None:
+        return None
+    return tuple(sorted({TABLE_NAME_MAPPING.get(name, name) for name in names}))
+
+
+def project_plans(plans: List[Dict], fields: Optional[Tuple[str, ...]]) -> List[Dict]:
+    """Тарифы только с выбранными полями характеристик (None — без проекции)"""
+    if fields is None:
+        return plans
+    return [
+        dict(plan, характеристики=[{field: char[field] for field in fields} for char in plan["характеристики"]])
+        for plan in plans
+    ]
+
+
+# ===== Компактный формат /api/plans (?format=compact) =====
+
+# Колонки строки компактного формата; значения тарифов — параллельный массив в порядке "plans"
+COMPACT_COLUMNS = ["id", "раздел", "характеристика", "описание", "возражения", "вопросы",
+                   "личные_боли", "корпоративные_боли", "is_section_header", "значения", "raw_values",
+                   "числа", "единицы", "шкалы", "диапазон"]
+
+# Какие поля характеристики восстанавливаются из колонки ("сравнение" всегда пустое и не передаётся)
+COMPACT_COLUMN_FIELDS = {
+    "id": ("id",),
+    "раздел": ("раздел",),
+    "характеристика": ("характеристика",),
+    "описание": ("описание",),
+    "возражения": ("возражения",),
+    "вопросы": ("вопросы", "сомнения"),
+    "личные_боли": ("личные_боли",),
+    "корпоративные_боли": ("корпоративные_боли",),
+    "is_section_header": ("is_section_header",),
+    "значения": ("значение",),
+    "raw_values": ("raw_value",),
+    "числа": ("число",),
+    "единицы": ("единица",),
+    "шкалы": ("шкала",),
+    "диапазон": ("диапазон",),
+}
+
+# Колонки значений тарифов: массив в порядке "plans" или null, если ни в одном тарифе нет числа
+COMPACT_NUMERIC_COLUMNS = {"числа": "число", "единицы": "единица", "шкалы": "шкала"}
+
+
+def compact_plans(plans: List[Dict], fields: Optional[Tuple[str, ...]] = None) -> Dict:
+    """
+    Компактное представление тарифов: каждая характеристика один раз, значения
+    тарифов — массивом, раздел — индексом в "sections", боли — кодами из "pains".
+    При проекции в "fields" — выбранные поля, а в "columns" — только нужные для них колонки.
+    raw_values равен null, если исходные значения совпадают с расшифрованными,
+    числа/единицы/шкалы — если в строке нет чисел.
+    Характеристики всех тарифов идут в одном порядке (как в PainIndex).
+    """
+    selected = fields or CHARACTERISTIC_FIELDS
+    columns = [column for column in COMPACT_COLUMNS
+               if any(field in selected for field in COMPACT_COLUMN_FIELDS[column])]
+    sections: List[str] = []
+    section_codes: Dict[str, int] = {}
+    pains: List[str] = sorted(VALID_PAIN_CATEGORIES, key=PAIN_CATEGORY_BITS.get)
+    pain_codes = {cat: code for code, cat in enumerate(pains)}
+
+    def section_code(name: str) -> int:
+        code = section_codes.get(name)
+        if code is None:
+            code = section_codes[name] = len(sections)
+            sections.append(name)
+        return code
+
+    def encode_pains(pains_str: str) -> List[int]:
+        codes = []
+        for cat in pains_str.split(", ") if pains_str else []:
+            code = pain_codes.get(cat)
+            if code is None:
+                # Нераспознанное написание тоже попадает в словарь, чтобы не потерять данные
+                code = pain_codes[cat] = len(pains)
+                pains.append(cat)
+            codes.append(code)
+        return codes
+
+    def encode_column(column: str, chars) -> object:
+        char = chars[0]
+        if column == "раздел":
+            return section_code(char["раздел"])
+        if column in ("личные_боли", "корпоративные_боли"):
+            return encode_pains(char[column])
+        if column == "значения":
+            return [c["значение"] for c in chars]
+        if column == "raw_values":
+            raw_values = [c["raw_value"] for c in chars]
+            if "значения" in columns and raw_values == [c["значение"] for c in chars]:
+                return None
+            return raw_values
+        if column in COMPACT_NUMERIC_COLUMNS:
+            if char["диапазон"] is None:
+                return None
+            return [c[COMPACT_NUMERIC_COLUMNS[column]] for c in chars]
+        return char[column]
+
+    rows = [[encode_column(column, chars) for column in columns]
+            for chars in zip(*(plan["характеристики"] for plan in plans))]
+    compact = {
+        "format": "compact",
+        "plans": [{"название": plan["название"], "цена": plan["цена"]} for plan in plans],
+        "sections": sections,
+        "pains": pains,
+        "columns": columns,
+        "rows": rows,
+    }
+    if fields is not None:
+        compact["fields"] = list(fields)
+    return compact
+
+
+def expand_compact_plans(compact: Dict) -> List[Dict]:
+    """Обратное преобразование compact_plans() в обычный список тарифов"""
+    pains = compact["pains"]
+    sections = compact["sections"]
+    columns = compact["columns"]
+    fields = compact.get("fields", CHARACTERISTIC_FIELDS)
+    plans = [dict(plan, характеристики=[]) for plan in compact["plans"]]
+    field_column = {field: column for column, field in COMPACT_NUMERIC_COLUMNS.items()}
+
+    def decode_field(field: str, row: Dict, i: int):
+        if field == "раздел":
+            return sections[row["раздел"]]
+        if field in ("личные_боли", "корпоративные_боли"):
+            return ", ".join(pains[code] for code in row[field])
+        if field == "значение":
+            return row["значения"][i]
+        if field == "raw_value":
+            raw_values = row["raw_values"]
+            return row["значения"][i] if raw_values is None else raw_values[i]
+        if field in ("число", "единица", "шкала"):
+            values = row[field_column[field]]
+            return None if values is None else values[i]
+        if field == "сравнение":
+            return ""
+        if field == "сомнения":
+            return row["вопросы"]
+        return row[field]
+
+    for values in compact["rows"]:
+        row = dict(zip(columns, values))
+        for i, plan in enumerate(plans):
+            plan["характеристики"].append({field: decode_field(field, row, i) for field in fields})
+    return plans
+
+
+def render_json(content) -> bytes:
+    """Сериализация в те же байты, что и у JSONResponse"""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+# Готовое тело ответа и его сильный ETag (хеш содержимого — одинаков во всех воркерах и после рестарта);
+# encoded — сжатые варианты тела: {"br" | "gzip": bytes}
+RenderedBody = namedtuple("RenderedBody", ["body", "etag", "encoded"])
+
+
+def compress_body(body: bytes, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> Dict[str, bytes]:
+    """Сжатые варианты тела; вариант не сохраняется, если он не меньше исходного"""
+    encoded = {}
+    # mtime=0 — одинаковые байты (и ETag) во всех воркерах
+    gzipped = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    if len(gzipped) < len(body):
+        encoded["gzip"] = gzipped
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=brotli_quality)
+        if len(compressed) < len(body):
+            encoded["br"] = compressed
+    return encoded
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag варианта тела: у сжатых вариантов свой тег ("<hash>-gzip")"""
+    if not encoding:
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def render_body(content, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> RenderedBody:
+    """Сериализовать ответ, посчитать ETag и подготовить сжатые варианты"""
+    body = render_json(content)
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return RenderedBody(body, etag, compress_body(body, gzip_level, brotli_quality))
+
+
+# ===== Скомпилированный каталог в памяти =====
+
+# Сколько ответов на нестандартные запросы (нераспознанные категории, выборки fields/sections/plans)
+# хранить в снимке
+FALLBACK_RESPONSES_LIMIT = 64
+
+# Поля таблицы дашборда (DASHBOARD_FIELDS в App.jsx): дашборд запрашивает ?format=compact&fields=...
+DASHBOARD_FIELDS = normalize_fields("id,раздел,характеристика,описание,значение,личные_боли,"
+                                    "корпоративные_боли,вопросы,is_section_header,шкала")
+
+# Варианты ответа (compact, fields), которые готовятся при сборке для всех комбинаций фильтров
+# и попадают в общий снимок; остальные выборки собираются по запросу в каждом воркере
+PRERENDERED_VARIANTS = ((False, None), (True, None), (True, DASHBOARD_FIELDS))
+
+def get_data_signature(data_dir: Optional[str] = None) -> Tuple:
+    """Отпечаток файлов данных (имя, mtime, размер) без чтения содержимого"""
+    signature = []
+    with os.scandir(data_dir or DATA_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.name not in NON_SECTION_FILES and entry.is_file():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # файл удалён (например, другим воркером) во время обхода
+                signature.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    signature.sort()
+    return tuple(signature)
+
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок каталога: собранные тарифы и отпечаток файлов, из которых он построен.
+
+    Снимок, отображённый из общего файла (shared=True), отдаёт готовые тела прямо из
+    отображения (memoryview). Строку по id (карточка, журнал изменений, поиск) он читает
+    из её отдельной записи в файле, а все разобранные тарифы загружает только при первой
+    нестандартной выборке (fields/sections/plans) — в пуле потоков, не в цикле событий.
+    """
+
+    __slots__ = ("version", "signature", "_plans", "_pain_index", "_section_positions", "_state_loader",
+                 "_state_lock", "_row_loader", "row_positions", "row_digests", "_row_order", "plan_names",
+                 "responses", "_fallback_responses", "_fallback_lock", "sections", "section_characteristics",
+                 "built_at", "build_seconds", "data_version", "shared")
+
+    def __init__(self, version: int, signature: Tuple, files: List[Tuple[str, Dict]]):
+        self.version = version
+        self.signature = signature
+        plans = merge_plans(file_data for _, file_data in files)
+        # Позиции характеристик по разделу (одинаковы во всех тарифах)
+        section_positions: Dict[str, List[int]] = {}
+        for i, char in enumerate(plans[0]["характеристики"] if plans else []):
+            section_positions.setdefault(char["раздел"], []).append(i)
+        self._state_loader = None
+        self._state_lock = threading.Lock()
+        self._row_loader = None
+        self._set_state({
+            "plans": plans,
+            "pain_index": PainIndex(plans[0]["характеристики"] if plans else []),
+            "section_positions": section_positions,
+        })
+        self.plan_names = tuple(plan["название"] for plan in plans)
+        # id строк по порядку, позиция и хеш значений строки во всех тарифах (для журнала изменений)
+        self._row_order = [char["id"] for char in plans[0]["характеристики"]] if plans else []
+        self.row_positions: Dict[str, int] = {}
+        self.row_digests: Dict[str, bytes] = {}
+        for i, chars in enumerate(zip(*(plan["характеристики"] for plan in plans))):
+            row_id = chars[0]["id"]
+            if row_id:
+                self.row_positions[row_id] = i
+                self.row_digests[row_id] = hashlib.blake2b(render_json(chars), digest_size=16).digest()
+        self.responses = self._materialize_responses()
+        self._fallback_responses = OrderedDict()
+        self._fallback_lock = threading.Lock()
+        sections, characteristics = compile_sections(files)
+        self.sections = render_body({"sections": sections})
+        self.section_characteristics = {
+            name: render_body({"characteristics": items}) for name, items in characteristics.items()
+        }
+        self.built_at = time.time()
+        self.build_seconds = 0.0
+        self.data_version = 0  # общий счётчик версий данных на момент сборки
+        self.shared = False
+
+    # Разобранные тарифы: в общем файле хранятся одним pickle и загружаются по требованию
+    LAZY_STATE = ("plans", "pain_index", "section_positions")
+
+    def _set_state(self, state: Dict):
+        self._plans = state["plans"]
+        self._pain_index = state["pain_index"]
+        self._section_positions = state["section_positions"]
+
+    def _load_state(self):
+        if self._plans is None:
+            with self._state_lock:  # одновременные выборки разбирают тарифы один раз
+                if self._plans is None:
+                    self._set_state(self._state_loader())
+
+    @property
+    def plans(self) -> List[Dict]:
+        self._load_state()
+        return self._plans
+
+    @property
+    def pain_index(self) -> "PainIndex":
+        self._load_state()
+        return self._pain_index
+
+    @property
+    def section_positions(self) -> Dict[str, List[int]]:
+        self._load_state()
+        return self._section_positions
+
+    def export_state(self) -> Dict:
+        return {name: getattr(self, name) for name in self.LAZY_STATE}
+
+    @classmethod
+    def from_file(cls, version: int, signature: Tuple, meta: Dict, blobs: List[memoryview]) -> "CatalogSnapshot":
+        """Снимок поверх отображённого файла (см. read_snapshot_file): без разбора тарифов и копирования тел"""
+        snapshot = cls.__new__(cls)
+        snapshot.version = version
+        snapshot.signature = signature
+        snapshot._plans = snapshot._pain_index = snapshot._section_positions = None
+        state_blob = blobs[meta["state"]]
+        snapshot._state_loader = lambda: pickle.loads(state_blob)
+        snapshot._state_lock = threading.Lock()
+        row_blobs = [blobs[i] for i in meta["rows"]]
+        snapshot._row_loader = lambda position: pickle.loads(row_blobs[position])
+        snapshot.plan_names = meta["plan_names"]
+        snapshot._row_order = meta["row_order"]
+        snapshot.row_positions = meta["row_positions"]
+        snapshot.row_digests = meta["row_digests"]
+        bodies: Dict[int, RenderedBody] = {}
+
+        def body(ref) -> RenderedBody:
+            rendered = bodies.get(ref[0])
+            if rendered is None:
+                rendered = bodies[ref[0]] = RenderedBody(
+                    blobs[ref[0]], ref[1], {encoding: blobs[i] for encoding, i in ref[2].items()})
+            return rendered
+
+        snapshot.responses = {key: body(ref) for key, ref in meta["responses"].items()}
+        snapshot._fallback_responses = OrderedDict()
+        snapshot._fallback_lock = threading.Lock()
+        snapshot.sections = body(meta["sections"])
+        snapshot.section_characteristics = {name: body(ref) for name, ref in meta["section_characteristics"].items()}
+        snapshot.built_at = time.time()
+        snapshot.build_seconds = 0.0
+        snapshot.data_version = 0
+        snapshot.shared = True
+        return snapshot
+
+    def _materialize_responses(self) -> Dict[Tuple, RenderedBody]:
+        """Сериализованные ответы /api/plans для всех 3 × 16 комбинаций фильтров и вариантов PRERENDERED_VARIANTS"""
+        responses = {}
+        by_positions = {}  # разные фильтры часто дают одинаковый набор строк
+        for kind in (None, "personal", "corporate"):
+            for query in range(2 ** len(PAIN_CATEGORY_BITS)):
+                positions = self.pain_index.positions(kind, query)
+                positions_key = None if positions is None else tuple(positions)
+                for compact, fields in PRERENDERED_VARIANTS:
+                    body = by_positions.get((positions_key, compact, fields))
+                    if body is None:
+                        plans = slice_plans(self.plans, positions)
+                        body = render_body(compact_plans(plans, fields) if compact else {"plans": project_plans(plans, fields)})
+                        by_positions[(positions_key, compact, fields)] = body
+                    responses[(kind, query, compact, fields)] = body
+        return responses
+
+    def cached_plans_response(self, pain_type: Optional[str], categories: Optional[str],
+                              compact: bool = False, fields: Optional[Tuple[str, ...]] = None,
+                              sections: Optional[Tuple[str, ...]] = None,
+                              plan_names: Optional[Tuple[str, ...]] = None) -> Optional[RenderedBody]:
+        """
+        Готовое тело ответа /api/plans: из таблицы снимка или из LRU нестандартных
+        запросов и выборок (fields/sections/plan_names — см. normalize_*). None — тело
+        нужно собрать через plans_response (в пуле потоков).
+        """
+        key = canonical_plans_query(pain_type, categories)
+        if key is not None and sections is None and plan_names is None:
+            body = self.responses.get(key + (compact, fields))
+            if body is not None:
+                return body
+        fallback_key = self._fallback_key(key, pain_type, categories, compact, fields, sections, plan_names)
+        with self._fallback_lock:
+            body = self._fallback_responses.get(fallback_key)
+            if body is not None:
+                self._fallback_responses.move_to_end(fallback_key)
+            return body
+
+    def plans_response(self, pain_type: Optional[str], categories: Optional[str],
+                       compact: bool = False, fields: Optional[Tuple[str, ...]] = None,
+                       sections: Optional[Tuple[str, ...]] = None,
+                       plan_names: Optional[Tuple[str, ...]] = None) -> RenderedBody:
+        """Тело ответа /api/plans; при промахе кэша тело собирается и сжимается быстрым уровнем"""
+        body = self.cached_plans_response(pain_type, categories, compact, fields, sections, plan_names)
+        if body is not None:
+            return body
+        key = canonical_plans_query(pain_type, categories)
+        plans = self._select_plans(key, pain_type, categories, sections, plan_names)
+        body = render_body(compact_plans(plans, fields) if compact else {"plans": project_plans(plans, fields)},
+                           FALLBACK_GZIP_LEVEL, FALLBACK_BROTLI_QUALITY)
+        fallback_key = self._fallback_key(key, pain_type, categories, compact, fields, sections, plan_names)
+        with self._fallback_lock:
+            self._fallback_responses[fallback_key] = body
+            if len(self._fallback_responses) > FALLBACK_RESPONSES_LIMIT:
+                self._fallback_responses.popitem(last=False)
+        return body
+
+    @staticmethod
+    def _fallback_key(key: Optional[Tuple], pain_type: Optional[str], categories: Optional[str], compact: bool,
+                      fields: Optional[Tuple[str, ...]], sections: Optional[Tuple[str, ...]],
+                      plan_names: Optional[Tuple[str, ...]]) -> Tuple:
+        query_key = key if key is not None else (pain_kind(pain_type), categories)
+        return (query_key, compact, fields, sections, plan_names)
+
+    def _select_plans(self, key: Optional[Tuple], pain_type: Optional[str], categories: Optional[str],
+                      sections: Optional[Tuple[str, ...]], plan_names: Optional[Tuple[str, ...]]) -> List[Dict]:
+        """Тарифы с характеристиками по фильтру болей и выбранным разделам (списки ссылаются на снимок)"""
+        if key is not None:
+            positions = self.pain_index.positions(*key)
+            if sections is not None:
+                allowed = sorted(i for name in sections for i in self.section_positions.get(name, ()))
+                if positions is not None:
+                    matched = set(positions)
+                    allowed = [i for i in allowed if i in matched]
+                positions = allowed
+            plans = slice_plans(self.plans, positions)
+        else:
+            plans = filter_plans(self.plans, pain_type, categories)
+            if sections is not None and plans:
+                plans = slice_plans(plans, [i for i, char in enumerate(plans[0]["характеристики"])
+                                            if char["раздел"] in sections])
+        if plan_names is not None:
+            plans = [plan for plan in plans if plan["название"] in plan_names]
+        return plans
+
+    def row_order(self) -> List[Optional[str]]:
+        """id строк в порядке характеристик"""
+        return self._row_order
+
+    def row_values(self, row_id: str) -> Tuple[Dict, ...]:
+        """Характеристика строки во всех тарифах (в порядке plans)"""
+        return self._row(self.row_positions[row_id])
+
+    def _row(self, position: int) -> Tuple[Dict, ...]:
+        # Общий снимок читает одну строку из файла, не разбирая все тарифы
+        if self._row_loader is not None:
+            return self._row_loader(position)
+        return tuple(plan["характеристики"][position] for plan in self._plans)
+
+    def characteristic(self, plan: str, row_id: str) -> Optional[Dict]:
+        """Полная характеристика тарифа по id строки (для карточки характеристики)"""
+        position = self.row_positions.get(row_id)
+        plan_name = PLAN_NAMES.get(plan.lower(), plan)
+        if position is None or plan_name not in self.plan_names:
+            return None
+        return self._row(position)[self.plan_names.index(plan_name)]
+
+
+# Запись журнала изменений: версия каталога, id изменённых/добавленных/удалённых строк,
+# изменился ли порядок строк и нужна ли клиенту полная перезагрузка
+ChangeEntry = namedtuple("ChangeEntry", ["version", "row_ids", "order_changed", "resync"])
+
+
+def diff_snapshots(old: CatalogSnapshot, new: CatalogSnapshot) -> ChangeEntry:
+    """Изменения между двумя снимками по id строк (по хешам значений — без разбора тарифов общего снимка)"""
+    old_order, new_order = old.row_order(), new.row_order()
+    plan_names_changed = old.plan_names != new.plan_names
+    # Без id (или с повторяющимися id) строки нельзя сопоставить — только полная перезагрузка
+    if (plan_names_changed or None in old_order or None in new_order
+            or len(old.row_positions) != len(old_order) or len(new.row_positions) != len(new_order)):
+        return ChangeEntry(new.version, frozenset(), False, True)
+    row_ids = set(old.row_positions) ^ set(new.row_positions)
+    for row_id in set(old.row_positions) & set(new.row_positions):
+        if old.row_digests[row_id] != new.row_digests[row_id]:
+            row_ids.add(row_id)
+    return ChangeEntry(new.version, frozenset(row_ids), old_order != new_order, False)
+
+
+# ===== Общий снимок каталога (файл, отображаемый в память) =====
+#
+# Собранный каталог публикуется в SNAPSHOT_FILE, и все воркеры отображают этот файл
+# только для чтения: готовые тела ответов лежат в страничном кэше один раз на машину,
+# а не в памяти каждого процесса. Новая версия пишется во временный файл и подменяется
+# через rename, поэтому воркер, отображающий прежний файл, продолжает работать с ним.
+#
+# Формат: заголовок _SNAPSHOT_HEAD (magic, длина метаданных, число тел), метаданные
+# (pickle: заголовок проверки, ссылки ответов на тела, id строк и их хеши), таблица
+# смещений тел (_SNAPSHOT_ENTRY) и пул байтов: UTF-8 JSON тела, их сжатые варианты,
+# pickle каждой строки (характеристики во всех тарифах) и pickle разобранных тарифов
+# (строки и тарифы загружаются только по требованию).
+
+# Версия формата файла снимка; увеличить при изменении структуры сохраняемого состояния
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_MAGIC = b"HPVCAT03"
+_SNAPSHOT_HEAD = struct.Struct("<8sQQ")
+_SNAPSHOT_ENTRY = struct.Struct("<QQ")  # смещение и длина тела
+
+
+def file_fingerprint(path: str) -> Optional[str]:
+    """Контрольная сумма содержимого файла; None, если файла нет"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _module_code_fingerprint(module_name: str) -> str:
+    paths = [os.path.abspath(__file__), os.path.abspath(sys.modules[module_name].__file__)]
+    return hashlib.blake2b("".join(file_fingerprint(path) or "" for path in paths).encode(),
+                           digest_size=16).hexdigest()
+
+
+def code_fingerprint(source) -> str:
+    """Контрольная сумма кода, от которого зависит содержимое снимка (каталог и источник данных)"""
+    return _module_code_fingerprint(type(source).__module__)
+
+
+def snapshot_header(source, fingerprint: Tuple) -> Dict:
+    return {"format": SNAPSHOT_FORMAT, "code": code_fingerprint(source), "fingerprint": fingerprint}
+
+
+def write_snapshot_file(path: str, header: Dict, snapshot: CatalogSnapshot):
+    """Записать снимок атомарно (временный файл + rename); одинаковые тела записываются один раз"""
+    blobs = []
+    refs: Dict[int, Tuple] = {}
+
+    def add(blob) -> int:
+        blobs.append(blob)
+        return len(blobs) - 1
+
+    def ref(rendered: RenderedBody) -> Tuple:
+        found = refs.get(id(rendered))
+        if found is None:
+            found = refs[id(rendered)] = (
+                add(rendered.body), rendered.etag,
+                {encoding: add(data) for encoding, data in rendered.encoded.items()})
+        return found
+
+    meta = {
+        "header": header,
+        "responses": {key: ref(body) for key, body in snapshot.responses.items()},
+        "sections": ref(snapshot.sections),
+        "section_characteristics": {name: ref(body) for name, body in snapshot.section_characteristics.items()},
+        "plan_names": snapshot.plan_names,
+        "row_order": snapshot.row_order(),
+        "row_positions": snapshot.row_positions,
+        "row_digests": snapshot.row_digests,
+        "rows": [add(pickle.dumps(chars, protocol=5))
+                 for chars in zip(*(plan["характеристики"] for plan in snapshot.plans))],
+        "state": add(pickle.dumps(snapshot.export_state(), protocol=5)),
+    }
+    raw_meta = pickle.dumps(meta, protocol=5)
+    offset = _SNAPSHOT_HEAD.size + len(raw_meta) + _SNAPSHOT_ENTRY.size * len(blobs)
+    table = bytearray()
+    for blob in blobs:
+        table += _SNAPSHOT_ENTRY.pack(offset, len(blob))
+        offset += len(blob)
+    # Снимок публикуют все воркеры: у каждого процесса свой временный файл
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_SNAPSHOT_HEAD.pack(SNAPSHOT_MAGIC, len(raw_meta), len(blobs)))
+        f.write(raw_meta)
+        f.write(table)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_file(path: str, header: Dict) -> Optional[Tuple[Dict, List[memoryview]]]:
+    """
+    Отобразить файл снимка только для чтения: (метаданные, тела — срезы отображения), если
+    заголовок совпадает с ожидаемым (формат, код, контрольные суммы данных); иначе None.
+    Отображение живёт, пока на его срезы есть ссылки (снимок и ответы в процессе отправки).
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:  # ValueError — пустой файл
+        print(f"[CATALOG] Не удалось отобразить снимок каталога {path}: {e}")
+        return None
+    try:
+        magic, meta_length, count = _SNAPSHOT_HEAD.unpack_from(mapped, 0)
+        if magic != SNAPSHOT_MAGIC:
+            mapped.close()
+            return None  # файл прежнего формата
+        meta_end = _SNAPSHOT_HEAD.size + meta_length
+        meta = pickle.loads(mapped[_SNAPSHOT_HEAD.size:meta_end])
+        if meta.get("header") != header:
+            mapped.close()
+            return None
+        view = memoryview(mapped)
+        blobs = []
+        for i in range(count):
+            offset, length = _SNAPSHOT_ENTRY.unpack_from(mapped, meta_end + i * _SNAPSHOT_ENTRY.size)
+            if offset + length > len(mapped):
+                raise ValueError("файл обрезан")
+            blobs.append(view[offset:offset + length])
+        return meta, blobs
+    except Exception as e:  # повреждённый или обрезанный файл — просто собираем каталог заново
+        print(f"[CATALOG] Не удалось прочитать снимок каталога {path}: {e}")
+        return None
+
+
+class JsonFilesSource:
+    """Источник данных каталога: JSON файлы разделов в DATA_DIR"""
+
+    def signature(self) -> Tuple:
+        return get_data_signature()
+
+    def version(self) -> int:
+        """Общий счётчик версий: этот источник только читает файлы, изменения ловит наблюдатель"""
+        return 0
+
+    def fingerprint(self) -> Tuple:
+        """Контрольные суммы файлов в порядке загрузки (для проверки бинарного снимка)"""
+        return tuple((filename, file_fingerprint(os.path.join(DATA_DIR, filename)))
+                     for filename in get_all_json_files())
+
+    def load_files(self) -> List[Tuple[str, Dict]]:
+        # Порядок файлов — как у os.listdir, чтобы порядок характеристик не менялся
+        return [(filename, load_table_data(filename)) for filename in get_all_json_files()]
+
+
+class RefreshFlight(threading.Event):
+    """Идущая пересборка refresh(): событие завершения и ошибка ведущего вызова"""
+    error: Optional[BaseException] = None
+
+
+class PlanCatalog:
+    """
+    Каталог тарифов, общий для процесса.
+
+    Читатели получают текущий снимок через current(); новый снимок собирается
+    целиком в фоне и подменяется одной операцией присваивания.
+    """
+
+    def __init__(self, poll_interval: float = CATALOG_POLL_INTERVAL, source=None, snapshot_path: str = SNAPSHOT_FILE):
+        self.poll_interval = poll_interval
+        self.snapshot_path = snapshot_path
+        # Источник: signature() — отпечаток данных, load_files() — [(filename, file_data)],
+        # version() — общий для воркеров счётчик записей
+        self.source = source or JsonFilesSource()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        # Версии нумеруются заново в каждом процессе: epoch отличает курсоры разных запусков
+        self.epoch = uuid.uuid4().hex[:8]
+        self._changes = deque(maxlen=CATALOG_CHANGES_LIMIT)
+        self._listeners = []
+        self._build_lock = threading.Lock()
+        # Текущая пересборка refresh(): одновременные вызовы ждут её, а не собирают каталог сами
+        self._flight_lock = threading.Lock()
+        self._flight: Optional[RefreshFlight] = None
+        self._stats = {"builds": 0, "mapped": 0, "unchanged": 0, "coalesced": 0, "stale_served": 0,
+                       "rebuild_seconds_total": 0.0, "rebuild_seconds_max": 0.0}
+        self._stop_event = threading.Event()
+        # Запрошенная пересборка (request_refresh), которую ещё не начали
+        self._refresh_requested = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def add_listener(self, callback):
+        """Подписаться на новые снимки: callback(snapshot, change) после каждой пересборки (change — ChangeEntry)"""
+        self._listeners.append(callback)
+
+    def set_source(self, source):
+        """Сменить источник данных (например, на SQLite); следующая пересборка читает из него"""
+        self.source = source
+
+    def current(self) -> CatalogSnapshot:
+        """Текущий снимок каталога (сборка выполняется только если снимка ещё нет)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def is_stale(self) -> bool:
+        """Данные изменены другим воркером после сборки снимка (дешёвая проверка на каждый запрос)"""
+        snapshot = self._snapshot
+        return snapshot is not None and (self._refresh_requested.is_set() or
+                                         self.source.version() != snapshot.data_version)
+
+    def request_refresh(self):
+        """
+        Запросить пересборку после записи: её выполнит наблюдатель (с паузой на серию
+        правок) или первый запрос, который застанет снимок устаревшим. Запись не ждёт сборку.
+        """
+        self._refresh_requested.set()
+
+    def refresh(self) -> CatalogSnapshot:
+        """
+        Привести снимок к текущим данным (rebuild без force) одной сборкой на все
+        одновременные вызовы: пока сборка идёт, остальные ждут её результат.
+        """
+        with self._flight_lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = RefreshFlight()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            flight.wait()
+            # Если сборка упала, остаётся прежний снимок; без снимка — та же ошибка,
+            # а не повторная сборка в каждом ожидавшем потоке
+            snapshot = self._snapshot
+            if snapshot is None:
+                raise flight.error
+            return snapshot
+        try:
+            return self.rebuild(force=False)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flight_lock:
+                self._flight = None
+            flight.set()
+
+    @property
+    def built(self) -> bool:
+        """Снимок уже собран: current() вернёт его, не запуская сборку в вызывающем потоке"""
+        return self._snapshot is not None
+
+    @property
+    def refreshing(self) -> bool:
+        """Идёт пересборка refresh()"""
+        return self._flight is not None
+
+    def note_coalesced(self, stale: bool = False):
+        """Учесть запрос, который не стал запускать свою пересборку (дождался общей или получил прежний снимок)"""
+        with self._flight_lock:
+            self._stats["stale_served" if stale else "coalesced"] += 1
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        stats = dict(self._stats)
+        rebuilds = stats["builds"] + stats["mapped"]
+        stats["rebuild_seconds_avg"] = stats["rebuild_seconds_total"] / rebuilds if rebuilds else 0.0
+        stats.update(version=snapshot.version if snapshot else None,
+                     build_seconds=snapshot.build_seconds if snapshot else None,
+                     refreshing=self.refreshing)
+        return stats
+
+    def _record_build(self, snapshot: CatalogSnapshot, mapped: bool):
+        with self._flight_lock:
+            self._stats["mapped" if mapped else "builds"] += 1
+            self._stats["rebuild_seconds_total"] += snapshot.build_seconds
+            self._stats["rebuild_seconds_max"] = max(self._stats["rebuild_seconds_max"], snapshot.build_seconds)
+
+    def rebuild(self, force: bool = True) -> CatalogSnapshot:
+        """
+        Пересобрать каталог из файлов и атомарно заменить снимок. Без force сначала
+        проверяется опубликованный снимок: если его уже собрал другой воркер по тем же
+        данным, он только отображается в память.
+        """
+        with self._build_lock:
+            # Запросы, пришедшие после этой точки, потребуют следующей пересборки
+            self._refresh_requested.clear()
+            # Отпечаток и версию снимаем до чтения: если файл изменится во время сборки,
+            # наблюдатель (или проверка версии) увидит расхождение и пересоберёт каталог ещё раз
+            data_version = self.source.version()
+            signature = self.source.signature()
+            if not force and self._snapshot is not None and self._snapshot.signature == signature:
+                self._snapshot.data_version = data_version
+                self._stats["unchanged"] += 1
+                return self._snapshot
+            snapshot = None if force else self._map_published(signature)
+            if snapshot is not None:
+                self._record_build(snapshot, mapped=True)
+            else:
+                started = time.perf_counter()
+                files = self.source.load_files()
+                snapshot = CatalogSnapshot(self._version + 1, signature, files)
+                snapshot.build_seconds = time.perf_counter() - started
+                print(f"[CATALOG] Каталог v{snapshot.version} собран за {snapshot.build_seconds * 1000:.1f} мс ({len(files)} файлов)")
+                self._record_build(snapshot, mapped=False)
+                snapshot = self._publish(snapshot)
+            self._version = snapshot.version
+            snapshot.data_version = data_version
+            self._install(snapshot)
+            return snapshot
+
+    def _map_published(self, signature: Tuple, path: Optional[str] = None) -> Optional[CatalogSnapshot]:
+        """Отобразить опубликованный снимок, если он построен из текущих данных тем же кодом"""
+        path = self.snapshot_path if path is None else path
+        if not path:
+            return None
+        started = time.perf_counter()
+        loaded = read_snapshot_file(path, snapshot_header(self.source, self.source.fingerprint()))
+        if loaded is None:
+            return None
+        snapshot = CatalogSnapshot.from_file(self._version + 1, signature, *loaded)
+        snapshot.build_seconds = time.perf_counter() - started
+        print(f"[CATALOG] Каталог v{snapshot.version} отображён из общего снимка за {snapshot.build_seconds * 1000:.1f} мс")
+        return snapshot
+
+    def _publish(self, snapshot: CatalogSnapshot, path: Optional[str] = None) -> CatalogSnapshot:
+        """Записать собранный снимок в общий файл и перейти на его отображение; при ошибке — снимок в памяти"""
+        path = self.snapshot_path if path is None else path
+        if not path:
+            return snapshot
+        try:
+            header = snapshot_header(self.source, self.source.fingerprint())
+            # Данные могли измениться, пока считались контрольные суммы — такой снимок не публикуем
+            if self.source.signature() != snapshot.signature:
+                print("[CATALOG] Данные изменились во время сборки, снимок не опубликован")
+                return snapshot
+            write_snapshot_file(path, header, snapshot)
+        except OSError as e:
+            print(f"[CATALOG] Не удалось опубликовать снимок каталога: {e}")
+            return snapshot
+        loaded = read_snapshot_file(path, header)
+        if loaded is None:
+            return snapshot
+        mapped = CatalogSnapshot.from_file(snapshot.version, snapshot.signature, *loaded)
+        mapped.build_seconds = snapshot.build_seconds
+        return mapped
+
+    def _install(self, snapshot: CatalogSnapshot):
+        """Подменить текущий снимок (под блокировкой сборки) и уведомить подписчиков"""
+        change = None
+        if self._snapshot is not None:
+            change = diff_snapshots(self._snapshot, snapshot)
+            self._changes.append(change)
+        self._snapshot = snapshot
+        if change is not None:
+            # Под блокировкой сборки — подписчики получают версии по порядку
+            for callback in self._listeners:
+                try:
+                    callback(snapshot, change)
+                except Exception as e:
+                    print(f"[CATALOG] Ошибка в обработчике новой версии: {e}")
+
+    def load_snapshot(self, path: Optional[str] = None) -> Optional[CatalogSnapshot]:
+        """Отобразить опубликованный снимок, если он построен из тех же данных тем же кодом; иначе None"""
+        with self._build_lock:
+            data_version = self.source.version()
+            snapshot = self._map_published(self.source.signature(), path)
+            if snapshot is None:
+                return None
+            self._record_build(snapshot, mapped=True)
+            self._version = snapshot.version
+            snapshot.data_version = data_version
+            self._install(snapshot)
+            return snapshot
+
+    def save_snapshot(self, path: Optional[str] = None) -> bool:
+        """Опубликовать текущий снимок (при остановке сервера и из CLI); уже опубликованный не переписывается"""
+        path = self.snapshot_path if path is None else path
+        if not path:
+            return False
+        snapshot = self.refresh()
+        if snapshot.shared and path == self.snapshot_path:
+            return True
+        published = self._publish(snapshot, path)
+        if not published.shared:
+            return False
+        print(f"[CATALOG] Снимок каталога v{snapshot.version} сохранён в {path}")
+        return True
+
+    def warm_start(self) -> CatalogSnapshot:
+        """Старт из опубликованного снимка; если он устарел или повреждён — полная сборка и публикация"""
+        return self.load_snapshot() or self.rebuild()
+
+    def cursor(self, snapshot: CatalogSnapshot) -> str:
+        """Курсор версии снимка для /api/plans/changes"""
+        return f"{self.epoch}.{snapshot.version}"
+
+    def changes_since(self, since: str, fields: Optional[Tuple[str, ...]] = None) -> Dict:
+        """
+        Изменения каталога после версии since: строки с текущими данными (upserts),
+        удалённые id и новый порядок строк (если он менялся). resync=True — версия
+        неизвестна или уже вытеснена из журнала, клиенту нужно загрузить /api/plans целиком.
+        """
+        snapshot = self.current()
+        result = {"version": self.cursor(snapshot), "resync": False}
+        epoch, _, version = (since or "").partition(".")
+        if epoch != self.epoch or not version.isdigit() or int(version) > snapshot.version:
+            result["resync"] = True
+            return result
+        since_version = int(version)
+        entries = [entry for entry in list(self._changes) if since_version < entry.version <= snapshot.version]
+        if len(entries) != snapshot.version - since_version or any(entry.resync for entry in entries):
+            result["resync"] = True
+            return result
+        row_ids = set().union(*(entry.row_ids for entry in entries))
+        upserts = []
+        removed = []
+        for row_id in sorted(row_ids):
+            if row_id not in snapshot.row_positions:
+                removed.append(row_id)
+                continue
+            upserts.append({
+                "id": row_id,
+                "plans": {
+                    plan_name: char if fields is None else {field: char[field] for field in fields}
+                    for plan_name, char in zip(snapshot.plan_names, snapshot.row_values(row_id))
+                }
+            })
+        result["upserts"] = upserts
+        result["removed"] = removed
+        result["order"] = snapshot.row_order() if any(entry.order_changed for entry in entries) else None
+        return result
+
+    def start_watcher(self):
+        """Запустить фоновую проверку изменений файлов данных"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """Остановить фоновую проверку"""
+        self._stop_event.set()
+        self._refresh_requested.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval + 1)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop_event.is_set():
+            # Просыпается по таймеру или по запросу хранилища
+            if self._refresh_requested.wait(self.poll_interval):
+                self._stop_event.wait(CATALOG_REFRESH_DEBOUNCE)
+            if self._stop_event.is_set():
+                break
+            try:
+                snapshot = self._snapshot
+                if snapshot is None or self.is_stale() or self.source.signature() != snapshot.signature:
+                    self.refresh()
+            except Exception as e:
+                print(f"[CATALOG] Ошибка при проверке файлов данных: {e}")
+
+
+plan_catalog = PlanCatalog()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Каталог тарифов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compile_parser = subparsers.add_parser("compile", help="Собрать бинарный снимок каталога для быстрого старта")
+    compile_parser.add_argument("--backend", choices=["json", "sqlite"],
+                                default=os.environ.get("STORAGE_BACKEND", "json").lower(),
+                                help="Источник данных (как STORAGE_BACKEND у сервера)")
+    compile_parser.add_argument("--output", default=SNAPSHOT_FILE, help="Путь к файлу снимка")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        # Источник тот же, что у сервера: для json — с учётом несвёрнутых журналов
+        if args.backend == "sqlite":
+            from sqlite_store import SqliteSectionStore
+            source = SqliteSectionStore()
+        else:
+            from storage import SectionStore
+            source = SectionStore()
+        if not PlanCatalog(source=source, snapshot_path=args.output).save_snapshot():
+            raise SystemExit(1)
+        print(f"[CATALOG] Снимок каталога опубликован в {args.output}")
+
+
+if __name__ == "__main__":
+    # Классы в снимке должны ссылаться на модуль catalog, а не на __main__
+    import catalog
+    catalog.main()
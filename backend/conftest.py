@@ -0,0 +1,98 @@
+"""
+Общие фикстуры тестов: копия test_data/ во временной папке, хранилище разделов
+на ней (со своим счётчиком версий), источник каталога с одной таблицей в памяти
+и отдельный users.json для функций auth.
+"""
+import os
+import shutil
+import time
+
+import pytest
+
+import auth
+from section_registry import SectionRegistry
+from shared_version import SharedVersion
+from storage import JOURNAL_SUFFIX, SectionStore, find_table
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data")
+FILENAME = "srochnost.json"
+HEADER = {"grouping": "Группировка", "standard": "Стандарт", "expert": "Эксперт"}
+
+
+def open_store(data_dir: str) -> SectionStore:
+    """Хранилище как после запуска процесса (компактор не запускается)"""
+    registry = SectionRegistry(data_dir)
+    registry.rebuild()
+    return SectionStore(data_dir, registry, compact_interval=3600,
+                        shared_version=SharedVersion(os.path.join(data_dir, ".data.version")))
+
+
+def rows(store: SectionStore):
+    return find_table(store.read_file(FILENAME), "srochnost")["rows"]
+
+
+def row_by_grouping(store: SectionStore, grouping: str):
+    return next(row for row in rows(store) if row.get("grouping") == grouping)
+
+
+def journal_path(data_dir: str) -> str:
+    return os.path.join(data_dir, FILENAME + JOURNAL_SUFFIX)
+
+
+class TableSource:
+    """Источник каталога: одна таблица в памяти, version() меняется при «правке»"""
+
+    def __init__(self):
+        self.data_version = 1
+        self.reaction = "24 ч"
+        self.delay = 0.0  # медленная загрузка
+        self.error: Exception = None  # load_files() падает с этой ошибкой
+        self.loads = 0
+
+    def signature(self):
+        return (self.data_version,)
+
+    def version(self):
+        return self.data_version
+
+    def fingerprint(self):
+        return self.signature()
+
+    def load_files(self):
+        self.loads += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        rows = [HEADER,
+                {"row_id": "r1", "grouping": "Реакция", "standard": self.reaction, "expert": "2 ч",
+                 "personal_pain": "Скорость"},
+                {"row_id": "r2", "grouping": "Выезд", "standard": "-", "expert": "+", "objection": "Дорого"}]
+        return [(FILENAME, {"table_name": "srochnost", "rows": rows})]
+
+
+@pytest.fixture
+def data_dir(tmp_path) -> str:
+    """Копия test_data/ во временной папке"""
+    for filename in os.listdir(FIXTURE_DIR):
+        shutil.copy(os.path.join(FIXTURE_DIR, filename), tmp_path)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def store(data_dir) -> SectionStore:
+    return open_store(data_dir)
+
+
+@pytest.fixture
+def table_source() -> TableSource:
+    return TableSource()
+
+
+@pytest.fixture
+def users_file(tmp_path, monkeypatch) -> str:
+    """users.json во временной папке (без администратора по умолчанию) и свой справочник пользователей"""
+    path = os.path.join(tmp_path, "users.json")
+    monkeypatch.setattr(auth, "USERS_FILE", path)
+    monkeypatch.setattr(auth, "user_directory", auth.UserDirectory(path))
+    monkeypatch.setattr(auth, "_admin_bootstrapped", True)
+    return path
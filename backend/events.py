@@ -0,0 +1,115 @@
+"""
+Рассылка событий каталога по Server-Sent Events (/api/events).
+
+После каждой пересборки каталога подключённые клиенты получают короткое
+уведомление «версия N, изменены строки …» и сами забирают изменения через
+/api/plans/changes. У каждого клиента своя ограниченная очередь: если клиент
+не успевает читать, очередь очищается и ему уходит событие с resync=true.
+Простаивающий клиент — это одна корутина, ожидающая очередь, и heartbeat
+раз в EVENTS_HEARTBEAT_INTERVAL секунд.
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Dict, Optional, Set
+
+# Сколько потоков событий держит один воркер (остальным — 503)
+EVENTS_MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS", "1000"))
+# Сколько неотправленных событий копится на клиента до сброса в resync
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "16"))
+# Период heartbeat-комментария (секунды): держит соединение через прокси и выявляет отключения
+EVENTS_HEARTBEAT_INTERVAL = float(os.environ.get("EVENTS_HEARTBEAT_INTERVAL", "15"))
+
+HEARTBEAT = b": ping\n\n"
+
+
+def format_event(event: str, data: Dict, event_id: Optional[str] = None) -> bytes:
+    """Сообщение в формате text/event-stream"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class EventStream:
+    """Подписка одного клиента: очередь готовых сообщений в цикле событий клиента"""
+
+    __slots__ = ("loop", "queue")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message: bytes, resync_message: bytes):
+        """Положить сообщение в очередь (вызывается в цикле событий клиента)"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Медленный клиент: промежуточные события ему уже не помогут
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync_message)
+
+
+class EventBroadcaster:
+    """Подписчики потока событий одного воркера"""
+
+    def __init__(self, max_streams: int = EVENTS_MAX_STREAMS, queue_size: int = EVENTS_QUEUE_SIZE,
+                 heartbeat_interval: float = EVENTS_HEARTBEAT_INTERVAL):
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self._lock = threading.Lock()
+        self._streams: Set[EventStream] = set()
+
+    def count(self) -> int:
+        return len(self._streams)
+
+    def subscribe(self) -> Optional[EventStream]:
+        """Новая подписка в текущем цикле событий; None, если достигнут лимит потоков"""
+        stream = EventStream(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if len(self._streams) >= self.max_streams:
+                return None
+            self._streams.add(stream)
+        return stream
+
+    def unsubscribe(self, stream: EventStream):
+        with self._lock:
+            self._streams.discard(stream)
+
+    def publish(self, event: str, data: Dict, event_id: Optional[str] = None):
+        """
+        Разослать событие всем подписчикам. Можно вызывать из любого потока
+        (пересборка каталога идёт в пуле потоков); сообщение сериализуется один раз.
+        """
+        message = format_event(event, data, event_id)
+        resync_message = format_event(event, dict(data, resync=True), event_id)
+        with self._lock:
+            streams = list(self._streams)
+        for stream in streams:
+            try:
+                stream.loop.call_soon_threadsafe(stream.push, message, resync_message)
+            except RuntimeError:
+                # Цикл событий клиента уже закрыт (остановка воркера)
+                self.unsubscribe(stream)
+
+    async def iterate(self, stream: EventStream, initial: Optional[bytes] = None) -> AsyncIterator[bytes]:
+        """Сообщения для StreamingResponse: события из очереди и heartbeat при простое"""
+        try:
+            if initial:
+                yield initial
+            while True:
+                try:
+                    message = await asyncio.wait_for(stream.queue.get(), self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    message = HEARTBEAT
+                yield message
+        finally:
+            self.unsubscribe(stream)
+
+
+event_broadcaster = EventBroadcaster()
@@ -1,21 +1,72 @@
-from fastapi import FastAPI, Query, Body, Depends, HTTPException, status
+from startup import startup_timer
+from fastapi import FastAPI, Query, Body, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 import json
+import logging
 import os
+import re
 from typing import Optional, List, Dict
 from collections import defaultdict
 from pydantic import BaseModel
 from datetime import timedelta
+import asyncio
+startup_timer.checkpoint("import fastapi")
 
 # Импорты для аутентификации
 from auth import (
     User, UserCreate, UserUpdate, UserResponse, Token, TokenData,
     authenticate_user, create_user, get_user, update_user, load_users,
-    create_access_token, decode_access_token, UserRole,
-    get_current_user, get_current_active_user, get_current_active_admin_user
+    authenticate_user_async, create_user_async, get_user_async, password_pool,
+    create_access_token, decode_access_token, UserRole, token_cache,
+    get_current_user, get_current_active_user, get_current_active_admin_user,
+    get_current_stream_user, ensure_default_admin
 )
+startup_timer.checkpoint("import auth")
+from catalog import (
+    DATA_DIR, get_all_json_files, load_table_data,
+    deduplicate_pains, plan_catalog, RenderedBody, encoded_etag,
+    normalize_fields, normalize_sections, normalize_plan_names, CATALOG_STALE_WHILE_REVALIDATE
+)
+from section_registry import section_registry
+from events import event_broadcaster, format_event
+from search import catalog_search
+startup_timer.checkpoint("import catalog, registry, events")
+
+# Хранилище разделов: json (файлы в DATA_DIR, по умолчанию) или sqlite (см. sqlite_store.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+if STORAGE_BACKEND == "sqlite":
+    from sqlite_store import SqliteSectionStore
+    section_store = SqliteSectionStore()
+else:
+    from storage import section_store
+plan_catalog.set_source(section_store)
+startup_timer.checkpoint(f"import storage ({STORAGE_BACKEND})")
+
+# Запись только запрашивает пересборку: каталог соберёт наблюдатель или первый
+# запрос, который застанет снимок устаревшим (current_catalog)
+section_store.add_listener(lambda filenames: plan_catalog.request_refresh())
+
+
+def publish_catalog_change(snapshot, change):
+    """Уведомить подписчиков /api/events о новой версии каталога"""
+    if not (change.row_ids or change.order_changed or change.resync):
+        return  # пересборка без изменений тарифов (например, создан пустой раздел)
+    version = plan_catalog.cursor(snapshot)
+    event_broadcaster.publish("catalog", {
+        "version": version,
+        "changed": sorted(change.row_ids),
+        "order_changed": change.order_changed,
+        "resync": change.resync,
+    }, event_id=version)
+
+
+plan_catalog.add_listener(publish_catalog_change)
+# Поисковый индекс переиндексирует только изменённые строки
+plan_catalog.add_listener(catalog_search.apply)
 
 app = FastAPI(
     title="Sales Dashboard API",
@@ -24,12 +75,112 @@ app = FastAPI(
 )
 
 
+# Печатать все маршруты при старте (LOG_ROUTES=1); по умолчанию — только их число
+LOG_ROUTES = os.getenv("LOG_ROUTES", "").lower() in ("1", "true", "yes")
+
+
 @app.on_event("startup")
 async def startup_event():
-    """При старте выводим зарегистрированные маршруты"""
-    for route in app.routes:
-        if hasattr(route, "path") and hasattr(route, "methods"):
+    """
+    Подготовка хранилища и фоновый прогрев каталога. Воркер принимает соединения
+    сразу; запросы к каталогу дожидаются прогрева (см. current_catalog и /ready).
+    """
+    routes = [route for route in app.routes if hasattr(route, "path") and hasattr(route, "methods")]
+    if LOG_ROUTES:
+        for route in routes:
             print(f"[ROUTE] {list(route.methods)} {route.path}")
+    else:
+        print(f"[ROUTE] Зарегистрировано маршрутов: {len(routes)} (LOG_ROUTES=1 — вывести список)")
+    print(f"[STORAGE] Хранилище разделов: {STORAGE_BACKEND}")
+    if STORAGE_BACKEND != "sqlite":
+        # Несвёрнутые журналы (после сбоя) применяются до построения реестра
+        with startup_timer.phase("recover journals"):
+            await run_in_threadpool(section_store.recover)
+        with startup_timer.phase("section registry"):
+            await run_in_threadpool(section_registry.rebuild)
+    app.state.catalog_ready = asyncio.Event()
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+
+
+async def warm_up():
+    """Каталог (бинарный снимок или полная сборка) и администратор по умолчанию — в пуле потоков"""
+    try:
+        with startup_timer.phase("catalog warm start"):
+            snapshot, _ = await asyncio.gather(
+                run_in_threadpool(plan_catalog.warm_start),
+                run_in_threadpool(ensure_default_admin),
+            )
+        # Поисковый индекс строится в фоне и не задерживает готовность воркера
+        catalog_search.build_in_background(snapshot)
+    except Exception as e:
+        # Каталог соберётся при первом запросе (current_catalog, в пуле потоков)
+        print(f"[CATALOG] Ошибка прогрева каталога: {e}")
+    finally:
+        app.state.catalog_ready.set()
+        plan_catalog.start_watcher()
+        if STORAGE_BACKEND != "sqlite":
+            section_store.start_compactor()
+        startup_timer.ready()
+
+
+async def current_catalog():
+    """Текущий снимок каталога; до окончания прогрева запрос ждёт его, а не собирает каталог сам"""
+    ready = getattr(app.state, "catalog_ready", None)
+    if ready is not None and not ready.is_set():
+        await ready.wait()
+    # Данные изменил другой воркер. Проверка повторяется: общая пересборка,
+    # к которой присоединился запрос, могла начаться раньше этой правки
+    for _ in range(3):
+        if not plan_catalog.is_stale():
+            break
+        if CATALOG_STALE_WHILE_REVALIDATE:
+            # Предыдущая версия сразу, пересборка — в фоне (одна на процесс)
+            start_catalog_refresh()
+            plan_catalog.note_coalesced(stale=True)
+            break
+        try:
+            await asyncio.shield(start_catalog_refresh(joined=True))
+        except Exception:
+            break  # пересборка не удалась (ошибка уже в логе) — отдаём прежний снимок
+    if not plan_catalog.built:
+        # Снимка ещё нет (прогрев не удался): собираем в пуле потоков, не в цикле событий
+        return await asyncio.shield(start_catalog_refresh(joined=True))
+    return plan_catalog.current()
+
+
+def start_catalog_refresh(joined: bool = False) -> asyncio.Future:
+    """
+    Пересборка каталога в пуле потоков — одна задача на все одновременные запросы
+    процесса: остальные ждут её, не занимая потоки пула (см. также PlanCatalog.refresh)
+    """
+    task = getattr(app.state, "catalog_refresh", None)
+    if task is None or task.done():
+        task = app.state.catalog_refresh = asyncio.ensure_future(run_in_threadpool(plan_catalog.refresh))
+        task.add_done_callback(log_refresh_error)
+    elif joined:
+        plan_catalog.note_coalesced()
+    return task
+
+
+def log_refresh_error(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[CATALOG] Ошибка пересборки каталога: {task.exception()}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    warm_up_task = getattr(app.state, "warm_up_task", None)
+    if warm_up_task is not None and not warm_up_task.done():
+        await warm_up_task
+    plan_catalog.stop_watcher()
+    if STORAGE_BACKEND != "sqlite":
+        await run_in_threadpool(section_store.stop_compactor)
+    # После свёртки журналов: следующий старт загрузит каталог из снимка
+    try:
+        await run_in_threadpool(plan_catalog.save_snapshot)
+    except OSError as e:
+        print(f"[CATALOG] Не удалось сохранить снимок каталога: {e}")
+
 
 # Настройка CORS для работы с React фронтендом
 app.add_middleware(
@@ -38,356 +189,126 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Catalog-Version"],
 )
 
-# Маппинг названий тарифов
-PLAN_NAMES = {
-    "standard": "Стандарт",
-    "expert": "Эксперт",
-    "optimal": "Оптима",
-    "express": "Экспресс",
-    "ultra": "Ультра"
-}
-
-# Маппинг названий разделов (table_name -> читаемое название)
-TABLE_NAME_MAPPING = {
-    "gibkost": "Гибкость команды",
-    "srochnost": "Срочность",
-    "безопасность": "Безопасность",
-    "целевой сервис": "Целевой сервис",
-    "Бухгалтерия": "Бухгалтерия",
-    "Прозрачная отчетность": "Прозрачная отчетность",
-    "Конструкторское бюро": "Конструкторское бюро",
-    "gisp": "ГИСП",
-    "izmeneniya": "Изменения",
-    "tpp": "ТПП",
-    "podryadchiki": "Подрядчики",
-    "Подрядчики": "Подрядчики",
-    "kommunikacii": "Коммуникации",
-    "Коммуникации": "Коммуникации",
-    "podderjka": "Поддержка",
-    "Поддержка": "Поддержка"
-}
-
-# Список JSON файлов для загрузки
-def get_all_json_files() -> list:
-    """Получить список всех JSON файлов с данными (динамически)"""
-    backend_dir = os.path.dirname(__file__)
-    json_files = []
-    for filename in os.listdir(backend_dir):
-        if filename.endswith('.json') and filename != 'users.json':
-            json_files.append(filename)
-    return json_files
-
-
-# Для обратной совместимости - динамический список
-JSON_FILES = get_all_json_files()
-
-
-def load_table_data(filename: str) -> Dict:
-    """Загрузить данные из JSON файла таблицы"""
-    file_path = os.path.join(os.path.dirname(__file__), filename)
-    if not os.path.exists(file_path):
-        return None
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-VALID_PAIN_CATEGORIES = {"Легкость", "Безопасность", "Экономия", "Скорость"}
-
-
-def normalize_category(cat: str) -> str:
-    """Нормализация категорий болей"""
-    if not cat:
-        return ""
-    cat = cat.strip()
-    
-    # Если уже валидная категория — возвращаем как есть
-    if cat in VALID_PAIN_CATEGORIES:
-        return cat
-    
-    # Проверяем по началу строки (регистронезависимо)
-    lower = cat.lower()
-    
-    # Легкость
-    if lower.startswith("лёгк") or lower.startswith("легк") or lower.startswith("лек"):
-        return "Легкость"
-    
-    # Безопасность
-    if lower.startswith("безоп"):
-        return "Безопасность"
-    
-    # Экономия
-    if lower.startswith("эконом"):
-        return "Экономия"
-    
-    # Скорость
-    if lower.startswith("скор") or lower.startswith("срок"):
-        return "Скорость"
-    
-    # Если не распознано — возвращаем как есть (не теряем данные)
-    return cat
-
-
-def deduplicate_pains(pains_str: str) -> str:
-    """Нормализует и удаляет дубликаты из строки болей"""
-    if not pains_str:
-        return ""
-    parts = [normalize_category(p.strip()) for p in pains_str.split(",") if p.strip()]
-    # Убираем дубликаты, сохраняя порядок
-    seen = set()
-    unique = []
-    for cat in parts:
-        if cat and cat not in seen:
-            seen.add(cat)
-            unique.append(cat)
-    return ", ".join(unique)
-
-
-def expand_abbreviations(value: str) -> str:
-    """Расшифровка сокращений в значениях"""
-    if not value or value == "-" or value == "+":
-        return value
-    
-    value = value.strip()
-    
-    # Расшифровка сокращений с учетом чисел
-    import re
-    
-    # Мин/Макс с числами и "рд" (например: "Мин 10 рд" -> "Минимум 10 раз в день")
-    value = re.sub(r'Мин\s+(\d+)\s+рд', r'Минимум \1 раз в день', value, flags=re.IGNORECASE)
-    value = re.sub(r'Макс\s+(\d+)\s+рд', r'Максимум \1 раз в день', value, flags=re.IGNORECASE)
-    
-    # Общие замены (если не было совпадения выше)
-    if "Минимум" not in value and "Максимум" not in value:
-        value = re.sub(r'^Мин\s+', 'Минимум ', value, flags=re.IGNORECASE)
-        value = re.sub(r'^Макс\s+', 'Максимум ', value, flags=re.IGNORECASE)
-    
-    # Замены для "рд" (если еще не заменено)
-    if "раз в день" not in value:
-        value = re.sub(r'\s+рд\b', ' раз в день', value, flags=re.IGNORECASE)
-        value = value.replace(" р/д", " раз в день")
-        value = value.replace(" р.д.", " раз в день")
-        value = value.replace(" р.д", " раз в день")
-    
-    return value
+# Ответы меньше этого размера (байт) middleware не сжимает; ответы каталога сжаты заранее
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
 
 
-def convert_table_to_plans_format(table_data: Dict) -> List[Dict]:
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip, который пропускает пути потоков: буфер сжатия задерживал бы события до конца потока"""
+
+    def __init__(self, app, exclude_paths: tuple = (), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Сжатие остальных JSON ответов; ответы с готовым Content-Encoding (каталог) не трогаются
+app.add_middleware(StreamAwareGZipMiddleware, exclude_paths=("/api/events",),
+                   minimum_size=COMPRESS_MIN_SIZE, compresslevel=6)
+
+# Порядок предпочтения кодировок при одинаковом q
+PREFERRED_ENCODINGS = ("br", "gzip")
+
+
+def negotiate_encoding(request: Request, available) -> Optional[str]:
+    """Кодировка ответа по Accept-Encoding из доступных; None — без сжатия"""
+    accepted = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    best, best_q = None, 0.0
+    for encoding in PREFERRED_ENCODINGS:
+        if encoding not in available:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    if best is None and accepted.get("identity", accepted.get("*", 1.0)) <= 0:
+        # Несжатое тело клиент не принимает (identity;q=0): подойдёт кодировка, которую он не запретил явно
+        for encoding in PREFERRED_ENCODINGS:
+            if encoding in available and accepted.get(encoding, accepted.get("*", 1.0)) > 0:
+                return encoding
+    return best
+
+
+class CatalogBodyResponse(Response):
+    """Готовое тело из снимка каталога; срез общего снимка (memoryview) отправляется без копирования"""
+    media_type = "application/json"
+
+    def render(self, content):
+        return content
+
+
+def catalog_response(request: Request, cached: RenderedBody, version: Optional[str] = None) -> Response:
     """
-    Преобразовать данные из формата таблицы в формат планов
+    Ответ из каталога с ETag; 304, если у клиента уже есть эта версия данных.
+    Сжатое тело берётся готовым из снимка (br/gzip по Accept-Encoding).
+    version — курсор снимка для /api/plans/changes (заголовок X-Catalog-Version).
     """
-    if not table_data or "rows" not in table_data:
-        return []
-    
-    # Получаем название раздела с маппингом
-    raw_table_name = table_data.get("table_name", "Прочее")
-    table_name = TABLE_NAME_MAPPING.get(raw_table_name, raw_table_name)
-    # Если table_name не найден в маппинге, используем raw_table_name
-    if table_name == raw_table_name and raw_table_name not in TABLE_NAME_MAPPING:
-        # Пытаемся найти по имени файла (если передано)
-        pass
-    rows = table_data.get("rows", [])
-    
-    # Создаем структуру для каждого тарифа
-    plans_dict = {
-        "Стандарт": [],
-        "Эксперт": [],
-        "Оптима": [],
-        "Экспресс": [],
-        "Ультра": []
-    }
-    
-    # Пропускаем заголовки (первая строка обычно заголовок)
-    last_grouping = None  # Сохраняем последнее название для строк с пустым grouping
-    for row in rows:
-        grouping = row.get("grouping", "").strip() if row.get("grouping") else ""
-        
-        # Пропускаем строки-заголовки
-        if grouping in ["Группировка", "Характеристики 2"]:
-            continue
-        
-        # Если grouping пустой, но есть данные в других полях, используем последнее название
-        is_continuation = False
-        if not grouping:
-            # Проверяем, есть ли хотя бы одно значение тарифа
-            has_data = any([
-                row.get("standard"), row.get("expert"), row.get("optimal"),
-                row.get("express"), row.get("ultra")
-            ])
-            if has_data and last_grouping:
-                grouping = last_grouping
-                is_continuation = True  # Это продолжение предыдущей строки
-            else:
-                continue
-        else:
-            last_grouping = grouping  # Сохраняем для следующих строк
-        
-        # Извлекаем данные характеристики
-        characteristic_name = grouping
-        
-        # Если это продолжение строки "Сроки", определяем что это максимум по значениям
-        if is_continuation and last_grouping == "Сроки":
-            # Проверяем значения на наличие "Макс"
-            values = [row.get("standard"), row.get("expert"), row.get("optimal"), 
-                     row.get("express"), row.get("ultra")]
-            if any(v and "Макс" in str(v) for v in values):
-                characteristic_name = "Максимум сроков"
-        
-        # Собираем все категории личных болей (personal_pain + column11 + column12)
-        personal_pain_raw = []
-        if row.get("personal_pain"):
-            # Разбиваем строку по запятым
-            personal_pain_raw.extend(row.get("personal_pain").split(","))
-        if row.get("column11"):
-            personal_pain_raw.extend(row.get("column11").split(","))
-        if row.get("column12"):
-            personal_pain_raw.extend(row.get("column12").split(","))
-        # Нормализуем каждую категорию и убираем дубликаты
-        seen_personal = set()
-        unique_personal = []
-        for p in personal_pain_raw:
-            cat = normalize_category(p.strip()) if p else ""
-            if cat and cat not in seen_personal:
-                seen_personal.add(cat)
-                unique_personal.append(cat)
-        personal_pain = ", ".join(unique_personal)
-        
-        # Собираем все категории корпоративных болей (corporate_pain + column14 + column15 + column16)
-        corporate_pain_raw = []
-        if row.get("corporate_pain"):
-            # Разбиваем строку по запятым
-            corporate_pain_raw.extend(row.get("corporate_pain").split(","))
-        if row.get("column14"):
-            corporate_pain_raw.extend(row.get("column14").split(","))
-        if row.get("column15"):
-            corporate_pain_raw.extend(row.get("column15").split(","))
-        if row.get("column16"):
-            corporate_pain_raw.extend(row.get("column16").split(","))
-        # Нормализуем каждую категорию и убираем дубликаты
-        seen_corporate = set()
-        unique_corporate = []
-        for p in corporate_pain_raw:
-            cat = normalize_category(p.strip()) if p else ""
-            if cat and cat not in seen_corporate:
-                seen_corporate.add(cat)
-                unique_corporate.append(cat)
-        corporate_pain = ", ".join(unique_corporate)
-        
-        characteristics_desc = row.get("characteristics", "") or ""
-        advantages = row.get("advantages", "") or ""
-        questions = row.get("questions", "") or ""
-        objection = row.get("objection", "") or ""
-        
-        # Определяем, является ли это заголовком секции (только "Стоимость" и "Сроки", не продолжения)
-        is_section_header = characteristic_name in ["Стоимость", "Сроки"] and not is_continuation
-        
-        # Добавляем характеристику в каждый тариф с соответствующим значением
-        for plan_key, plan_name in PLAN_NAMES.items():
-            value = row.get(plan_key, "-") or "-"
-            
-            # Удаляем формулы Excel (начинающиеся с =)
-            if isinstance(value, str) and value.strip().startswith("="):
-                value = "-"
-            
-            # Расшифровываем сокращения
-            expanded_value = expand_abbreviations(value)
-            
-            char_data = {
-                "раздел": table_name,
-                "характеристика": characteristic_name,
-                "описание": advantages or characteristics_desc,  # Используем advantages как описание
-                "значение": expanded_value,
-                "возражения": objection,
-                "сравнение": "",  # Можно добавить из column6 если нужно
-                "сомнения": questions,  # Вопросы идут в сомнения
-                "личные_боли": personal_pain,
-                "корпоративные_боли": corporate_pain,
-                "вопросы": questions,  # Сохраняем вопросы отдельно
-                "is_section_header": is_section_header,  # Флаг заголовка секции
-                "raw_value": value  # Сохраняем исходное значение для прогресс-бара
-            }
-            
-            plans_dict[plan_name].append(char_data)
-    
-    # Преобразуем в список планов
-    plans = []
-    for plan_name, characteristics in plans_dict.items():
-        if characteristics:  # Добавляем только если есть характеристики
-            plans.append({
-                "название": plan_name,
-                "цена": get_plan_price(plan_name),
-                "характеристики": characteristics
-            })
-    
-    return plans
+    encoding = negotiate_encoding(request, cached.encoded)
+    etag = encoded_etag(cached.etag, encoding)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if version:
+        headers["X-Catalog-Version"] = version
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        # Любой вариант того же тела считается актуальным (клиент мог сменить Accept-Encoding)
+        variants = {cached.etag} | {encoded_etag(cached.etag, name) for name in cached.encoded}
+        if "*" in tags or tags & variants:
+            return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return CatalogBodyResponse(content=cached.encoded[encoding], headers=headers)
+    return CatalogBodyResponse(content=cached.body, headers=headers)
 
 
-def get_plan_price(plan_name: str) -> str:
-    """Получить цену тарифа (пока заглушка, можно вынести в отдельный файл)"""
-    prices = {
-        "Стандарт": "220000",
-        "Эксперт": "400000",
-        "Оптима": "600000",
-        "Экспресс": "900000",
-        "Ультра": "1350000"
-    }
-    return prices.get(plan_name, "0")
+# Токен в адресе (?token=... у /api/events) не попадает в логи
+TOKEN_IN_URL = re.compile(r"([?&]token=)[^&\s]*")
 
 
-def load_all_plans() -> List[Dict]:
-    """Загрузить все тарифы из всех JSON файлов и объединить"""
-    all_plans_dict = {
-        "Стандарт": [],
-        "Эксперт": [],
-        "Оптима": [],
-        "Экспресс": [],
-        "Ультра": []
-    }
-    
-    # Загружаем данные из всех файлов
-    for filename in JSON_FILES:
-        file_data = load_table_data(filename)
-        if not file_data:
-            continue
-        
-        # Проверяем, является ли файл массивом таблиц (как buhotch.json)
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            # Обрабатываем каждую таблицу в массиве
-            for table_data in file_data["tables"]:
-                plans = convert_table_to_plans_format(table_data)
-                # Объединяем характеристики по тарифам
-                for plan in plans:
-                    plan_name = plan["название"]
-                    if plan_name in all_plans_dict:
-                        all_plans_dict[plan_name].extend(plan["характеристики"])
-        else:
-            # Обычный формат с одной таблицей
-            plans = convert_table_to_plans_format(file_data)
-            # Объединяем характеристики по тарифам
-            for plan in plans:
-                plan_name = plan["название"]
-                if plan_name in all_plans_dict:
-                    all_plans_dict[plan_name].extend(plan["характеристики"])
-    
-    # Преобразуем в список планов
-    result_plans = []
-    for plan_name, characteristics in all_plans_dict.items():
-        if characteristics:
-            result_plans.append({
-                "название": plan_name,
-                "цена": get_plan_price(plan_name),
-                "характеристики": characteristics
-            })
-    
-    return result_plans
+def redact_url(url: str) -> str:
+    return TOKEN_IN_URL.sub(r"\1***", url)
+
+
+class RedactTokenFilter(logging.Filter):
+    """Фильтр журнала доступа uvicorn: путь с параметрами пишется без токена"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple):
+            record.args = tuple(redact_url(arg) if isinstance(arg, str) else arg for arg in record.args)
+        return True
+
+
+logging.getLogger("uvicorn.access").addFilter(RedactTokenFilter())
 
 
 @app.middleware("http")
 async def log_requests(request, call_next):
-    print(f"[REQUEST] {request.method} {request.url.path}")
+    path = redact_url(str(request.url.path) + (f"?{request.url.query}" if request.url.query else ""))
+    print(f"[REQUEST] {request.method} {path}")
     response = await call_next(request)
-    print(f"[RESPONSE] {request.method} {request.url.path} - {response.status_code}")
+    print(f"[RESPONSE] {request.method} {path} - {response.status_code}")
     return response
 
 @app.get("/")
@@ -400,11 +321,32 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность воркера: каталог прогрет (для балансировщика; /health — только «жив»)"""
+    ready = getattr(app.state, "catalog_ready", None)
+    if ready is not None and not ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
+
 @app.get("/api/version", tags=["Meta"])
 async def api_version():
     """Версия API для проверки соответствия проду и локальной сборке."""
     return {"app": "HPV", "version": "1.0.0"}
 
+@app.get("/api/metrics", tags=["Meta"])
+async def api_metrics(current_user: User = Depends(get_current_active_admin_user)):
+    """Внутренние счётчики процесса (кэши и каталог)"""
+    await current_catalog()
+    return {
+        "catalog": plan_catalog.stats(),
+        "startup": startup_timer.stats(),
+        "token_cache": token_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "search": catalog_search.stats()
+    }
+
 @app.get("/api/test-create")
 async def test_create_endpoint():
     """Тестовый endpoint для проверки доступности /api/users/create"""
@@ -423,7 +365,7 @@ class LoginBody(BaseModel):
 @app.post("/api/login", tags=["Authentication"])
 async def login_json(body: LoginBody):
     """Вход по JSON (username, password) — альтернатива /api/token"""
-    user = authenticate_user(body.username, body.password)
+    user = await authenticate_user_async(body.username, body.password)
     if not user:
         raise HTTPException(status_code=401, detail="Неверный логин или пароль")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -439,10 +381,10 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     """Вход в систему"""
     try:
         print(f"Попытка входа: username={form_data.username}")
-        user = authenticate_user(form_data.username, form_data.password)
+        user = await authenticate_user_async(form_data.username, form_data.password)
         if not user:
             # Проверяем, существует ли пользователь
-            db_user = get_user(form_data.username)
+            db_user = await get_user_async(form_data.username)
             if not db_user:
                 print(f"Пользователь {form_data.username} не найден в базе")
                 raise HTTPException(
@@ -496,10 +438,10 @@ async def create_user_by_admin(
     """Создание нового пользователя (только для администратора)"""
     try:
         print(f"[DEBUG] Создание пользователя: {user_create.username}")
-        db_user = get_user(user_create.username)
+        db_user = await get_user_async(user_create.username)
         if db_user:
             raise HTTPException(status_code=400, detail="Имя пользователя уже зарегистрировано")
-        new_user = create_user(user_create)
+        new_user = await create_user_async(user_create)
         print(f"[DEBUG] Пользователь создан успешно: {new_user.username}")
         # Возвращаем простой ответ
         return {
@@ -534,7 +476,7 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 @app.get("/api/users", tags=["Admin"])
 async def get_all_users(current_user: User = Depends(get_current_active_admin_user)):
     """Получить список всех пользователей"""
-    users = load_users()
+    users = await run_in_threadpool(load_users)
     result = []
     for username, user_data in users.items():
         result.append({
@@ -552,11 +494,11 @@ async def update_user_role(
     current_user: User = Depends(get_current_active_admin_user)
 ):
     """Обновить роль пользователя"""
-    user = get_user(username)
+    user = await get_user_async(username)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     user.role = new_role
-    updated_user = update_user(user)
+    updated_user = await run_in_threadpool(update_user, user)
     return {
         "username": updated_user.username,
         "email": updated_user.email,
@@ -576,11 +518,11 @@ async def update_user_status(
             status_code=400,
             detail="Нельзя заблокировать самого себя"
         )
-    user = get_user(username)
+    user = await get_user_async(username)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     user.is_active = is_active
-    updated_user = update_user(user)
+    updated_user = await run_in_threadpool(update_user, user)
     return {
         "username": updated_user.username,
         "email": updated_user.email,
@@ -591,8 +533,13 @@ async def update_user_status(
 
 @app.get("/api/plans", tags=["Plans"])
 async def get_plans(
+    request: Request,
     pain_type: Optional[str] = Query(None, description="Тип боли: personal или corporate"),
     categories: Optional[str] = Query(None, description="Категории через запятую: Легкость,Безопасность,Экономия,Скорость"),
+    format: Optional[str] = Query(None, description="compact — каждая характеристика один раз, значения тарифов массивом"),
+    fields: Optional[str] = Query(None, description="Поля характеристик через запятую (id включается всегда)"),
+    sections: Optional[str] = Query(None, description="Только эти разделы, через запятую"),
+    plans: Optional[str] = Query(None, description="Только эти тарифы (Стандарт или standard), через запятую"),
     current_user: User = Depends(get_current_active_user)  # Требуется авторизация
 ):
     """
@@ -600,67 +547,120 @@ async def get_plans(
     
     - pain_type: 'personal' для личных болей, 'corporate' для корпоративных
     - categories: список категорий через запятую
+    - format: 'compact' — компактный формат (см. catalog.compact_plans)
+    - fields, sections, plans: проекция полей и выборка разделов/тарифов
     """
-    from fastapi import Response
-    all_plans = load_all_plans()
-    
-    # Если фильтры не указаны, возвращаем все тарифы
-    if not pain_type and not categories:
-        return {"plans": all_plans}
-    
-    # Применяем фильтры
-    filtered_plans = []
-    category_list = [c.strip() for c in categories.split(",")] if categories else []
-    
-    for plan in all_plans:
-        filtered_characteristics = []
-        
-        for char in plan.get("характеристики", []):
-            should_include = True
-            
-            # Фильтр по типу боли
-            if pain_type:
-                if pain_type == "personal":
-                    pain_field = char.get("личные_боли", "")
-                else:  # corporate
-                    pain_field = char.get("корпоративные_боли", "")
-                
-                if not pain_field or not pain_field.strip():
-                    should_include = False
-                elif category_list:
-                    # Проверяем, есть ли хотя бы одна категория в поле боли
-                    pain_categories = [normalize_category(c) for c in pain_field.split(",") if c.strip()]
-                    normalized_category_list = [normalize_category(cat) for cat in category_list]
-                    # Проверяем пересечение списков
-                    if not set(normalized_category_list) & set(pain_categories):
-                        should_include = False
-            elif category_list:
-                # Если указаны только категории, проверяем оба типа болей
-                personal_pain = char.get("личные_боли", "")
-                corporate_pain = char.get("корпоративные_боли", "")
-                
-                personal_categories = [normalize_category(c) for c in personal_pain.split(",") if personal_pain and c.strip()]
-                corporate_categories = [normalize_category(c) for c in corporate_pain.split(",") if corporate_pain and c.strip()]
-                
-                all_categories = personal_categories + corporate_categories
-                normalized_category_list = [normalize_category(cat) for cat in category_list]
-                if not set(normalized_category_list) & set(all_categories):
-                    should_include = False
-            
-            if should_include:
-                filtered_characteristics.append(char)
-        
-        # Добавляем план только если есть отфильтрованные характеристики
-        if filtered_characteristics:
-            plan_copy = plan.copy()
-            plan_copy["характеристики"] = filtered_characteristics
-            filtered_plans.append(plan_copy)
-    
-    response = JSONResponse(content={"plans": filtered_plans})
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    return response
+    if format not in (None, "", "compact"):
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {format}")
+    try:
+        selection = {
+            "fields": normalize_fields(fields),
+            "sections": normalize_sections(sections),
+            "plan_names": normalize_plan_names(plans),
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Ответ уже сериализован при сборке каталога для каждой комбинации фильтров;
+    # остальные выборки собираются и сжимаются в пуле потоков, а не в event loop
+    snapshot = await current_catalog()
+    compact = format == "compact"
+    body = snapshot.cached_plans_response(pain_type, categories, compact=compact, **selection)
+    if body is None:
+        body = await run_in_threadpool(snapshot.plans_response, pain_type, categories, compact, **selection)
+    return catalog_response(request, body, version=plan_catalog.cursor(snapshot))
+
+
+@app.get("/api/plans/changes", tags=["Plans"])
+async def get_plans_changes(
+    since: str = Query(..., description="Версия из заголовка X-Catalog-Version (или из прошлого ответа)"),
+    fields: Optional[str] = Query(None, description="Поля характеристик через запятую (как в /api/plans)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Изменения каталога после версии since: upserts — строки с текущими значениями
+    по тарифам, removed — удалённые id, order — новый порядок id (или null).
+    resync=true — версия слишком старая, нужно загрузить /api/plans целиком.
+    """
+    try:
+        selected_fields = normalize_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await current_catalog()
+    return plan_catalog.changes_since(since, selected_fields)
+
+
+@app.get("/api/events", tags=["Plans"])
+async def catalog_events(current_user: User = Depends(get_current_stream_user)):
+    """
+    Поток событий каталога (text/event-stream). Токен — в заголовке Authorization
+    или в параметре token (EventSource не передаёт заголовки).
+
+    Сразу после подключения приходит текущая версия, затем событие catalog на каждую
+    правку: version, changed (id строк), order_changed, resync. Сами данные
+    забираются через /api/plans/changes.
+    """
+    stream = event_broadcaster.subscribe()
+    if stream is None:
+        raise HTTPException(status_code=503, detail="Слишком много подключений к потоку событий",
+                            headers={"Retry-After": "30"})
+    streaming = False
+    try:
+        version = plan_catalog.cursor(await current_catalog())
+        initial = format_event("catalog", {"version": version, "changed": [], "order_changed": False,
+                                           "resync": False}, event_id=version)
+        response = StreamingResponse(
+            event_broadcaster.iterate(stream, initial),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        streaming = True
+        return response
+    finally:
+        # Подписку снимает iterate() по окончании потока; если поток не начался
+        # (ошибка каталога, отмена запроса) — здесь
+        if not streaming:
+            event_broadcaster.unsubscribe(stream)
+
+
+@app.get("/api/plans/{plan}/characteristics/{row_id}", tags=["Plans"])
+async def get_plan_characteristic(
+    plan: str,
+    row_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Полная характеристика тарифа по id строки (возражения, вопросы и т.д. для карточки)"""
+    characteristic = (await current_catalog()).characteristic(plan, row_id)
+    if characteristic is None:
+        raise HTTPException(status_code=404, detail="Характеристика не найдена")
+    return characteristic
+
+
+@app.get("/api/search", tags=["Plans"])
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска (последнее можно не дописывать)"),
+    limit: int = Query(20, ge=1, le=100, description="Сколько строк вернуть"),
+    sections: Optional[str] = Query(None, description="Искать только в этих разделах, через запятую"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Поиск по характеристикам, описаниям, возражениям, вопросам и значениям тарифов.
+
+    results — строки каталога по убыванию релевантности: id, раздел, характеристика,
+    score и highlights (поле, тариф для значений, фрагмент текста и позиции
+    совпадений [начало, конец) для подсветки). Полностью — /api/plans/{plan}/characteristics/{id}.
+    """
+    try:
+        selected_sections = normalize_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    snapshot = await current_catalog()
+    if catalog_search.version is None:
+        # Индекс ещё строится после старта; дальше поиск не ждёт пересборок индекса
+        await run_in_threadpool(catalog_search.ensure, snapshot)
+    # Поиск — в пуле потоков: индекс под блокировкой, пока apply() переиндексирует строки
+    result = await run_in_threadpool(catalog_search.search, q, limit, selected_sections)
+    result["version"] = plan_catalog.cursor(snapshot)
+    return result
 
 
 # Модель для обновления значения
@@ -670,78 +670,12 @@ class UpdateValueRequest(BaseModel):
     plan_name: Optional[str] = None  # Название тарифа (например, "Стандарт"), опционально для description/questions
     new_value: str  # Новое значение
     field_type: Optional[str] = "value"  # Тип поля: "value", "description", "advantages", "questions", etc.
-
-
-def find_row_in_json(file_data: Dict, section: str, characteristic: str) -> Optional[Dict]:
-    """Найти строку в JSON по разделу и характеристике"""
-    rows = file_data.get("rows", [])
-    last_grouping = None
-    
-    for row in rows:
-        grouping = row.get("grouping", "").strip()
-        
-        # Если это заголовок секции (Стоимость, Сроки), используем его
-        if grouping in ["Стоимость", "Сроки"]:
-            if characteristic == grouping:
-                return row
-            last_grouping = grouping
-        # Если это обычная характеристика
-        elif grouping and grouping not in ["Группировка", "Стоимость", "Сроки"]:
-            if grouping == characteristic:
-                return row
-            last_grouping = grouping
-        # Если grouping пустой, но есть данные - это может быть "Максимум сроков"
-        elif not grouping and last_grouping:
-            has_data = any(row.get(key) for key in ["standard", "expert", "optimal", "express", "ultra"])
-            if has_data:
-                # Специальный случай: "Максимум сроков" - строка после "Сроки" с "Макс" в значениях
-                if characteristic == "Максимум сроков" and last_grouping == "Сроки":
-                    values = [row.get("standard"), row.get("expert"), row.get("optimal"), 
-                             row.get("express"), row.get("ultra")]
-                    if any(v and "Макс" in str(v) for v in values):
-                        return row
-                # Обычное продолжение строки
-                elif last_grouping == characteristic:
-                    return row
-    
-    return None
-
-
-def get_plan_key(plan_name: str) -> str:
-    """Преобразовать название тарифа в ключ JSON"""
-    plan_mapping = {
-        "Стандарт": "standard",
-        "Эксперт": "expert",
-        "Оптима": "optimal",
-        "Экспресс": "express",
-        "Ультра": "ultra"
-    }
-    return plan_mapping.get(plan_name, plan_name.lower())
+    row_id: Optional[str] = None  # id строки; если указан, строка ищется по нему, а не по названию
 
 
 def get_section_filename(section: str) -> Optional[str]:
-    """Найти имя файла по названию раздела (полностью динамический поиск)"""
-    # Динамический поиск во всех JSON файлах
-    backend_dir = os.path.dirname(__file__)
-    for filename in os.listdir(backend_dir):
-        if filename.endswith('.json') and filename != 'users.json':
-            file_path = os.path.join(backend_dir, filename)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Проверяем структуру с несколькими таблицами
-                if "tables" in data and isinstance(data["tables"], list):
-                    for table in data["tables"]:
-                        if table.get("table_name") == section:
-                            return filename
-                # Проверяем структуру с одной таблицей
-                elif data.get("table_name") == section:
-                    return filename
-            except:
-                continue
-    
-    return None
+    """Найти имя файла по названию раздела (у выбранного хранилища разделов)"""
+    return section_store.get_filename(section)
 
 
 # Эндпоинты редактирования (только для администраторов)
@@ -752,78 +686,15 @@ async def update_value(
 ):
     """Обновить значение в дашборде (только для администраторов)"""
     try:
-        section_filename = get_section_filename(request.section)
-        if not section_filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{request.section}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), section_filename)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail=f"Файл для раздела '{request.section}' не найден")
-        
-        # Загружаем файл
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_data = json.load(f)
-        
-        # Проверяем, является ли файл массивом таблиц
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            # Ищем нужную таблицу
-            found = False
-            for table_data in file_data["tables"]:
-                row = find_row_in_json(table_data, request.section, request.characteristic)
-                if row:
-                    found = True
-                    # Обновляем значение
-                    if request.field_type == "value" and request.plan_name:
-                        plan_key = get_plan_key(request.plan_name)
-                        row[plan_key] = request.new_value
-                    elif request.field_type == "description":
-                        row["advantages"] = request.new_value
-                    elif request.field_type == "questions":
-                        row["questions"] = request.new_value
-                    elif request.field_type == "personal_pain":
-                        row["personal_pain"] = deduplicate_pains(request.new_value)
-                        # Очищаем дополнительные колонки чтобы избежать дублирования
-                        row["column11"] = ""
-                        row["column12"] = ""
-                    elif request.field_type == "corporate_pain":
-                        row["corporate_pain"] = deduplicate_pains(request.new_value)
-                        # Очищаем дополнительные колонки чтобы избежать дублирования
-                        row["column14"] = ""
-                        row["column15"] = ""
-                        row["column16"] = ""
-                    break
-            if not found:
-                raise HTTPException(status_code=404, detail="Характеристика не найдена")
+        if request.row_id:
+            await section_store.update_value_by_id(
+                request.row_id, request.new_value, field_type=request.field_type, plan_name=request.plan_name
+            )
         else:
-            # Обычный формат с одной таблицей
-            row = find_row_in_json(file_data, request.section, request.characteristic)
-            if not row:
-                raise HTTPException(status_code=404, detail="Характеристика не найдена")
-            
-            # Обновляем значение
-            if request.field_type == "value" and request.plan_name:
-                plan_key = get_plan_key(request.plan_name)
-                row[plan_key] = request.new_value
-            elif request.field_type == "description":
-                row["advantages"] = request.new_value
-            elif request.field_type == "questions":
-                row["questions"] = request.new_value
-            elif request.field_type == "personal_pain":
-                row["personal_pain"] = deduplicate_pains(request.new_value)
-                # Очищаем дополнительные колонки чтобы избежать дублирования
-                row["column11"] = ""
-                row["column12"] = ""
-            elif request.field_type == "corporate_pain":
-                row["corporate_pain"] = deduplicate_pains(request.new_value)
-                # Очищаем дополнительные колонки чтобы избежать дублирования
-                row["column14"] = ""
-                row["column15"] = ""
-                row["column16"] = ""
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, ensure_ascii=False, indent=2)
-        
+            await section_store.update_value(
+                request.section, request.characteristic, request.new_value,
+                field_type=request.field_type, plan_name=request.plan_name
+            )
         return {"success": True, "message": "Значение успешно обновлено"}
     except HTTPException:
         raise
@@ -834,6 +705,25 @@ async def update_value(
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении: {str(e)}")
 
 
+@app.put("/api/update-values", tags=["Admin"])
+async def update_values(
+    updates: List[UpdateValueRequest],
+    current_user: User = Depends(get_current_active_admin_user)
+):
+    """Обновить несколько значений за один запрос: все или ни одного, каждый файл записывается один раз
+    (только для администраторов)"""
+    try:
+        results = await section_store.update_values([update.model_dump() for update in updates])
+        return {"success": True, "message": f"Обновлено значений: {len(results)}", "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Ошибка при пакетном обновлении значений: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Ошибка при обновлении: {str(e)}")
+
+
 # ===== API для управления разделами =====
 
 class CreateSectionRequest(BaseModel):
@@ -857,55 +747,10 @@ class CreateCharacteristicRequest(BaseModel):
     corporate_pain: str = ""  # Корпоративные боли
 
 
-def section_name_to_filename(section_name: str) -> str:
-    """Преобразовать название раздела в имя файла"""
-    # Транслитерация и очистка
-    translit_map = {
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-        ' ': '_', '-': '_'
-    }
-    result = []
-    for char in section_name.lower():
-        if char in translit_map:
-            result.append(translit_map[char])
-        elif char.isalnum():
-            result.append(char)
-    return ''.join(result) + '.json'
-
-
 @app.get("/api/sections", tags=["Sections"])
-async def get_all_sections(current_user: User = Depends(get_current_active_user)):
+async def get_all_sections(request: Request, current_user: User = Depends(get_current_active_user)):
     """Получить список всех разделов"""
-    sections = []
-    # Динамически получаем список файлов при каждом запросе
-    for filename in get_all_json_files():
-        file_data = load_table_data(filename)
-        if not file_data:
-            continue
-        
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            for table_data in file_data["tables"]:
-                table_name = table_data.get("table_name", "")
-                if table_name:
-                    sections.append({
-                        "name": table_name,
-                        "filename": filename,
-                        "characteristics_count": len(table_data.get("rows", [])) - 1  # -1 for header
-                    })
-        else:
-            table_name = file_data.get("table_name", "")
-            if table_name:
-                sections.append({
-                    "name": table_name,
-                    "filename": filename,
-                    "characteristics_count": len(file_data.get("rows", [])) - 1
-                })
-    
-    return {"sections": sections}
+    return catalog_response(request, (await current_catalog()).sections)
 
 
 @app.post("/api/sections", tags=["Sections"])
@@ -915,48 +760,7 @@ async def create_section(
 ):
     """Создать новый раздел (только для администраторов)"""
     try:
-        # Проверяем, что раздел не существует
-        existing = get_section_filename(request.name)
-        if existing:
-            raise HTTPException(status_code=400, detail=f"Раздел '{request.name}' уже существует")
-        
-        # Создаем имя файла
-        filename = section_name_to_filename(request.name)
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        # Проверяем, что файл не существует
-        if os.path.exists(file_path):
-            raise HTTPException(status_code=400, detail=f"Файл '{filename}' уже существует")
-        
-        # Создаем структуру JSON для нового раздела
-        new_section = {
-            "table_name": request.name,
-            "sheet_name": "Лист1",
-            "rows": [
-                {
-                    "grouping": "Группировка",
-                    "objection": "Возражения",
-                    "personal_pain": "Боли личные",
-                    "corporate_pain": "Боли корп",
-                    "standard": "Стандарт",
-                    "expert": "Эксперт",
-                    "optimal": "Оптима",
-                    "express": "Экспресс",
-                    "ultra": "Ультра",
-                    "advantages": "Преимущества",
-                    "questions": "Вопросы"
-                }
-            ]
-        }
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(new_section, f, ensure_ascii=False, indent=2)
-        
-        # Добавляем в список файлов и маппинг
-        if filename not in JSON_FILES:
-            JSON_FILES.append(filename)
-        
+        filename = await section_store.create_section(request.name)
         return {"success": True, "message": f"Раздел '{request.name}' успешно создан", "filename": filename}
     except HTTPException:
         raise
@@ -974,36 +778,7 @@ async def delete_section(
 ):
     """Удалить раздел со всеми характеристиками (только для администраторов)"""
     try:
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        # Проверяем, содержит ли файл несколько таблиц
-        file_data = load_table_data(filename)
-        if file_data and "tables" in file_data and isinstance(file_data["tables"], list):
-            # Файл содержит несколько таблиц - удаляем только нужную
-            new_tables = [t for t in file_data["tables"] if t.get("table_name") != section_name]
-            if len(new_tables) == len(file_data["tables"]):
-                raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден в файле")
-            
-            if new_tables:
-                # Сохраняем оставшиеся таблицы
-                file_data["tables"] = new_tables
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(file_data, f, ensure_ascii=False, indent=2)
-            else:
-                # Удаляем файл, если таблиц больше нет
-                os.remove(file_path)
-                if filename in JSON_FILES:
-                    JSON_FILES.remove(filename)
-        else:
-            # Файл содержит одну таблицу - удаляем весь файл
-            os.remove(file_path)
-            if filename in JSON_FILES:
-                JSON_FILES.remove(filename)
-        
+        await section_store.delete_section(section_name)
         return {"success": True, "message": f"Раздел '{section_name}' успешно удален"}
     except HTTPException:
         raise
@@ -1022,38 +797,7 @@ async def rename_section(
 ):
     """Переименовать раздел (только для администраторов)"""
     try:
-        # Проверяем, что раздел существует
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        # Проверяем, что новое имя не занято
-        if request.new_name != section_name:
-            existing = get_section_filename(request.new_name)
-            if existing:
-                raise HTTPException(status_code=400, detail=f"Раздел '{request.new_name}' уже существует")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        file_data = load_table_data(filename)
-        
-        if file_data and "tables" in file_data and isinstance(file_data["tables"], list):
-            # Файл содержит несколько таблиц - переименовываем нужную
-            found = False
-            for table in file_data["tables"]:
-                if table.get("table_name") == section_name:
-                    table["table_name"] = request.new_name
-                    found = True
-                    break
-            if not found:
-                raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден в файле")
-        else:
-            # Файл содержит одну таблицу
-            file_data["table_name"] = request.new_name
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, ensure_ascii=False, indent=2)
-        
+        await section_store.rename_section(section_name, request.new_name)
         return {"success": True, "message": f"Раздел переименован в '{request.new_name}'"}
     except HTTPException:
         raise
@@ -1072,15 +816,6 @@ async def add_characteristic(
 ):
     """Добавить характеристику в раздел (только для администраторов)"""
     try:
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_data = json.load(f)
-        
         # Создаем новую строку характеристики
         new_row = {
             "grouping": request.name,
@@ -1095,21 +830,8 @@ async def add_characteristic(
             "advantages": request.advantages,
             "questions": request.questions
         }
-        
-        # Добавляем в нужную таблицу
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            for table_data in file_data["tables"]:
-                if table_data.get("table_name") == section_name:
-                    table_data["rows"].append(new_row)
-                    break
-        else:
-            file_data["rows"].append(new_row)
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, ensure_ascii=False, indent=2)
-        
-        return {"success": True, "message": f"Характеристика '{request.name}' добавлена в раздел '{section_name}'"}
+        row_id = await section_store.add_characteristic(section_name, new_row)
+        return {"success": True, "message": f"Характеристика '{request.name}' добавлена в раздел '{section_name}'", "id": row_id}
     except HTTPException:
         raise
     except Exception as e:
@@ -1132,41 +854,7 @@ async def rename_characteristic(
 ):
     """Переименовать характеристику (только для администраторов)"""
     try:
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_data = json.load(f)
-        
-        found = False
-        
-        # Функция для поиска и переименования
-        def rename_in_rows(rows, old_name, new_name):
-            for row in rows:
-                if row.get("grouping", "").strip() == old_name:
-                    row["grouping"] = new_name
-                    return True
-            return False
-        
-        # Ищем и переименовываем в нужной таблице
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            for table_data in file_data["tables"]:
-                if table_data.get("table_name") == section_name:
-                    found = rename_in_rows(table_data.get("rows", []), characteristic_name, request.new_name)
-                    break
-        else:
-            found = rename_in_rows(file_data.get("rows", []), characteristic_name, request.new_name)
-        
-        if not found:
-            raise HTTPException(status_code=404, detail=f"Характеристика '{characteristic_name}' не найдена")
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, ensure_ascii=False, indent=2)
-        
+        await section_store.rename_characteristic(section_name, characteristic_name, request.new_name)
         return {"success": True, "message": f"Характеристика переименована в '{request.new_name}'"}
     except HTTPException:
         raise
@@ -1185,60 +873,7 @@ async def delete_characteristic(
 ):
     """Удалить характеристику из раздела (только для администраторов)"""
     try:
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_data = json.load(f)
-        
-        found = False
-        
-        # Функция для проверки, соответствует ли строка характеристике
-        def row_matches_characteristic(rows, char_name):
-            last_grouping = None
-            for i, row in enumerate(rows):
-                grouping = row.get("grouping", "").strip()
-                
-                # Обычная характеристика
-                if grouping == char_name:
-                    return i
-                
-                # Сохраняем последний grouping для проверки "Максимум сроков"
-                if grouping:
-                    last_grouping = grouping
-                # Строка с пустым grouping после "Сроки" - может быть "Максимум сроков"
-                elif not grouping and last_grouping == "Сроки" and char_name == "Максимум сроков":
-                    values = [row.get("standard"), row.get("expert"), row.get("optimal"), 
-                             row.get("express"), row.get("ultra")]
-                    if any(v and "Макс" in str(v) for v in values):
-                        return i
-            return -1
-        
-        # Удаляем из нужной таблицы
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            for table_data in file_data["tables"]:
-                if table_data.get("table_name") == section_name:
-                    idx = row_matches_characteristic(table_data["rows"], characteristic_name)
-                    if idx >= 0:
-                        del table_data["rows"][idx]
-                        found = True
-                    break
-        else:
-            idx = row_matches_characteristic(file_data["rows"], characteristic_name)
-            if idx >= 0:
-                del file_data["rows"][idx]
-                found = True
-        
-        if not found:
-            raise HTTPException(status_code=404, detail=f"Характеристика '{characteristic_name}' не найдена")
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, ensure_ascii=False, indent=2)
-        
+        await section_store.delete_characteristic(section_name, characteristic_name)
         return {"success": True, "message": f"Характеристика '{characteristic_name}' удалена из раздела '{section_name}'"}
     except HTTPException:
         raise
@@ -1252,50 +887,14 @@ async def delete_characteristic(
 @app.get("/api/sections/{section_name}/characteristics", tags=["Sections"])
 async def get_section_characteristics(
     section_name: str,
+    request: Request,
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить список характеристик раздела"""
-    try:
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_data = json.load(f)
-        
-        characteristics = []
-        
-        # Получаем характеристики из нужной таблицы
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            for table_data in file_data["tables"]:
-                if table_data.get("table_name") == section_name:
-                    rows = table_data.get("rows", [])
-                    # Пропускаем заголовок (первую строку)
-                    for i, row in enumerate(rows[1:], start=1):
-                        characteristics.append({
-                            "index": i,
-                            "name": row.get("grouping", ""),
-                            "personal_pain": row.get("personal_pain", ""),
-                            "corporate_pain": row.get("corporate_pain", "")
-                        })
-                    break
-        else:
-            rows = file_data.get("rows", [])
-            for i, row in enumerate(rows[1:], start=1):
-                characteristics.append({
-                    "index": i,
-                    "name": row.get("grouping", ""),
-                    "personal_pain": row.get("personal_pain", ""),
-                    "corporate_pain": row.get("corporate_pain", "")
-                })
-        
-        return {"characteristics": characteristics}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка: {str(e)}")
+    cached = (await current_catalog()).section_characteristics.get(section_name)
+    if cached is None:
+        raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
+    return catalog_response(request, cached)
 
 
 class ReorderCharacteristicsRequest(BaseModel):
@@ -1310,51 +909,90 @@ async def reorder_characteristics(
 ):
     """Изменить порядок характеристик в разделе (только для администраторов)"""
     try:
-        filename = get_section_filename(section_name)
-        if not filename:
-            raise HTTPException(status_code=404, detail=f"Раздел '{section_name}' не найден")
-        
-        file_path = os.path.join(os.path.dirname(__file__), filename)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_data = json.load(f)
-        
-        # Функция для переупорядочивания строк
-        def reorder_rows(rows, new_order):
-            if not rows:
-                return rows
-            
-            header = rows[0]  # Сохраняем заголовок
-            data_rows = rows[1:]
-            
-            # Создаем словарь для быстрого поиска
-            row_dict = {row.get("grouping"): row for row in data_rows}
-            
-            # Формируем новый порядок
-            new_rows = [header]
-            for name in new_order:
-                if name in row_dict:
-                    new_rows.append(row_dict[name])
-                    del row_dict[name]
-            
-            # Добавляем оставшиеся строки (которых не было в new_order)
-            new_rows.extend(row_dict.values())
-            
-            return new_rows
-        
-        # Применяем к нужной таблице
-        if "tables" in file_data and isinstance(file_data["tables"], list):
-            for table_data in file_data["tables"]:
-                if table_data.get("table_name") == section_name:
-                    table_data["rows"] = reorder_rows(table_data["rows"], request.order)
-                    break
-        else:
-            file_data["rows"] = reorder_rows(file_data["rows"], request.order)
-        
-        # Сохраняем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(file_data, f, ensure_ascii=False, indent=2)
-        
+        await section_store.reorder_characteristics(section_name, request.order)
+        return {"success": True, "message": "Порядок характеристик обновлен"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Ошибка при изменении порядка: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Ошибка: {str(e)}")
+
+
+# ===== Правки по id строки (id отдаются в /api/plans и в списке характеристик раздела) =====
+
+class UpdateValueByIdRequest(BaseModel):
+    new_value: str  # Новое значение
+    field_type: Optional[str] = "value"  # Тип поля: "value", "description", "questions", "personal_pain", "corporate_pain"
+    plan_name: Optional[str] = None  # Название тарифа для field_type="value"
+
+
+@app.put("/api/characteristics/{row_id}/value", tags=["Admin"])
+async def update_value_by_id(
+    row_id: str,
+    request: UpdateValueByIdRequest,
+    current_user: User = Depends(get_current_active_admin_user)
+):
+    """Обновить значение строки по id (только для администраторов)"""
+    try:
+        await section_store.update_value_by_id(row_id, request.new_value, field_type=request.field_type, plan_name=request.plan_name)
+        return {"success": True, "message": "Значение успешно обновлено"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Ошибка при обновлении значения: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Ошибка при обновлении: {str(e)}")
+
+
+@app.put("/api/characteristics/{row_id}/rename", tags=["Sections"])
+async def rename_characteristic_by_id(
+    row_id: str,
+    request: RenameCharacteristicRequest,
+    current_user: User = Depends(get_current_active_admin_user)
+):
+    """Переименовать характеристику по id (только для администраторов)"""
+    try:
+        await section_store.rename_characteristic_by_id(row_id, request.new_name)
+        return {"success": True, "message": f"Характеристика переименована в '{request.new_name}'"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Ошибка при переименовании характеристики: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Ошибка при переименовании: {str(e)}")
+
+
+@app.delete("/api/characteristics/{row_id}", tags=["Sections"])
+async def delete_characteristic_by_id(
+    row_id: str,
+    current_user: User = Depends(get_current_active_admin_user)
+):
+    """Удалить характеристику по id (только для администраторов)"""
+    try:
+        await section_store.delete_characteristic_by_id(row_id)
+        return {"success": True, "message": "Характеристика удалена"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Ошибка при удалении характеристики: {e}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Ошибка при удалении характеристики: {str(e)}")
+
+
+@app.put("/api/sections/{section_name}/characteristics/reorder-by-id", tags=["Sections"])
+async def reorder_characteristics_by_id(
+    section_name: str,
+    request: ReorderCharacteristicsRequest,
+    current_user: User = Depends(get_current_active_admin_user)
+):
+    """Изменить порядок характеристик по списку id (только для администраторов)"""
+    try:
+        await section_store.reorder_characteristics_by_id(section_name, request.order)
         return {"success": True, "message": "Порядок характеристик обновлен"}
     except HTTPException:
         raise
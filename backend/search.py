@@ -0,0 +1,469 @@
+"""
+Полнотекстовый поиск по каталогу: характеристика, описание, возражения, вопросы
+и значения тарифов («что отвечать на возражение X» во время звонка).
+
+Документ индекса — строка каталога (характеристика во всех тарифах). Слова
+нормализуются (нижний регистр, ё → е, отсечение окончаний), последнее слово
+запроса ищется и как префикс (его ещё дописывают). Ранжирование — BM25 с весами
+полей; в ответе — фрагменты полей с позициями совпадений для подсветки.
+
+Индекс строится по снимку каталога при прогреве и обновляется по журналу
+изменений каталога (только изменённые строки); при пропуске версии или
+строках без id — полная пересборка.
+"""
+import bisect
+import math
+import re
+import threading
+import time
+from collections import Counter
+from itertools import chain
+from functools import lru_cache
+from heapq import heappush, heapreplace, merge, nlargest
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Поля документа и их веса в ранжировании
+SEARCH_FIELDS = (("характеристика", 3.0), ("возражения", 2.0), ("вопросы", 1.5),
+                 ("описание", 1.0), ("значение", 1.0))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Вклад слова, найденного только по префиксу, относительно точного совпадения основы
+PREFIX_WEIGHT = 0.6
+# Сколько слов словаря подставляется вместо одного префикса (ограничивает время запроса)
+MAX_PREFIX_TERMS = 64
+MIN_PREFIX_LENGTH = 2
+# Уровень совпадений больше этого размера ранжируется пороговым алгоритмом, а не полным перебором
+TOP_SCAN_MIN = 2000
+SNIPPET_LENGTH = 160
+
+_WORD = re.compile(r"[0-9A-Za-zА-Яа-яЁё]+")
+
+STOP_WORDS = frozenset(
+    "и в во на с со по к ко о об от до из за для у а но или ли же бы то что как это при без".split()
+)
+
+# Окончания для отсечения по длине (сначала пробуются самые длинные). Личные окончания
+# глаголов (-ет, -ла, -ть) не отсекаются: они совпадают с концом частых существительных
+# («ответ», «часть»); «-ость» отсекается целиком, чтобы «скорость» и «скорости» совпали
+_ENDINGS = set("""
+    остями остям остях остью остей ость ости
+    иями ями ами иях ях ах ием ией иям ям ам ом ем ев ов ей ий ой ый ие ые ое ее ая яя ую юю ою ею
+    его ого ему ому ими ыми их ых им ым ия ья ию ью ии еи ить ыть ять ать еть
+    а я о е и й у ю ы ь
+""".split())
+_ENDING_LENGTHS = sorted({len(ending) for ending in _ENDINGS}, reverse=True)
+_REFLEXIVE = ("ся", "сь")
+MIN_STEM_LENGTH = 3
+
+
+def normalize_word(word: str) -> str:
+    return word.lower().replace("ё", "е")
+
+
+def stem(word: str) -> str:
+    """Основа нормализованного слова: отсечение возвратной частицы и одного окончания"""
+    if len(word) <= MIN_STEM_LENGTH or not ("а" <= word[-1] <= "я"):
+        return word
+    for suffix in _REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            word = word[:-len(suffix)]
+            break
+    for length in _ENDING_LENGTHS:
+        if len(word) - length >= MIN_STEM_LENGTH and word[-length:] in _ENDINGS:
+            return word[:-length]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def analyze_word(word: str) -> Optional[Tuple[str, str]]:
+    """(нормализованное слово, термин индекса) для слова текста; None — стоп-слово"""
+    word = normalize_word(word)
+    return None if word in STOP_WORDS else (word, stem(word))
+
+
+def tokenize(text: str) -> Iterable[Tuple[str, str, int, int]]:
+    """(слово, термин, начало, конец) для слов текста; стоп-слова пропускаются"""
+    for match in _WORD.finditer(text):
+        analyzed = analyze_word(match.group())
+        if analyzed is not None:
+            yield analyzed[0], analyzed[1], match.start(), match.end()
+
+
+def query_words(query: str) -> List[Tuple[str, str]]:
+    """(слово, термин) запроса без повторов терминов, в порядке запроса"""
+    words = {}
+    for word, term, _, _ in tokenize(query):
+        words[term] = word  # для префикса берётся последнее написание
+    return [(word, term) for term, word in words.items()]
+
+
+def snippet(text: str, spans: List[Tuple[int, int]]) -> Dict:
+    """Фрагмент поля вокруг первого совпадения; matches — [начало, конец) в тексте фрагмента"""
+    start = 0
+    if len(text) > SNIPPET_LENGTH:
+        start = max(0, min(spans[0][0] - SNIPPET_LENGTH // 4, len(text) - SNIPPET_LENGTH))
+    end = min(len(text), start + SNIPPET_LENGTH)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    shift = len(prefix) - start
+    matches = [[s + shift, e + shift] for s, e in spans if s >= start and e <= end]
+    return {"text": prefix + text[start:end] + suffix, "matches": matches}
+
+
+class SearchDocument:
+    """Строка каталога в индексе: тексты полей и взвешенные частоты терминов"""
+
+    __slots__ = ("row_id", "section", "name", "texts", "tf", "words", "length")
+
+    def __init__(self, row_id: str, chars: Tuple[Dict, ...], plan_names: Tuple[str, ...]):
+        first = chars[0]
+        self.row_id = row_id
+        self.section = first["раздел"]
+        self.name = first["характеристика"]
+        # (поле, тариф или None, текст): значения тарифов — отдельными текстами
+        self.texts: List[Tuple[str, Optional[str], str]] = []
+        for field, _ in SEARCH_FIELDS:
+            if field == "значение":
+                for plan_name, char in zip(plan_names, chars):
+                    if char["значение"] and char["значение"] != "-":
+                        self.texts.append((field, plan_name, char["значение"]))
+            elif first.get(field):
+                self.texts.append((field, None, first[field]))
+        weights = dict(SEARCH_FIELDS)
+        self.tf: Counter = Counter()
+        self.words = set()  # нормализованные слова — для поиска по началу недописанного слова
+        seen_values = set()
+        for field, _, text in self.texts:
+            # Одинаковое значение в нескольких тарифах считается один раз
+            if field == "значение":
+                if text in seen_values:
+                    continue
+                seen_values.add(text)
+            weight = weights[field]
+            for analyzed in map(analyze_word, _WORD.findall(text)):
+                if analyzed is not None:
+                    self.tf[analyzed[1]] += weight
+                    self.words.add(analyzed[0])
+        self.length = sum(self.tf.values())
+
+    def highlights(self, terms: Dict[str, float]) -> List[Dict]:
+        result = []
+        for field, plan_name, text in self.texts:
+            spans = [(start, end) for _, term, start, end in tokenize(text) if term in terms]
+            if spans:
+                item = {"field": field}
+                if plan_name is not None:
+                    item["plan"] = plan_name
+                item.update(snippet(text, spans))
+                result.append(item)
+        return result
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс: термин → {id строки: вклад BM25 без idf}. Вклад считается
+    при индексации (средняя длина документа фиксируется при полной сборке), поэтому
+    запрос — умножение на idf и слияние словарей. Словари терминов и слов
+    отсортированы для поиска по префиксу.
+    """
+
+    def __init__(self, version: Optional[int] = None):
+        self.version = version
+        self.docs: Dict[str, SearchDocument] = {}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.vocabulary: List[str] = []
+        # Нормализованные слова текстов (только пополняются; неактуальные отсеиваются при поиске)
+        self.words: List[str] = []
+        self._known_words = set()
+        self.sections: Dict[str, set] = {}
+        self.avg_length = 0.0
+        self._ranked: Dict[str, List[Tuple[str, float]]] = {}
+
+    @classmethod
+    def build(cls, snapshot) -> "SearchIndex":
+        index = cls(snapshot.version)
+        plans = snapshot.plans
+        plan_names = tuple(plan["название"] for plan in plans)
+        docs = [SearchDocument(chars[0]["id"] or f"#{position}", chars, plan_names)
+                for position, chars in enumerate(zip(*(plan["характеристики"] for plan in plans)))
+                if not chars[0].get("is_section_header")]
+        if docs:
+            index.avg_length = sum(doc.length for doc in docs) / len(docs)
+        for doc in docs:
+            index._add(doc, keep_sorted=False)
+        index.vocabulary = sorted(index.postings)
+        index.words = sorted(index._known_words)
+        return index
+
+    def add(self, row_id: str, chars: Tuple[Dict, ...], plan_names: Tuple[str, ...]):
+        if not chars[0].get("is_section_header"):
+            self._add(SearchDocument(row_id, chars, plan_names), keep_sorted=True)
+
+    def _add(self, doc: SearchDocument, keep_sorted: bool):
+        self.docs[doc.row_id] = doc
+        self.sections.setdefault(doc.section, set()).add(doc.row_id)
+        if not self.avg_length:
+            self.avg_length = doc.length or 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc.length / self.avg_length)
+        for term, tf in doc.tf.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                if keep_sorted:
+                    bisect.insort(self.vocabulary, term)
+            posting[doc.row_id] = tf * (BM25_K1 + 1) / (tf + norm)
+            self._ranked.pop(term, None)
+        for word in doc.words - self._known_words:
+            self._known_words.add(word)
+            if keep_sorted:
+                bisect.insort(self.words, word)
+
+    def remove(self, row_id: str):
+        doc = self.docs.pop(row_id, None)
+        if doc is None:
+            return
+        self.sections[doc.section].discard(row_id)
+        for term in doc.tf:
+            posting = self.postings[term]
+            del posting[row_id]
+            self._ranked.pop(term, None)
+            if not posting:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def expand(self, word: str, term: str, prefix: bool) -> Dict[str, float]:
+        """
+        Термины для слова запроса: точное совпадение основы, а для prefix — основы,
+        продолжающие основу слова, и основы слов текста, начинающихся с него
+        («дорог» → «дорого», основа которого «дор»)
+        """
+        terms = {term: 1.0} if term in self.postings else {}
+        if not prefix or len(word) < MIN_PREFIX_LENGTH:
+            return terms
+        i = bisect.bisect_right(self.vocabulary, term)
+        for candidate in self.vocabulary[i:i + MAX_PREFIX_TERMS]:
+            if not candidate.startswith(term):
+                break
+            terms[candidate] = PREFIX_WEIGHT
+        i = bisect.bisect_left(self.words, word)
+        for candidate in self.words[i:i + MAX_PREFIX_TERMS]:
+            if not candidate.startswith(word):
+                break
+            candidate_term = stem(candidate)
+            if candidate_term not in terms and candidate_term in self.postings:
+                terms[candidate_term] = PREFIX_WEIGHT
+        return terms
+
+    def idf(self, term: str) -> float:
+        n_docs, df = len(self.docs), len(self.postings[term])
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def ranked_posting(self, term: str) -> List[Tuple[str, float]]:
+        """Строки термина по убыванию вклада (кэшируется до изменения термина)"""
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            ranked = self._ranked[term] = sorted(self.postings[term].items(), key=itemgetter(1), reverse=True)
+        return ranked
+
+    def _stream(self, terms: List[Tuple[Dict[str, float], float, str]]) -> Iterator[Tuple[float, str]]:
+        """(оценка слова, строка) по убыванию оценки; для префикса — слияние списков его терминов"""
+        streams = [((factor * impact, row_id) for row_id, impact in self.ranked_posting(term))
+                   for _, factor, term in terms]
+        return streams[0] if len(streams) == 1 else merge(*streams, key=itemgetter(0), reverse=True)
+
+    def search(self, query: str, limit: int = 20, sections: Optional[Tuple[str, ...]] = None) -> Dict:
+        words = query_words(query)
+        matched_terms: Dict[str, float] = {}
+        # Для каждого найденного слова запроса: [(постинги термина, вес × idf, термин)]
+        word_terms = []
+        for i, (word, term) in enumerate(words):
+            # Префиксом ищется последнее слово — его обычно ещё дописывают
+            terms = self.expand(word, term, prefix=i == len(words) - 1)
+            matched_terms.update(terms)
+            if terms:
+                word_terms.append([(self.postings[term], weight * self.idf(term), term)
+                                   for term, weight in terms.items()])
+
+        def word_score(terms, row_id) -> float:
+            # Лучший вклад среди терминов слова (префиксы не суммируются)
+            best = 0.0
+            for posting, factor, _ in terms:
+                impact = posting.get(row_id)
+                if impact is not None and impact * factor > best:
+                    best = impact * factor
+            return best
+
+        exact = [(posting, factor) for terms in word_terms if len(terms) == 1 for posting, factor, _ in terms]
+        prefixed = [terms for terms in word_terms if len(terms) > 1]
+
+        def score(row_id) -> float:
+            total = 0.0
+            for posting, factor in exact:
+                impact = posting.get(row_id)
+                if impact is not None:
+                    total += impact * factor
+            for terms in prefixed:
+                total += word_score(terms, row_id)
+            return total
+
+        # Строки, где нашлось каждое слово (множества id — операции над ними идут в C)
+        word_rows = [terms[0][0].keys() if len(terms) == 1 else set().union(*(posting.keys() for posting, _, _ in terms))
+                     for terms in word_terms]
+        allowed = None
+        if sections is not None:
+            allowed = set().union(*(self.sections.get(name, ()) for name in sections))
+        top: List[Tuple[float, str]] = []
+        total = 0
+        coverage = None
+        # Сначала строки, где нашлись все слова запроса, затем по числу найденных слов; внутри — по BM25
+        for level in range(len(word_rows), 0, -1):
+            if len(top) >= limit:
+                if coverage is None:
+                    # Общее число совпадений — без разбора остальных уровней
+                    rows = set().union(*word_rows)
+                    total = len(rows if allowed is None else rows & allowed)
+                else:
+                    total += sum(1 for row_id, count in coverage.items()
+                                 if count == level and (allowed is None or row_id in allowed))
+                    continue
+                break
+            if level == len(word_rows):
+                candidates = set(word_rows[0]).intersection(*word_rows[1:])
+            else:
+                if coverage is None:
+                    coverage = Counter(chain.from_iterable(word_rows))
+                candidates = {row_id for row_id, count in coverage.items() if count == level}
+            if allowed is not None:
+                candidates &= allowed
+            total += len(candidates)
+            if len(candidates) <= TOP_SCAN_MIN:
+                top += nlargest(limit - len(top), ((score(row_id), row_id) for row_id in candidates))
+            else:
+                top += self._top(word_terms, score, limit - len(top), candidates)
+        results = []
+        for value, row_id in top:
+            doc = self.docs[row_id]
+            results.append({
+                "id": None if row_id.startswith("#") else row_id,
+                "раздел": doc.section,
+                "характеристика": doc.name,
+                "score": round(value, 4),
+                "matched_words": sum(row_id in rows for rows in word_rows),
+                "highlights": doc.highlights(matched_terms),
+            })
+        return {"query": query, "words": [term for _, term in words], "total": total, "results": results}
+
+    def _top(self, word_terms, score, limit: int, candidates: set) -> List[Tuple[float, str]]:
+        """
+        Лучшие limit строк из candidates без оценки всех (пороговый алгоритм Фейгина):
+        списки слов читаются по убыванию оценки, пока limit-я лучшая сумма не
+        сравняется с суммой текущих оценок на границах списков.
+        """
+        streams = [self._stream(terms) for terms in word_terms]
+        frontier = [math.inf] * len(streams)
+        top: List[Tuple[float, str]] = []
+        seen = set()
+        active = list(range(len(streams)))
+        while active:
+            for i in list(active):
+                item = next(streams[i], None)
+                if item is None:
+                    frontier[i] = 0.0
+                    active.remove(i)
+                    continue
+                frontier[i], row_id = item
+                if row_id in seen or row_id not in candidates:
+                    continue
+                seen.add(row_id)
+                candidate = (score(row_id), row_id)
+                if len(top) < limit:
+                    heappush(top, candidate)
+                elif candidate > top[0]:
+                    heapreplace(top, candidate)
+            if len(top) == limit and top[0][0] >= sum(frontier):
+                break
+        return sorted(top, reverse=True)
+
+
+class CatalogSearch:
+    """
+    Поисковый индекс текущего каталога. Полная сборка идёт без блокировки поиска
+    (по одной за раз) и подменяет индекс целиком; пока она идёт, поиск отвечает по
+    прежнему индексу. Поиск и обновление отдельных строк — под блокировкой.
+    """
+
+    def __init__(self):
+        self._index: Optional[SearchIndex] = None
+        self._latest = None  # последний снимок каталога, о котором сообщил apply()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._index.version if self._index is not None else None
+
+    def is_current(self, snapshot) -> bool:
+        return self.version is not None and self.version >= snapshot.version
+
+    def ensure(self, snapshot):
+        """Индекс не старее снимка (и снимков, вышедших во время сборки)"""
+        with self._build_lock:
+            while not self.is_current(snapshot):
+                started = time.perf_counter()
+                index = SearchIndex.build(snapshot)
+                print(f"[SEARCH] Индекс поиска v{index.version}: {len(index.docs)} строк, "
+                      f"{len(index.postings)} терминов за {(time.perf_counter() - started) * 1000:.1f} мс")
+                with self._lock:
+                    if self._index is None or index.version > self._index.version:
+                        self._index = index
+                latest = self._latest
+                if latest is not None and latest.version > snapshot.version:
+                    snapshot = latest
+
+    def build_in_background(self, snapshot):
+        """Полная сборка в отдельном потоке (после старта и при пропуске версии)"""
+        def build():
+            try:
+                self.ensure(snapshot)
+            except Exception as e:
+                print(f"[SEARCH] Ошибка сборки индекса поиска: {e}")
+        threading.Thread(target=build, name="search-index", daemon=True).start()
+
+    def apply(self, snapshot, change):
+        """
+        Подписчик каталога (PlanCatalog.add_listener): переиндексировать строки из
+        журнала изменений. Вызывается по порядку версий под блокировкой сборки каталога.
+        """
+        with self._lock:
+            self._latest = snapshot
+            index = self._index
+            if index is None or index.version >= change.version:
+                return  # не построен (ensure() догонит до последнего снимка) или уже новее
+            if not change.resync and index.version == change.version - 1:
+                plan_names = snapshot.plan_names
+                for row_id in change.row_ids:
+                    index.remove(row_id)
+                    if row_id in snapshot.row_positions:
+                        index.add(row_id, snapshot.row_values(row_id), plan_names)
+                index.version = change.version
+                return
+        # Строки без id или пропущенная версия — полная сборка, не задерживая пересборку каталога
+        self.build_in_background(snapshot)
+
+    def search(self, query: str, limit: int = 20, sections: Optional[Tuple[str, ...]] = None) -> Dict:
+        with self._lock:
+            index = self._index
+            if index is None:
+                return {"query": query, "words": [term for _, term in query_words(query)], "total": 0, "results": []}
+            return index.search(query, limit, sections)
+
+    def stats(self) -> Dict:
+        index = self._index
+        if index is None:
+            return {"version": None, "documents": 0, "terms": 0}
+        return {"version": index.version, "documents": len(index.docs), "terms": len(index.postings)}
+
+
+catalog_search = CatalogSearch()
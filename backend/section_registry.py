@@ -0,0 +1,174 @@
+"""
+Реестр разделов: название раздела -> файл, индекс таблицы в файле и контрольная
+сумма файла.
+
+Реестр хранится в памяти и в файле .sections.manifest рядом с данными
+и обновляется обработчиками записи, поэтому поиск файла раздела не требует
+перебора и разбора всех JSON файлов. При старте реестр загружается из манифеста:
+заново читаются только файлы, у которых mtime или размер не совпали с записанными.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from catalog import DATA_DIR, get_all_json_files, iter_tables
+
+MANIFEST_NAME = ".sections.manifest"
+MANIFEST_FILE = os.path.join(DATA_DIR, MANIFEST_NAME)
+MANIFEST_VERSION = 2
+
+
+def file_checksum(raw: bytes) -> str:
+    """Контрольная сумма содержимого файла"""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class SectionRegistry:
+    """Индекс разделов по названию"""
+
+    def __init__(self, data_dir: str = DATA_DIR, manifest_path: Optional[str] = None):
+        self.data_dir = data_dir
+        self.manifest_path = manifest_path or os.path.join(data_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._sections: Dict[str, Dict] = {}
+        # filename -> (mtime_ns, size, checksum) на момент последнего чтения
+        self._files: Dict[str, tuple] = {}
+
+    # ----- чтение -----
+
+    def lookup(self, section: str) -> Optional[Dict]:
+        """Запись реестра для раздела; при ручной правке файлов реестр досинхронизируется"""
+        entry = self._sections.get(section)
+        if entry is not None and self._is_fresh(entry["filename"]):
+            return entry
+        # Раздела нет или его файл изменён в обход API — перечитываем только изменённые файлы
+        self.sync()
+        return self._sections.get(section)
+
+    def get_filename(self, section: str) -> Optional[str]:
+        entry = self.lookup(section)
+        return entry["filename"] if entry else None
+
+    def sections(self) -> List[Dict]:
+        return list(self._sections.values())
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+
+    def _is_fresh(self, filename: str) -> bool:
+        known = self._files.get(filename)
+        if known is None:
+            return False
+        try:
+            stat = os.stat(self._path(filename))
+        except OSError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == tuple(known[:2])
+
+    # ----- обновление -----
+
+    def rebuild(self):
+        """Реестр при старте: из манифеста, заново читаются только изменённые с его записи файлы"""
+        with self._lock:
+            self._sections, self._files = self._load_manifest()
+            rescanned = self._sync_locked()
+        print(f"[REGISTRY] Реестр разделов: {len(self._sections)} разделов в {len(self._files)} файлах "
+              f"(перечитано файлов: {rescanned})")
+
+    def sync(self):
+        """Перечитать файлы, которые появились, исчезли или изменились с прошлого чтения"""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_locked(self) -> int:
+        current = set(get_all_json_files(self.data_dir))
+        changed = sorted(name for name in current if not self._is_fresh(name))
+        removed = [name for name in self._files if name not in current]
+        if not changed and not removed:
+            return 0
+        sections, files = self._without_files(changed + removed)
+        for filename in changed:
+            self._scan_file(filename, sections, files)
+        self._commit(sections, files)
+        return len(changed)
+
+    def _load_manifest(self):
+        """Разделы и файлы из манифеста; пустой реестр, если манифеста нет или он другой версии"""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                return {}, {}
+            files = {name: (info["mtime_ns"], info["size"], info["checksum"])
+                     for name, info in manifest["files"].items()}
+            sections = {name: entry for name, entry in manifest["sections"].items() if entry["filename"] in files}
+            return sections, files
+        except FileNotFoundError:
+            return {}, {}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"[REGISTRY] Манифест не прочитан, разделы будут найдены по файлам: {e}")
+            return {}, {}
+
+    def refresh_file(self, filename: str):
+        """Обновить записи одного файла после записи через API (файл мог быть удалён)"""
+        with self._lock:
+            sections, files = self._without_files([filename])
+            if os.path.exists(self._path(filename)):
+                self._scan_file(filename, sections, files)
+            self._commit(sections, files)
+
+    def _without_files(self, filenames: List[str]):
+        """Копия реестра без записей указанных файлов"""
+        dropped = set(filenames)
+        sections = {name: entry for name, entry in self._sections.items() if entry["filename"] not in dropped}
+        files = {name: info for name, info in self._files.items() if name not in dropped}
+        return sections, files
+
+    def _scan_file(self, filename: str, sections: Dict, files: Dict):
+        file_path = self._path(filename)
+        try:
+            stat = os.stat(file_path)
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            data = json.loads(raw)
+        except (OSError, ValueError) as e:
+            print(f"[REGISTRY] Не удалось прочитать {filename}: {e}")
+            return
+        checksum = file_checksum(raw)
+        files[filename] = (stat.st_mtime_ns, stat.st_size, checksum)
+        is_multi_table = "tables" in data and isinstance(data["tables"], list)
+        for table_index, table_data in enumerate(iter_tables(data)):
+            table_name = table_data.get("table_name")
+            # Раздел с тем же названием в другом файле не перекрывает уже найденный
+            if not table_name or table_name in sections:
+                continue
+            sections[table_name] = {
+                "name": table_name,
+                "filename": filename,
+                "table_index": table_index if is_multi_table else None,
+                "checksum": checksum
+            }
+
+    def _commit(self, sections: Dict, files: Dict):
+        """Атомарно записать манифест (временный файл + rename) и подменить реестр в памяти"""
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "sections": sections,
+            "files": {name: {"mtime_ns": info[0], "size": info[1], "checksum": info[2]} for name, info in files.items()}
+        }
+        # Манифест могут обновлять несколько воркеров: временный файл у каждого процесса свой
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            # Манифест на диске — вспомогательный, реестр в памяти остаётся рабочим
+            print(f"[REGISTRY] Не удалось сохранить манифест: {e}")
+        self._sections = sections
+        self._files = files
+
+
+section_registry = SectionRegistry()
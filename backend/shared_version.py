@@ -0,0 +1,133 @@
+"""
+Общий для воркеров счётчик версии данных и межпроцессная блокировка записи.
+
+При запуске нескольких воркеров uvicorn у каждого процесса свой снимок каталога.
+Воркер, записавший изменение, увеличивает счётчик в файле .data.version
+в каталоге данных; остальные воркеры на каждом запросе сравнивают его со
+значением, при котором собран их снимок (чтение 8 байт из отображённого
+в память файла, без системных вызовов), и пересобирают каталог только при
+расхождении. Блокировка того же файла (flock, на Windows — msvcrt.locking)
+упорядочивает запись журналов и файлов разделов между процессами.
+"""
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from catalog import DATA_DIR
+
+VERSION_FILE = os.path.join(DATA_DIR, ".data.version")
+
+_COUNTER = struct.Struct("<Q")
+
+
+class SharedVersion:
+    """Счётчик версии данных в файле, общий для процессов на одном каталоге данных"""
+
+    def __init__(self, path: str = VERSION_FILE):
+        self.path = path
+        self._open_guard = threading.Lock()
+        # Внутри процесса блокировка повторно входимая: операция записи может вызвать другую
+        self._lock = threading.RLock()
+        self._owner = None
+        self._depth = 0
+        self._file = None
+        self._map = None
+        self._pid = None
+        self._disabled = False
+
+    def _open(self) -> bool:
+        """Открыть и отобразить файл счётчика (лениво; заново — в дочернем процессе после fork)"""
+        if self._map is not None and self._pid == os.getpid():
+            return True
+        if self._disabled:
+            return False
+        with self._open_guard:
+            if self._map is not None and self._pid == os.getpid():
+                return True
+            try:
+                f = open(self.path, "a+b")
+                size = os.fstat(f.fileno()).st_size
+                if size < _COUNTER.size:
+                    self._flock(f, True)
+                    try:
+                        size = os.fstat(f.fileno()).st_size
+                        if size < _COUNTER.size:
+                            f.write(b"\0" * (_COUNTER.size - size))
+                            f.flush()
+                    finally:
+                        self._flock(f, False)
+                counter = mmap.mmap(f.fileno(), _COUNTER.size)
+            except OSError as e:
+                # Без счётчика воркеры сверяются только фоновым наблюдателем каталога
+                print(f"[VERSION] Общий счётчик версий недоступен ({self.path}): {e}")
+                self._disabled = True
+                return False
+            # Дескриптор, унаследованный при fork, не закрываем: flock на нём держит родитель
+            self._file, self._map, self._pid = f, counter, os.getpid()
+        return True
+
+    @staticmethod
+    def _flock(f, exclusive: bool):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if exclusive else msvcrt.LK_UNLCK, 1)
+
+    def current(self) -> int:
+        """Текущее значение счётчика (0, если файл недоступен)"""
+        if not self._open():
+            return 0
+        return _COUNTER.unpack_from(self._map, 0)[0]
+
+    def held(self) -> bool:
+        """Блокировка записи удерживается текущим потоком"""
+        return self._owner == threading.get_ident()
+
+    def acquire(self):
+        """Взять блокировку записи данных: один писатель на все процессы"""
+        self._lock.acquire()
+        if self._depth == 0 and self._open():
+            try:
+                self._flock(self._file, True)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._owner = threading.get_ident()
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            if self._map is not None and self._pid == os.getpid():
+                self._flock(self._file, False)
+        self._lock.release()
+
+    @contextmanager
+    def locked(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def bump(self) -> int:
+        """Увеличить счётчик после записи данных; возвращает новое значение"""
+        with self.locked():
+            if not self._open():
+                return 0
+            value = _COUNTER.unpack_from(self._map, 0)[0] + 1
+            _COUNTER.pack_into(self._map, 0, value)
+            return value
+
+
+data_version = SharedVersion()
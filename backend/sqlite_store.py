@@ -0,0 +1,501 @@
+"""
+Хранилище разделов в SQLite (STORAGE_BACKEND=sqlite).
+
+Таблицы: sections, characteristics (по строке исходной таблицы, с названием,
+вычисленным по правилам convert_table_to_plans_format), plan_values (значение
+по каждому тарифу) и pain_tags (нормализованные категории болей). Правка ячейки —
+один UPDATE, файлы целиком не переписываются. Каталог строится из базы через
+load_files(), который отдаёт разделы в том же виде, что и JSON файлы.
+
+Перенос данных из JSON файлов:  python sqlite_store.py migrate [--db PATH] [--force]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from catalog import (
+    DATA_DIR, PERSONAL_PAIN_KEYS, CORPORATE_PAIN_KEYS, collect_pains, deduplicate_pains,
+    get_all_json_files, iter_tables, load_table_data, resolve_rows
+)
+from storage import (
+    BaseSectionStore, StorageError, PLAN_VALUE_KEYS, get_plan_key,
+    new_row_id, new_section_data, section_name_to_filename
+)
+from shared_version import SharedVersion, data_version
+
+SQLITE_DB_FILE = os.getenv("SQLITE_DB_FILE", os.path.join(DATA_DIR, "catalog.sqlite3"))
+
+# Колонки строки таблицы, которые хранятся в characteristics; остальные — в extra
+ROW_COLUMNS = ("row_id", "grouping", "objection", "personal_pain", "corporate_pain", "advantages", "questions", "characteristics")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    name TEXT,                        -- NULL: у таблицы нет table_name
+    filename TEXT NOT NULL,
+    table_index INTEGER,              -- NULL: файл с одной таблицей
+    position INTEGER NOT NULL,        -- порядок разделов (порядок файлов и таблиц в них)
+    extra TEXT NOT NULL DEFAULT '{}'  -- прочие поля таблицы (sheet_name и т.п.)
+);
+CREATE INDEX IF NOT EXISTS idx_sections_name ON sections(name, position);
+CREATE TABLE IF NOT EXISTS characteristics (
+    id INTEGER PRIMARY KEY,
+    section_id INTEGER NOT NULL REFERENCES sections(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,        -- порядок строки в таблице, 0 — строка заголовков
+    name TEXT,                        -- NULL: строка не попадает в тарифы (заголовок, пустая)
+    is_continuation INTEGER NOT NULL DEFAULT 0,
+    is_section_header INTEGER NOT NULL DEFAULT 0,
+    row_id TEXT,                      -- постоянный id строки (как row_id в JSON файлах)
+    grouping TEXT,
+    objection TEXT,
+    personal_pain TEXT,
+    corporate_pain TEXT,
+    advantages TEXT,
+    questions TEXT,
+    characteristics TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'  -- прочие колонки строки (column11 и т.п.)
+);
+CREATE INDEX IF NOT EXISTS idx_characteristics_section ON characteristics(section_id, position);
+CREATE INDEX IF NOT EXISTS idx_characteristics_grouping ON characteristics(section_id, grouping);
+CREATE INDEX IF NOT EXISTS idx_characteristics_name ON characteristics(section_id, name);
+CREATE TABLE IF NOT EXISTS plan_values (
+    characteristic_id INTEGER NOT NULL REFERENCES characteristics(id) ON DELETE CASCADE,
+    plan_key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (characteristic_id, plan_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pain_tags (
+    characteristic_id INTEGER NOT NULL REFERENCES characteristics(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,               -- personal / corporate
+    category TEXT NOT NULL,
+    PRIMARY KEY (characteristic_id, kind, category)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_pain_tags_category ON pain_tags(kind, category);
+"""
+
+
+class SqliteSectionStore(BaseSectionStore):
+    """Хранилище разделов в SQLite; также служит источником данных каталога"""
+
+    def __init__(self, db_path: str = SQLITE_DB_FILE, shared_version: SharedVersion = data_version):
+        super().__init__(shared_version)
+        self.db_path = db_path
+        self._local = threading.local()
+        # Запись из одного процесса — по очереди; между процессами порядок обеспечивает SQLite
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', '0')")
+        # Случайный id базы: ревизии разных баз (например, после пересоздания) не совпадут
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('instance', lower(hex(randomblob(8))))")
+        self._upgrade_schema(conn)
+
+    @staticmethod
+    def _upgrade_schema(conn):
+        """Довести базу, созданную прежней версией, до текущей схемы"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(characteristics)")}
+        if "row_id" not in columns:
+            conn.execute("ALTER TABLE characteristics ADD COLUMN row_id TEXT")
+        # Строкам без id назначаются id того же вида, что и new_row_id()
+        conn.execute("UPDATE characteristics SET row_id = lower(hex(randomblob(6))) WHERE row_id IS NULL")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_characteristics_row_id ON characteristics(row_id)")
+
+    # ----- соединение -----
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение текущего потока"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Транзакция записи: BEGIN IMMEDIATE, при ошибке ROLLBACK"""
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+            conn.execute("COMMIT")
+
+    # ----- источник каталога -----
+
+    def signature(self) -> Tuple:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return (("sqlite", os.path.basename(self.db_path), int(row["value"]) if row else 0),)
+
+    def fingerprint(self) -> Tuple:
+        """Id базы и ревизия (для проверки бинарного снимка каталога)"""
+        meta = dict(self._conn().execute("SELECT key, value FROM meta").fetchall())
+        return (("sqlite", meta.get("instance"), int(meta.get("revision", 0))),)
+
+    def load_files(self) -> List[Tuple[str, Dict]]:
+        """Разделы в виде содержимого JSON файлов [(filename, file_data)] в исходном порядке"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            sections = conn.execute("SELECT * FROM sections ORDER BY position").fetchall()
+            char_rows = conn.execute("SELECT * FROM characteristics ORDER BY section_id, position").fetchall()
+            values = conn.execute("SELECT characteristic_id, plan_key, value FROM plan_values").fetchall()
+        finally:
+            conn.execute("COMMIT")
+
+        values_by_char: Dict[int, Dict] = {}
+        for value in values:
+            values_by_char.setdefault(value["characteristic_id"], {})[value["plan_key"]] = value["value"]
+        rows_by_section: Dict[int, List[Dict]] = {}
+        for char in char_rows:
+            rows_by_section.setdefault(char["section_id"], []).append(
+                self._row_to_json(char, values_by_char.get(char["id"], {}))
+            )
+
+        files: Dict[str, Dict] = {}
+        for section in sections:
+            table_data = {} if section["name"] is None else {"table_name": section["name"]}
+            table_data.update(json.loads(section["extra"]))
+            table_data["rows"] = rows_by_section.get(section["id"], [])
+            if section["table_index"] is None:
+                files.setdefault(section["filename"], table_data)
+            else:
+                files.setdefault(section["filename"], {"tables": []})["tables"].append(table_data)
+        return list(files.items())
+
+    @staticmethod
+    def _row_to_json(char: sqlite3.Row, values: Dict) -> Dict:
+        row = {column: char[column] for column in ROW_COLUMNS if char[column] is not None}
+        for plan_key in PLAN_VALUE_KEYS:
+            if plan_key in values:
+                row[plan_key] = values[plan_key]
+        row.update(json.loads(char["extra"]))
+        return row
+
+    # ----- перенос из JSON -----
+
+    def migrate_from_json(self, files: List[Tuple[str, Dict]]) -> Dict:
+        """Заменить содержимое базы разделами из JSON файлов"""
+        stats = {"files": 0, "sections": 0, "characteristics": 0}
+        with self._write() as conn:
+            conn.execute("DELETE FROM sections")
+            position = 0
+            for filename, file_data in files:
+                if not file_data:
+                    continue
+                stats["files"] += 1
+                multi = "tables" in file_data and isinstance(file_data["tables"], list)
+                for table_index, table_data in enumerate(iter_tables(file_data)):
+                    section_id = self._insert_section(conn, table_data.get("table_name"), filename,
+                                                      table_index if multi else None, position, table_data)
+                    for row_position, row in enumerate(table_data.get("rows", [])):
+                        self._insert_row(conn, section_id, row_position, row)
+                        stats["characteristics"] += 1
+                    self._resolve_section(conn, section_id)
+                    position += 1
+                    stats["sections"] += 1
+        self._notify([filename for filename, _ in files])
+        return stats
+
+    def _insert_section(self, conn, name: Optional[str], filename: str, table_index: Optional[int],
+                        position: int, table_data: Dict) -> int:
+        extra = {key: value for key, value in table_data.items() if key not in ("table_name", "rows")}
+        cursor = conn.execute(
+            "INSERT INTO sections (name, filename, table_index, position, extra) VALUES (?, ?, ?, ?, ?)",
+            (name, filename, table_index, position, json.dumps(extra, ensure_ascii=False))
+        )
+        return cursor.lastrowid
+
+    def _insert_row(self, conn, section_id: int, position: int, row: Dict) -> int:
+        row_id = row.get("row_id")
+        if not row_id or conn.execute("SELECT 1 FROM characteristics WHERE row_id = ?", (row_id,)).fetchone():
+            row = dict(row, row_id=new_row_id())
+        extra = {key: value for key, value in row.items() if key not in ROW_COLUMNS and key not in PLAN_VALUE_KEYS}
+        cursor = conn.execute(
+            f"INSERT INTO characteristics (section_id, position, {', '.join(ROW_COLUMNS)}, extra) "
+            f"VALUES (?, ?, {', '.join('?' for _ in ROW_COLUMNS)}, ?)",
+            (section_id, position, *(row.get(column) for column in ROW_COLUMNS),
+             json.dumps(extra, ensure_ascii=False))
+        )
+        char_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO plan_values (characteristic_id, plan_key, value) VALUES (?, ?, ?)",
+            [(char_id, plan_key, row[plan_key]) for plan_key in PLAN_VALUE_KEYS if plan_key in row]
+        )
+        self._update_pain_tags(conn, char_id, row)
+        return char_id
+
+    # ----- производные поля -----
+
+    def _section_rows(self, conn, section_id: int) -> List[Dict]:
+        """Строки раздела в виде JSON (с ключом _id) в порядке position"""
+        chars = conn.execute("SELECT * FROM characteristics WHERE section_id = ? ORDER BY position",
+                             (section_id,)).fetchall()
+        values: Dict[int, Dict] = {}
+        for value in conn.execute(
+            "SELECT v.characteristic_id, v.plan_key, v.value FROM plan_values v "
+            "JOIN characteristics c ON c.id = v.characteristic_id WHERE c.section_id = ?", (section_id,)
+        ):
+            values.setdefault(value["characteristic_id"], {})[value["plan_key"]] = value["value"]
+        return [dict(self._row_to_json(char, values.get(char["id"], {})), _id=char["id"]) for char in chars]
+
+    def _resolve_section(self, conn, section_id: int):
+        """Пересчитать названия и флаги строк раздела по правилам convert_table_to_plans_format"""
+        rows = self._section_rows(conn, section_id)
+        resolved = {row["_id"]: (name, is_continuation, is_section_header)
+                    for row, name, is_continuation, is_section_header in resolve_rows(rows)}
+        conn.executemany(
+            "UPDATE characteristics SET name = ?, is_continuation = ?, is_section_header = ? WHERE id = ?",
+            [(*resolved.get(row["_id"], (None, False, False)), row["_id"]) for row in rows]
+        )
+
+    def _update_pain_tags(self, conn, char_id: int, row: Dict):
+        conn.execute("DELETE FROM pain_tags WHERE characteristic_id = ?", (char_id,))
+        tags = [(char_id, "personal", cat) for cat in collect_pains(row, PERSONAL_PAIN_KEYS)]
+        tags += [(char_id, "corporate", cat) for cat in collect_pains(row, CORPORATE_PAIN_KEYS)]
+        conn.executemany("INSERT INTO pain_tags (characteristic_id, kind, category) VALUES (?, ?, ?)", tags)
+
+    # ----- поиск -----
+
+    def _locate_section(self, conn, section: str) -> sqlite3.Row:
+        # Раздел с тем же названием, что и у более раннего, не используется (как в реестре файлов)
+        found = conn.execute("SELECT * FROM sections WHERE name = ? ORDER BY position LIMIT 1", (section,)).fetchone()
+        if found is None:
+            raise StorageError(status_code=404, detail=f"Раздел '{section}' не найден")
+        return found
+
+    def get_filename(self, section: str) -> Optional[str]:
+        """Имя файла, из которого раздел был перенесён (или созданного для него)"""
+        found = self._conn().execute(
+            "SELECT filename FROM sections WHERE name = ? ORDER BY position LIMIT 1", (section,)
+        ).fetchone()
+        return found["filename"] if found else None
+
+    # ----- операции -----
+
+    def _set_field(self, conn, section_id: int, char: sqlite3.Row, field_type: Optional[str],
+                   new_value: str, plan_name: Optional[str]):
+        """Записать значение в поле строки: одна строка plan_values или characteristics"""
+        if field_type == "value" and plan_name:
+            conn.execute(
+                "INSERT INTO plan_values (characteristic_id, plan_key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (characteristic_id, plan_key) DO UPDATE SET value = excluded.value",
+                (char["id"], get_plan_key(plan_name), new_value)
+            )
+            # Значение строки-продолжения влияет на её название ("Максимум сроков")
+            if char["is_continuation"]:
+                self._resolve_section(conn, section_id)
+        elif field_type == "description":
+            conn.execute("UPDATE characteristics SET advantages = ? WHERE id = ?", (new_value, char["id"]))
+        elif field_type == "questions":
+            conn.execute("UPDATE characteristics SET questions = ? WHERE id = ?", (new_value, char["id"]))
+        elif field_type in ("personal_pain", "corporate_pain"):
+            # Дополнительные колонки болей очищаются, чтобы избежать дублирования
+            extra_keys = PERSONAL_PAIN_KEYS[1:] if field_type == "personal_pain" else CORPORATE_PAIN_KEYS[1:]
+            extra = json.loads(char["extra"])
+            extra.update({key: "" for key in extra_keys})
+            conn.execute(f"UPDATE characteristics SET {field_type} = ?, extra = ? WHERE id = ?",
+                         (deduplicate_pains(new_value), json.dumps(extra, ensure_ascii=False), char["id"]))
+            row = conn.execute("SELECT * FROM characteristics WHERE id = ?", (char["id"],)).fetchone()
+            self._update_pain_tags(conn, char["id"], self._row_to_json(row, {}))
+
+    def _op_update_value(self, conn, section_id: int, characteristic: str, new_value: str,
+                         field_type: Optional[str] = "value", plan_name: Optional[str] = None):
+        char = conn.execute(
+            "SELECT id, is_continuation, extra FROM characteristics WHERE section_id = ? AND name = ? "
+            "ORDER BY position LIMIT 1", (section_id, characteristic)
+        ).fetchone()
+        if char is None:
+            raise StorageError(status_code=404, detail="Характеристика не найдена")
+        self._set_field(conn, section_id, char, field_type, new_value, plan_name)
+
+    def _op_rename_section(self, conn, section_id: int, new_name: str):
+        conn.execute("UPDATE sections SET name = ? WHERE id = ?", (new_name, section_id))
+
+    def _op_add_characteristic(self, conn, section_id: int, row: Dict):
+        position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM characteristics WHERE section_id = ?",
+                                (section_id,)).fetchone()[0]
+        self._insert_row(conn, section_id, position, row)
+        self._resolve_section(conn, section_id)
+
+    def _op_rename_characteristic(self, conn, section_id: int, characteristic: str, new_name: str):
+        for row in self._section_rows(conn, section_id):
+            if (row.get("grouping") or "").strip() == characteristic:
+                conn.execute("UPDATE characteristics SET grouping = ? WHERE id = ?", (new_name, row["_id"]))
+                self._resolve_section(conn, section_id)
+                return
+        raise StorageError(status_code=404, detail=f"Характеристика '{characteristic}' не найдена")
+
+    def _op_delete_characteristic(self, conn, section_id: int, characteristic: str):
+        char = conn.execute(
+            "SELECT id FROM characteristics WHERE section_id = ? AND (TRIM(COALESCE(grouping, '')) = ? "
+            "OR (name = 'Максимум сроков' AND ? = 'Максимум сроков' AND is_continuation = 1)) "
+            "ORDER BY position LIMIT 1", (section_id, characteristic, characteristic)
+        ).fetchone()
+        if char is None:
+            raise StorageError(status_code=404, detail=f"Характеристика '{characteristic}' не найдена")
+        conn.execute("DELETE FROM characteristics WHERE id = ?", (char["id"],))
+        self._resolve_section(conn, section_id)
+
+    def _op_reorder_characteristics(self, conn, section_id: int, order: List[str]):
+        rows = conn.execute("SELECT id, grouping FROM characteristics WHERE section_id = ? ORDER BY position",
+                            (section_id,)).fetchall()
+        if not rows:
+            return
+        # Строка заголовков остаётся первой, затем строки из order, затем остальные в прежнем порядке
+        header, data_rows = rows[0], rows[1:]
+        by_grouping: Dict[str, int] = {}
+        for row in data_rows:
+            by_grouping.setdefault(row["grouping"], row["id"])
+        ordered = [by_grouping.pop(name) for name in order if name in by_grouping]
+        placed = set(ordered)
+        ordered += [row["id"] for row in data_rows if row["id"] not in placed]
+        conn.executemany("UPDATE characteristics SET position = ? WHERE id = ?",
+                         [(position, char_id) for position, char_id in enumerate([header["id"]] + ordered)])
+        self._resolve_section(conn, section_id)
+
+    # ----- операции по id строки -----
+
+    def _char_by_id(self, conn, row_id: str) -> sqlite3.Row:
+        char = conn.execute("SELECT * FROM characteristics WHERE row_id = ?", (row_id,)).fetchone()
+        if char is None:
+            raise StorageError(status_code=404, detail=f"Характеристика с id '{row_id}' не найдена")
+        return char
+
+    def _op_update_value_by_id(self, conn, section_id: int, row_id: str, new_value: str,
+                               field_type: Optional[str] = "value", plan_name: Optional[str] = None):
+        self._set_field(conn, section_id, self._char_by_id(conn, row_id), field_type, new_value, plan_name)
+
+    def _op_rename_characteristic_by_id(self, conn, section_id: int, row_id: str, new_name: str):
+        conn.execute("UPDATE characteristics SET grouping = ? WHERE id = ?", (new_name, self._char_by_id(conn, row_id)["id"]))
+        self._resolve_section(conn, section_id)
+
+    def _op_delete_characteristic_by_id(self, conn, section_id: int, row_id: str):
+        char = self._char_by_id(conn, row_id)
+        first = conn.execute("SELECT MIN(position) FROM characteristics WHERE section_id = ?", (section_id,)).fetchone()[0]
+        if char["position"] == first:
+            raise StorageError(status_code=400, detail="Строку заголовков нельзя удалить")
+        conn.execute("DELETE FROM characteristics WHERE id = ?", (char["id"],))
+        self._resolve_section(conn, section_id)
+
+    def _op_reorder_characteristics_by_id(self, conn, section_id: int, order: List[str]):
+        rows = conn.execute("SELECT id, row_id FROM characteristics WHERE section_id = ? ORDER BY position",
+                            (section_id,)).fetchall()
+        if not rows:
+            return
+        header, data_rows = rows[0], rows[1:]
+        by_row_id = {row["row_id"]: row["id"] for row in data_rows}
+        ordered = [by_row_id.pop(row_id) for row_id in order if row_id in by_row_id]
+        placed = set(ordered)
+        ordered += [row["id"] for row in data_rows if row["id"] not in placed]
+        conn.executemany("UPDATE characteristics SET position = ? WHERE id = ?",
+                         [(position, char_id) for position, char_id in enumerate([header["id"]] + ordered)])
+        self._resolve_section(conn, section_id)
+
+    def _apply(self, conn, section: Optional[str], op: Dict) -> str:
+        if section is None and op.get("row_id"):
+            char = self._char_by_id(conn, op["row_id"])
+            found = conn.execute("SELECT * FROM sections WHERE id = ?", (char["section_id"],)).fetchone()
+        else:
+            found = self._locate_section(conn, section)
+        params = dict(op)
+        handler = getattr(self, f"_op_{params.pop('op', None)}", None)
+        if handler is None:
+            raise StorageError(status_code=400, detail=f"Неизвестная операция: {op.get('op')}")
+        handler(conn, found["id"], **params)
+        return found["filename"]
+
+    # ----- синхронные операции (выполняются в пуле потоков) -----
+
+    def modify(self, section: str, op: Dict) -> str:
+        with self._write() as conn:
+            filename = self._apply(conn, section, op)
+        self._notify([filename])
+        return filename
+
+    def modify_many(self, items: List[tuple]) -> List[Dict]:
+        """Пакет операций в одной транзакции: все или ни одной"""
+        results = [{"index": i, "success": True} for i in range(len(items))]
+        filenames = []
+        with self._write() as conn:
+            for i, (section, op) in enumerate(items):
+                try:
+                    filenames.append(self._apply(conn, section, op))
+                except StorageError as e:
+                    results[i] = {"index": i, "success": False, "detail": e.detail}
+            if not all(result["success"] for result in results):
+                raise StorageError(status_code=400, detail={
+                    "message": "Изменения не применены: есть ошибки", "results": results
+                })
+        if filenames:
+            self._notify(sorted(set(filenames)))
+        return results
+
+    def create_section_sync(self, name: str) -> str:
+        filename = section_name_to_filename(name)
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM sections WHERE name = ?", (name,)).fetchone():
+                raise StorageError(status_code=400, detail=f"Раздел '{name}' уже существует")
+            if conn.execute("SELECT 1 FROM sections WHERE filename = ?", (filename,)).fetchone():
+                raise StorageError(status_code=400, detail=f"Файл '{filename}' уже существует")
+            position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM sections").fetchone()[0]
+            table_data = new_section_data(name)
+            section_id = self._insert_section(conn, name, filename, None, position, table_data)
+            for row_position, row in enumerate(table_data["rows"]):
+                self._insert_row(conn, section_id, row_position, row)
+            self._resolve_section(conn, section_id)
+        self._notify([filename])
+        return filename
+
+    def rename_section_sync(self, section: str, new_name: str) -> str:
+        with self._write() as conn:
+            if new_name != section and conn.execute("SELECT 1 FROM sections WHERE name = ?", (new_name,)).fetchone():
+                raise StorageError(status_code=400, detail=f"Раздел '{new_name}' уже существует")
+            filename = self._apply(conn, section, {"op": "rename_section", "new_name": new_name})
+        self._notify([filename])
+        return filename
+
+    def delete_section_sync(self, section: str) -> str:
+        with self._write() as conn:
+            found = self._locate_section(conn, section)
+            conn.execute("DELETE FROM sections WHERE id = ?", (found["id"],))
+        self._notify([found["filename"]])
+        return found["filename"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Хранилище разделов в SQLite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Перенести разделы из JSON файлов в базу")
+    migrate.add_argument("--db", default=SQLITE_DB_FILE, help="Путь к файлу базы")
+    migrate.add_argument("--force", action="store_true", help="Перезаписать непустую базу")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        store = SqliteSectionStore(args.db)
+        existing = store._conn().execute("SELECT COUNT(*) FROM sections").fetchone()[0]
+        if existing and not args.force:
+            print(f"В базе {args.db} уже есть разделы ({existing}); для перезаписи укажите --force")
+            raise SystemExit(1)
+        files = [(filename, load_table_data(filename)) for filename in get_all_json_files()]
+        stats = store.migrate_from_json(files)
+        print(f"Перенесено: файлов {stats['files']}, разделов {stats['sections']}, строк {stats['characteristics']} -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
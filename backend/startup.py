@@ -0,0 +1,87 @@
+"""
+Замеры запуска воркера: импорт модулей, фазы старта и время до готовности.
+
+Отчёт печатается один раз, когда воркер готов обслуживать запросы (каталог
+прогрет). Время до готовности сравнивается с целевым STARTUP_TARGET_MS.
+Модуль импортируется первым в main.py и сам ничего тяжёлого не импортирует.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+# Целевое время от начала импорта приложения до готовности воркера (мс)
+STARTUP_TARGET_MS = float(os.environ.get("STARTUP_TARGET_MS", "1500"))
+
+
+def process_uptime() -> Optional[float]:
+    """Секунды с запуска процесса (Linux /proc); None, если узнать нельзя"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Поля после имени процесса; starttime — 22-е поле stat
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Фазы запуска: (название, секунды) в порядке завершения"""
+
+    def __init__(self, target_ms: float = STARTUP_TARGET_MS):
+        self.target_ms = target_ms
+        self.started = time.perf_counter()
+        self.process_started_ago = process_uptime()  # сколько процесс жил до импорта приложения
+        self.phases: List[Tuple[str, float]] = []
+        self._checkpoint = self.started
+        self.ready_seconds: Optional[float] = None
+
+    def checkpoint(self, name: str):
+        """Фаза от предыдущей отметки до текущего момента (для последовательных импортов)"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._checkpoint))
+        self._checkpoint = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """Фаза, выполняемая в блоке with (может идти параллельно с другими)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def ready(self):
+        """Отметить готовность воркера и напечатать отчёт (один раз)"""
+        if self.is_ready:
+            return
+        self.ready_seconds = time.perf_counter() - self.started
+        self.report()
+
+    def report(self):
+        for name, seconds in self.phases:
+            print(f"[STARTUP] {name}: {seconds * 1000:.1f} мс")
+        ready_ms = self.ready_seconds * 1000
+        line = f"[STARTUP] Воркер готов через {ready_ms:.0f} мс после начала импорта (цель {self.target_ms:.0f} мс)"
+        if self.process_started_ago is not None:
+            line += f", запуск интерпретатора и сервера до импорта: {self.process_started_ago * 1000:.0f} мс"
+        print(line)
+        if ready_ms > self.target_ms:
+            print(f"[STARTUP] ВНИМАНИЕ: время запуска превышает цель на {ready_ms - self.target_ms:.0f} мс")
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "ready_ms": None if self.ready_seconds is None else round(self.ready_seconds * 1000, 1),
+            "target_ms": self.target_ms,
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+        }
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,940 @@
+"""
+Хранилище данных разделов: всё чтение и запись JSON файлов разделов.
+
+Изменения описываются операциями (словарь с полем "op"), которые применяются
+к содержимому файла в памяти и дописываются в журнал файла. Операции
+выполняются в пуле потоков под блокировкой файла, поэтому обработчики получают
+асинхронный API и не блокируют event loop. После записи увеличивается общий
+для воркеров счётчик версий и вызываются подписчики (пересборка каталога).
+Запись между процессами упорядочена блокировкой файла счётчика.
+"""
+import copy
+import json
+import os
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from catalog import (
+    DATA_DIR, deduplicate_pains, file_fingerprint, get_all_json_files, get_data_signature, iter_tables
+)
+from section_registry import file_checksum, section_registry
+from shared_version import SharedVersion, data_version
+
+PLAN_VALUE_KEYS = ["standard", "expert", "optimal", "express", "ultra"]
+
+JOURNAL_SUFFIX = ".journal"
+# Журнал сворачивается в файл фоновым потоком раз в интервал или сразу при достижении лимита записей
+JOURNAL_COMPACT_INTERVAL = float(os.getenv("JOURNAL_COMPACT_INTERVAL", "5"))
+JOURNAL_COMPACT_RECORDS = int(os.getenv("JOURNAL_COMPACT_RECORDS", "500"))
+
+
+class StorageError(HTTPException):
+    """Ошибка операции с данными (раздел не найден, имя занято и т.п.)"""
+
+
+# ===== Поиск в содержимом файла =====
+
+def is_multi_table(file_data: Dict) -> bool:
+    return "tables" in file_data and isinstance(file_data["tables"], list)
+
+
+def find_table(file_data: Dict, section: str) -> Optional[Dict]:
+    """Таблица раздела в содержимом файла"""
+    if is_multi_table(file_data):
+        for table_data in file_data["tables"]:
+            if table_data.get("table_name") == section:
+                return table_data
+        return None
+    return file_data
+
+
+def find_row_in_json(file_data: Dict, section: str, characteristic: str) -> Optional[Dict]:
+    """Найти строку в JSON по разделу и характеристике"""
+    rows = file_data.get("rows", [])
+    last_grouping = None
+
+    for row in rows:
+        grouping = row.get("grouping", "").strip()
+
+        # Если это заголовок секции (Стоимость, Сроки), используем его
+        if grouping in ["Стоимость", "Сроки"]:
+            if characteristic == grouping:
+                return row
+            last_grouping = grouping
+        # Если это обычная характеристика
+        elif grouping and grouping not in ["Группировка", "Стоимость", "Сроки"]:
+            if grouping == characteristic:
+                return row
+            last_grouping = grouping
+        # Если grouping пустой, но есть данные - это может быть "Максимум сроков"
+        elif not grouping and last_grouping:
+            has_data = any(row.get(key) for key in PLAN_VALUE_KEYS)
+            if has_data:
+                # Специальный случай: "Максимум сроков" - строка после "Сроки" с "Макс" в значениях
+                if characteristic == "Максимум сроков" and last_grouping == "Сроки":
+                    values = [row.get(key) for key in PLAN_VALUE_KEYS]
+                    if any(v and "Макс" in str(v) for v in values):
+                        return row
+                # Обычное продолжение строки
+                elif last_grouping == characteristic:
+                    return row
+
+    return None
+
+
+def find_row_index(rows: List[Dict], char_name: str) -> int:
+    """Индекс строки характеристики для удаления (-1, если не найдена)"""
+    last_grouping = None
+    for i, row in enumerate(rows):
+        grouping = row.get("grouping", "").strip()
+
+        # Обычная характеристика
+        if grouping == char_name:
+            return i
+
+        # Сохраняем последний grouping для проверки "Максимум сроков"
+        if grouping:
+            last_grouping = grouping
+        # Строка с пустым grouping после "Сроки" - может быть "Максимум сроков"
+        elif last_grouping == "Сроки" and char_name == "Максимум сроков":
+            values = [row.get(key) for key in PLAN_VALUE_KEYS]
+            if any(v and "Макс" in str(v) for v in values):
+                return i
+    return -1
+
+
+def new_row_id() -> str:
+    """Постоянный id строки таблицы"""
+    return uuid.uuid4().hex[:12]
+
+
+def assign_row_ids(file_data: Dict) -> int:
+    """Проставить id строкам, у которых его нет (или он повторяется); возвращает число новых id"""
+    assigned = 0
+    seen = set()
+    for table_data in iter_tables(file_data):
+        for row in table_data.get("rows", []):
+            # Скопированная вручную строка с чужим id получает новый
+            if not row.get("row_id") or row["row_id"] in seen:
+                row["row_id"] = new_row_id()
+                assigned += 1
+            seen.add(row["row_id"])
+    return assigned
+
+
+def index_rows(file_data: Dict) -> Dict[str, Tuple[Dict, Dict]]:
+    """Индекс строк файла: id -> (таблица, строка)"""
+    return {
+        row["row_id"]: (table_data, row)
+        for table_data in iter_tables(file_data)
+        for row in table_data.get("rows", [])
+        if row.get("row_id")
+    }
+
+
+def find_row_by_id(file_data: Dict, row_id: str) -> Optional[Tuple[Dict, Dict]]:
+    for table_data in iter_tables(file_data):
+        for row in table_data.get("rows", []):
+            if row.get("row_id") == row_id:
+                return table_data, row
+    return None
+
+
+def get_plan_key(plan_name: str) -> str:
+    """Преобразовать название тарифа в ключ JSON"""
+    plan_mapping = {
+        "Стандарт": "standard",
+        "Эксперт": "expert",
+        "Оптима": "optimal",
+        "Экспресс": "express",
+        "Ультра": "ultra"
+    }
+    return plan_mapping.get(plan_name, plan_name.lower())
+
+
+def section_name_to_filename(section_name: str) -> str:
+    """Преобразовать название раздела в имя файла"""
+    # Транслитерация и очистка
+    translit_map = {
+        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+        ' ': '_', '-': '_'
+    }
+    result = []
+    for char in section_name.lower():
+        if char in translit_map:
+            result.append(translit_map[char])
+        elif char.isalnum():
+            result.append(char)
+    return ''.join(result) + '.json'
+
+
+def new_section_data(name: str) -> Dict:
+    """Содержимое файла нового раздела (только строка заголовков)"""
+    return {
+        "table_name": name,
+        "sheet_name": "Лист1",
+        "rows": [
+            {
+                "grouping": "Группировка",
+                "objection": "Возражения",
+                "personal_pain": "Боли личные",
+                "corporate_pain": "Боли корп",
+                "standard": "Стандарт",
+                "expert": "Эксперт",
+                "optimal": "Оптима",
+                "express": "Экспресс",
+                "ultra": "Ультра",
+                "advantages": "Преимущества",
+                "questions": "Вопросы"
+            }
+        ]
+    }
+
+
+# ===== Операции над содержимым файла =====
+
+def _table_or_404(file_data: Dict, section: str) -> Dict:
+    table_data = find_table(file_data, section)
+    if table_data is None:
+        raise StorageError(status_code=404, detail=f"Раздел '{section}' не найден в файле")
+    return table_data
+
+
+def set_row_field(row: Dict, field_type: Optional[str], new_value: str, plan_name: Optional[str] = None):
+    """Записать значение в поле строки (значение тарифа, описание, вопросы, боли)"""
+    if field_type == "value" and plan_name:
+        row[get_plan_key(plan_name)] = new_value
+    elif field_type == "description":
+        row["advantages"] = new_value
+    elif field_type == "questions":
+        row["questions"] = new_value
+    elif field_type == "personal_pain":
+        row["personal_pain"] = deduplicate_pains(new_value)
+        # Очищаем дополнительные колонки чтобы избежать дублирования
+        row["column11"] = ""
+        row["column12"] = ""
+    elif field_type == "corporate_pain":
+        row["corporate_pain"] = deduplicate_pains(new_value)
+        # Очищаем дополнительные колонки чтобы избежать дублирования
+        row["column14"] = ""
+        row["column15"] = ""
+        row["column16"] = ""
+
+
+def _op_update_value(file_data: Dict, section: str, characteristic: str, new_value: str,
+                     field_type: Optional[str] = "value", plan_name: Optional[str] = None):
+    row = find_row_in_json(_table_or_404(file_data, section), section, characteristic)
+    if not row:
+        raise StorageError(status_code=404, detail="Характеристика не найдена")
+    set_row_field(row, field_type, new_value, plan_name)
+
+
+def _op_rename_section(file_data: Dict, section: str, new_name: str):
+    _table_or_404(file_data, section)["table_name"] = new_name
+
+
+def _op_add_characteristic(file_data: Dict, section: str, row: Dict):
+    _table_or_404(file_data, section).setdefault("rows", []).append(dict(row))
+
+
+def _op_rename_characteristic(file_data: Dict, section: str, characteristic: str, new_name: str):
+    for row in _table_or_404(file_data, section).get("rows", []):
+        if row.get("grouping", "").strip() == characteristic:
+            row["grouping"] = new_name
+            return
+    raise StorageError(status_code=404, detail=f"Характеристика '{characteristic}' не найдена")
+
+
+def _op_delete_characteristic(file_data: Dict, section: str, characteristic: str):
+    rows = _table_or_404(file_data, section).get("rows", [])
+    idx = find_row_index(rows, characteristic)
+    if idx < 0:
+        raise StorageError(status_code=404, detail=f"Характеристика '{characteristic}' не найдена")
+    del rows[idx]
+
+
+def _op_reorder_characteristics(file_data: Dict, section: str, order: List[str]):
+    table_data = _table_or_404(file_data, section)
+    rows = table_data.get("rows", [])
+    if not rows:
+        return
+    header = rows[0]  # Сохраняем заголовок
+    # Создаем словарь для быстрого поиска
+    row_dict = {row.get("grouping"): row for row in rows[1:]}
+    new_rows = [header]
+    for name in order:
+        if name in row_dict:
+            new_rows.append(row_dict.pop(name))
+    # Добавляем оставшиеся строки (которых не было в order)
+    new_rows.extend(row_dict.values())
+    table_data["rows"] = new_rows
+
+
+# ----- операции по id строки -----
+
+def _row_by_id(file_data: Dict, row_id: str, row_index: Optional[Dict]) -> Tuple[Dict, Dict]:
+    """(таблица, строка) по id: через индекс файла, без индекса (воспроизведение журнала) — перебором"""
+    found = row_index.get(row_id) if row_index is not None else find_row_by_id(file_data, row_id)
+    if found is None:
+        raise StorageError(status_code=404, detail=f"Характеристика с id '{row_id}' не найдена")
+    return found
+
+
+def _op_update_value_by_id(file_data: Dict, row_id: str, new_value: str, field_type: Optional[str] = "value",
+                           plan_name: Optional[str] = None, row_index: Optional[Dict] = None):
+    _, row = _row_by_id(file_data, row_id, row_index)
+    set_row_field(row, field_type, new_value, plan_name)
+
+
+def _op_rename_characteristic_by_id(file_data: Dict, row_id: str, new_name: str, row_index: Optional[Dict] = None):
+    _, row = _row_by_id(file_data, row_id, row_index)
+    row["grouping"] = new_name
+
+
+def _op_delete_characteristic_by_id(file_data: Dict, row_id: str, row_index: Optional[Dict] = None):
+    table_data, row = _row_by_id(file_data, row_id, row_index)
+    rows = table_data["rows"]
+    if rows and rows[0] is row:
+        raise StorageError(status_code=400, detail="Строку заголовков нельзя удалить")
+    rows[:] = [r for r in rows if r is not row]
+
+
+def _op_reorder_characteristics_by_id(file_data: Dict, section: str, order: List[str], row_index: Optional[Dict] = None):
+    """Порядок по id: строки из order, затем остальные в прежнем порядке (строки не теряются)"""
+    table_data = _table_or_404(file_data, section)
+    rows = table_data.get("rows", [])
+    if not rows:
+        return
+    header = rows[0]
+    by_id = {row.get("row_id"): row for row in rows[1:] if row.get("row_id")}
+    new_rows = [header] + [by_id.pop(row_id) for row_id in order if row_id in by_id]
+    placed = {id(row) for row in new_rows}
+    new_rows.extend(row for row in rows[1:] if id(row) not in placed)
+    table_data["rows"] = new_rows
+
+
+OPERATIONS: Dict[str, Callable] = {
+    "update_value": _op_update_value,
+    "rename_section": _op_rename_section,
+    "add_characteristic": _op_add_characteristic,
+    "rename_characteristic": _op_rename_characteristic,
+    "delete_characteristic": _op_delete_characteristic,
+    "reorder_characteristics": _op_reorder_characteristics,
+    "update_value_by_id": _op_update_value_by_id,
+    "rename_characteristic_by_id": _op_rename_characteristic_by_id,
+    "delete_characteristic_by_id": _op_delete_characteristic_by_id,
+    "reorder_characteristics_by_id": _op_reorder_characteristics_by_id,
+}
+
+# Операции, которые не меняют набор строк файла: индекс id -> строка после них не перестраивается
+POINT_OPERATIONS = {"update_value", "rename_characteristic", "update_value_by_id", "rename_characteristic_by_id"}
+
+
+def update_value_op(characteristic: str, new_value: str, field_type: Optional[str] = "value",
+                    plan_name: Optional[str] = None) -> Dict:
+    """Операция обновления ячейки"""
+    return {
+        "op": "update_value", "characteristic": characteristic, "new_value": new_value,
+        "field_type": field_type, "plan_name": plan_name
+    }
+
+
+def apply_operation(file_data: Dict, op: Dict, row_index: Optional[Dict] = None):
+    """Применить операцию к содержимому файла в памяти (row_index — индекс id строк этого файла)"""
+    params = dict(op)
+    name = params.pop("op", None)
+    handler = OPERATIONS.get(name)
+    if handler is None:
+        raise StorageError(status_code=400, detail=f"Неизвестная операция: {op.get('op')}")
+    if name.endswith("_by_id"):
+        params["row_index"] = row_index
+    handler(file_data, **params)
+
+
+# ===== Хранилище =====
+
+class BaseSectionStore:
+    """
+    Общий асинхронный API хранилищ разделов. Наследники реализуют синхронные
+    операции modify, modify_many, create_section_sync, rename_section_sync
+    и delete_section_sync; здесь они запускаются в пуле потоков.
+    """
+
+    def __init__(self, shared_version: SharedVersion = data_version):
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self.shared_version = shared_version
+
+    def version(self) -> int:
+        """Общий для воркеров счётчик записей (источник каталога сверяет его на каждом запросе)"""
+        return self.shared_version.current()
+
+    def add_listener(self, callback: Callable[[List[str]], None]):
+        """Подписаться на изменения: callback(filenames) вызывается после записи"""
+        self._listeners.append(callback)
+
+    def _notify(self, filenames: List[str]):
+        """Вызывается после снятия блокировок записи: подписчики не задерживают других писателей"""
+        # Сначала счётчик: с этого момента все воркеры (и этот) считают снимок устаревшим
+        self.shared_version.bump()
+        for callback in self._listeners:
+            callback(filenames)
+
+    # ----- асинхронный API для обработчиков -----
+
+    async def apply(self, section: str, op: Dict) -> str:
+        return await run_in_threadpool(self.modify, section, op)
+
+    async def update_value(self, section: str, characteristic: str, new_value: str,
+                           field_type: Optional[str] = "value", plan_name: Optional[str] = None) -> str:
+        return await self.apply(section, update_value_op(characteristic, new_value, field_type, plan_name))
+
+    async def apply_many(self, items: List[tuple]) -> List[Dict]:
+        return await run_in_threadpool(self.modify_many, items)
+
+    async def update_values(self, updates: List[Dict]) -> List[Dict]:
+        """Пакет обновлений ячеек: элементы с полями как у update_value и section (или row_id)"""
+        items = []
+        for update in updates:
+            if update.get("row_id"):
+                items.append((None, {
+                    "op": "update_value_by_id", "row_id": update["row_id"], "new_value": update["new_value"],
+                    "field_type": update.get("field_type", "value"), "plan_name": update.get("plan_name")
+                }))
+            else:
+                items.append((update["section"], update_value_op(
+                    update["characteristic"], update["new_value"],
+                    update.get("field_type", "value"), update.get("plan_name")
+                )))
+        return await self.apply_many(items)
+
+    async def create_section(self, name: str) -> str:
+        return await run_in_threadpool(self.create_section_sync, name)
+
+    async def delete_section(self, section: str) -> str:
+        return await run_in_threadpool(self.delete_section_sync, section)
+
+    async def rename_section(self, section: str, new_name: str) -> str:
+        return await run_in_threadpool(self.rename_section_sync, section, new_name)
+
+    async def add_characteristic(self, section: str, row: Dict) -> str:
+        """Добавить строку; возвращает её id (id задаётся до записи, чтобы журнал воспроизводился одинаково)"""
+        row = dict(row, row_id=row.get("row_id") or new_row_id())
+        await self.apply(section, {"op": "add_characteristic", "row": row})
+        return row["row_id"]
+
+    async def rename_characteristic(self, section: str, characteristic: str, new_name: str) -> str:
+        return await self.apply(section, {
+            "op": "rename_characteristic", "characteristic": characteristic, "new_name": new_name
+        })
+
+    async def delete_characteristic(self, section: str, characteristic: str) -> str:
+        return await self.apply(section, {"op": "delete_characteristic", "characteristic": characteristic})
+
+    async def reorder_characteristics(self, section: str, order: List[str]) -> str:
+        return await self.apply(section, {"op": "reorder_characteristics", "order": list(order)})
+
+    # Операции по id строки (section=None: файл определяется по индексу id)
+
+    async def update_value_by_id(self, row_id: str, new_value: str, field_type: Optional[str] = "value",
+                                 plan_name: Optional[str] = None) -> str:
+        return await self.apply(None, {
+            "op": "update_value_by_id", "row_id": row_id, "new_value": new_value,
+            "field_type": field_type, "plan_name": plan_name
+        })
+
+    async def rename_characteristic_by_id(self, row_id: str, new_name: str) -> str:
+        return await self.apply(None, {"op": "rename_characteristic_by_id", "row_id": row_id, "new_name": new_name})
+
+    async def delete_characteristic_by_id(self, row_id: str) -> str:
+        return await self.apply(None, {"op": "delete_characteristic_by_id", "row_id": row_id})
+
+    async def reorder_characteristics_by_id(self, section: str, order: List[str]) -> str:
+        return await self.apply(section, {"op": "reorder_characteristics_by_id", "order": list(order)})
+
+
+class SectionFileState:
+    """Содержимое файла раздела в памяти: базовый файл с применённым журналом"""
+
+    __slots__ = ("data", "rows", "base_stamp", "base_checksum", "journal_stamp", "records")
+
+    def __init__(self, data: Dict, base_stamp, base_checksum: str, journal_stamp, records: int):
+        self.data = data
+        self.rows = index_rows(data)  # id -> (таблица, строка)
+        self.base_stamp = base_stamp
+        self.base_checksum = base_checksum
+        self.journal_stamp = journal_stamp
+        self.records = records  # записей журнала, ещё не свёрнутых в базовый файл
+
+
+class SectionStore(BaseSectionStore):
+    """
+    JSON файлы разделов с журналом изменений.
+
+    Правка дописывается короткой записью в журнал <файл>.journal (с fsync)
+    и сразу применяется к содержимому в памяти. Фоновый компактор сворачивает
+    журнал в базовый файл (временный файл + rename). Журнал начинается
+    с контрольной суммы базового файла, к которому он относится: если базовый
+    файл уже заменён свёрнутой версией, журнал при старте не применяется повторно.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, registry=section_registry,
+                 compact_interval: float = JOURNAL_COMPACT_INTERVAL, shared_version: SharedVersion = data_version):
+        super().__init__(shared_version)
+        self.data_dir = data_dir
+        self.registry = registry
+        self.compact_interval = compact_interval
+        self._states: Dict[str, SectionFileState] = {}
+        # id строки -> имя файла (для операций по id без поиска по всем файлам)
+        self._row_files: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # Создание и переименование разделов проверяют уникальность названия
+        self._names_lock = threading.Lock()
+        self._generation = 0  # растёт при каждом изменении содержимого в памяти
+        self._stop_event = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+    # ----- файлы -----
+
+    def _lock(self, filename: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(filename)
+            if lock is None:
+                lock = self._locks[filename] = threading.Lock()
+            return lock
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+
+    def _journal_path(self, filename: str) -> str:
+        return self._path(filename) + JOURNAL_SUFFIX
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _state(self, filename: str) -> Optional[SectionFileState]:
+        """
+        Состояние файла (вызывается под блокировкой файла); перечитывается, если файлы изменены извне.
+        None — в файле есть строки без id, а общая блокировка записи не взята (см. read_file).
+        """
+        state = self._states.get(filename)
+        base_stamp = self._stamp(self._path(filename))
+        journal_stamp = self._stamp(self._journal_path(filename))
+        if state is not None and state.base_stamp == base_stamp and state.journal_stamp == journal_stamp:
+            return state
+        with open(self._path(filename), "rb") as f:
+            raw = f.read()
+        checksum = file_checksum(raw)
+        data = json.loads(raw)
+        backfilled = assign_row_ids(data)
+        records = self._replay_journal(filename, data, checksum)
+        if backfilled:
+            if not self.shared_version.held():
+                return None
+            # Новые id сразу сохраняются в файл (вместе с содержимым журнала) — как правка, под общей блокировкой
+            print(f"[STORAGE] {filename}: проставлены id для {backfilled} строк")
+            return self._write_base(filename, data)
+        # Отметка журнала снята до чтения: запись другого процесса после неё вызовет повторное чтение
+        if not os.path.exists(self._journal_path(filename)):
+            journal_stamp = None
+        state = SectionFileState(data, base_stamp, checksum, journal_stamp, records)
+        self._set_state(filename, state)
+        return state
+
+    def _set_state(self, filename: str, state: SectionFileState):
+        previous = self._states.get(filename)
+        self._states[filename] = state
+        self._index_rows(filename, previous.rows if previous is not None else {}, state.rows)
+
+    def _drop_state(self, filename: str):
+        """Забыть состояние файла вместе с id его строк (файл удалён или будет перечитан)"""
+        previous = self._states.pop(filename, None)
+        if previous is not None:
+            self._index_rows(filename, previous.rows, {})
+
+    def _reindex(self, filename: str, state: SectionFileState, rows: Optional[Dict] = None):
+        """Перестроить индекс id после операции, изменившей набор строк"""
+        previous = state.rows
+        state.rows = index_rows(state.data) if rows is None else rows
+        self._index_rows(filename, previous, state.rows)
+
+    def _index_rows(self, filename: str, previous: Dict, rows: Dict):
+        """Обновить индекс id -> файл: убрать исчезнувшие строки файла и добавить текущие"""
+        for row_id in previous:
+            if row_id not in rows and self._row_files.get(row_id) == filename:
+                del self._row_files[row_id]
+        for row_id in rows:
+            self._row_files[row_id] = filename
+
+    def _replay_journal(self, filename: str, data: Dict, base_checksum: str) -> int:
+        """Применить журнал к содержимому базового файла; возвращает число применённых записей"""
+        journal_path = self._journal_path(filename)
+        try:
+            with open(journal_path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            # Нет журнала (или его только что свернул другой воркер — тогда изменится отметка файла)
+            return 0
+        header = self._parse_record(lines[0]) if lines else None
+        if not header or header.get("base") != base_checksum:
+            # Журнал относится к другой версии файла: он уже свёрнут или файл заменён вручную.
+            # Удаляет его только писатель: читатель мог прочитать базовый файл до свёртки другим воркером
+            print(f"[STORAGE] Журнал {filename}{JOURNAL_SUFFIX} не относится к текущему файлу, пропущен")
+            if self.shared_version.held():
+                os.remove(journal_path)
+            return 0
+        applied = 0
+        for line in lines[1:]:
+            record = self._parse_record(line)
+            if record is None:
+                # Недописанная последняя запись (сбой во время записи) — отбрасываем
+                print(f"[STORAGE] Повреждённая запись в журнале {filename}{JOURNAL_SUFFIX} пропущена")
+                continue
+            try:
+                apply_operation(data, record)
+                applied += 1
+            except StorageError as e:
+                print(f"[STORAGE] Запись журнала {filename}{JOURNAL_SUFFIX} не применена: {e.detail}")
+        return applied
+
+    @staticmethod
+    def _parse_record(line: str) -> Optional[Dict]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _append_journal(self, filename: str, state: SectionFileState, records: List[Dict]):
+        """Дописать записи в журнал одним fsync"""
+        journal_path = self._journal_path(filename)
+        lines = []
+        if not os.path.exists(journal_path):
+            lines.append(json.dumps({"base": state.base_checksum}))
+        elif not self._ends_with_newline(journal_path):
+            # Недописанная запись после сбоя: новая запись начинается с новой строки
+            lines.append("")
+        lines.extend(json.dumps(record, ensure_ascii=False) for record in records)
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        state.journal_stamp = self._stamp(journal_path)
+        state.records += len(records)
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    @staticmethod
+    def _fsync_dir(path: str):
+        """Сбросить на диск запись папки (rename); на Windows папку так открыть нельзя"""
+        if os.name == "nt":
+            return
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_base(self, filename: str, file_data: Dict) -> SectionFileState:
+        """Атомарно записать базовый файл (временный файл + rename) и удалить журнал"""
+        path = self._path(filename)
+        raw = json.dumps(file_data, ensure_ascii=False, indent=2).encode("utf-8")
+        # Временный файл у каждого процесса свой (как у манифеста реестра)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # Переименование должно дойти до диска раньше удаления журнала, иначе после
+        # сбоя питания может остаться старый базовый файл без журнала
+        self._fsync_dir(self.data_dir)
+        # После замены файла журнал больше не совпадает по контрольной сумме
+        if os.path.exists(self._journal_path(filename)):
+            os.remove(self._journal_path(filename))
+        state = SectionFileState(file_data, self._stamp(path), file_checksum(raw), None, 0)
+        self._set_state(filename, state)
+        return state
+
+    def read_file(self, filename: str) -> Dict:
+        """Копия текущего содержимого файла (с учётом журнала)"""
+        with self._lock(filename):
+            state = self._state(filename)
+            if state is not None:
+                return copy.deepcopy(state.data)
+        # Строкам без id они проставляются с записью файла: под общей блокировкой, файл перечитывается
+        with self.shared_version.locked(), self._lock(filename):
+            return copy.deepcopy(self._state(filename).data)
+
+    def get_filename(self, section: str) -> Optional[str]:
+        """Имя файла раздела по реестру разделов"""
+        return self.registry.get_filename(section)
+
+    def _locate(self, section: str) -> str:
+        filename = self.registry.get_filename(section)
+        if not filename:
+            raise StorageError(status_code=404, detail=f"Раздел '{section}' не найден")
+        if not os.path.exists(self._path(filename)):
+            raise StorageError(status_code=404, detail=f"Файл для раздела '{section}' не найден")
+        return filename
+
+    def _locate_row(self, row_id: str) -> str:
+        """Файл строки по id (O(1) по индексу; при промахе загружаются ещё не прочитанные файлы)"""
+        filename = self._row_files.get(row_id)
+        if filename is None:
+            self.load_files()
+            filename = self._row_files.get(row_id)
+        if filename is None or not os.path.exists(self._path(filename)):
+            raise StorageError(status_code=404, detail=f"Характеристика с id '{row_id}' не найдена")
+        return filename
+
+    def _locate_item(self, section: Optional[str], op: Dict) -> str:
+        if section is None and op.get("row_id"):
+            return self._locate_row(op["row_id"])
+        return self._locate(section)
+
+    @staticmethod
+    def _record(section: Optional[str], op: Dict) -> Dict:
+        return dict(op) if section is None else dict(op, section=section)
+
+    def _committed(self, filenames: List[str], structural: bool = False):
+        """Оповестить подписчиков; после записи базового файла обновить реестр"""
+        self._generation += 1
+        if structural:
+            for filename in filenames:
+                self.registry.refresh_file(filename)
+        self._notify(filenames)
+
+    # ----- источник каталога -----
+
+    def signature(self) -> Tuple:
+        """Отпечаток файлов и журналов (в том числе записанных другими процессами)"""
+        journals = []
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(JOURNAL_SUFFIX) and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # журнал свёрнут другим воркером во время обхода
+                    journals.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        journals.sort()
+        return get_data_signature(self.data_dir) + tuple(journals) + (("generation", self._generation),)
+
+    def fingerprint(self) -> Tuple:
+        """Контрольные суммы файлов и их журналов в порядке загрузки (для проверки бинарного снимка)"""
+        return tuple(
+            (filename, file_fingerprint(self._path(filename)), file_fingerprint(self._journal_path(filename)))
+            for filename in get_all_json_files(self.data_dir)
+        )
+
+    def load_files(self) -> List[Tuple[str, Dict]]:
+        # Порядок файлов — как у os.listdir, чтобы порядок характеристик не менялся
+        files = []
+        for filename in get_all_json_files(self.data_dir):
+            try:
+                files.append((filename, self.read_file(filename)))
+            except (OSError, ValueError) as e:
+                print(f"[STORAGE] Не удалось прочитать {filename}: {e}")
+        return files
+
+    # ----- журнал -----
+
+    def compact(self, filename: str) -> bool:
+        """Свернуть журнал файла в базовый файл; False, если сворачивать нечего"""
+        with self.shared_version.locked(), self._lock(filename):
+            if not os.path.exists(self._journal_path(filename)):
+                return False
+            state = self._state(filename)
+            self._write_base(filename, state.data)
+        self.registry.refresh_file(filename)
+        print(f"[STORAGE] Журнал {filename}{JOURNAL_SUFFIX} свёрнут (записей: {state.records})")
+        return True
+
+    def compact_all(self) -> int:
+        compacted = 0
+        for name in os.listdir(self.data_dir):
+            if name.endswith(JOURNAL_SUFFIX):
+                filename = name[:-len(JOURNAL_SUFFIX)]
+                if not os.path.exists(self._path(filename)):
+                    os.remove(self._path(name))
+                    continue
+                compacted += self.compact(filename)
+        return compacted
+
+    def recover(self):
+        """При старте: применить несвёрнутые журналы и свернуть их в файлы"""
+        compacted = self.compact_all()
+        if compacted:
+            print(f"[STORAGE] Восстановлено из журналов: {compacted} файлов")
+
+    def start_compactor(self):
+        """Запустить фоновое сворачивание журналов"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._stop_event.clear()
+        self._compactor = threading.Thread(target=self._compact_loop, name="journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        """Остановить компактор и свернуть оставшиеся журналы"""
+        self._stop_event.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=self.compact_interval + 1)
+            self._compactor = None
+        self.compact_all()
+
+    def _compact_loop(self):
+        while not self._stop_event.wait(self.compact_interval):
+            try:
+                self.compact_all()
+            except Exception as e:
+                print(f"[STORAGE] Ошибка при сворачивании журналов: {e}")
+
+    # ----- синхронные операции (выполняются в пуле потоков) -----
+
+    def modify(self, section: str, op: Dict) -> str:
+        """Применить операцию к разделу: запись в журнал и изменение в памяти; возвращает имя файла"""
+        filename = self._locate_item(section, op)
+        record = self._record(section, op)
+        with self.shared_version.locked(), self._lock(filename):
+            state = self._state(filename)
+            # Операции проверяют всё до изменения данных, поэтому ошибка не оставляет частичных правок
+            apply_operation(state.data, record, state.rows)
+            if record["op"] not in POINT_OPERATIONS:
+                self._reindex(filename, state)
+            try:
+                self._append_journal(filename, state, [record])
+            except Exception:
+                # Память и диск разошлись — перечитаем файл при следующем обращении
+                self._drop_state(filename)
+                raise
+            needs_compaction = state.records >= JOURNAL_COMPACT_RECORDS
+        self._committed([filename])
+        if needs_compaction:
+            self.compact(filename)
+        return filename
+
+    def modify_many(self, items: List[tuple]) -> List[Dict]:
+        """Применить пакет операций [(section, op)]: все или ни одной, одна запись в журнал на файл.
+
+        Возвращает результаты по элементам; если хотя бы одна операция не применилась,
+        данные не изменяются и бросается StorageError со списком результатов.
+        """
+        results = [{"index": i, "success": True} for i in range(len(items))]
+        located = []
+        for i, (section, op) in enumerate(items):
+            try:
+                located.append((self._locate_item(section, op), i, self._record(section, op)))
+            except StorageError as e:
+                results[i] = {"index": i, "success": False, "detail": e.detail}
+        filenames = sorted({filename for filename, _, _ in located})
+        locks = [self.shared_version] if filenames else []
+        locks += [self._lock(filename) for filename in filenames]
+        for lock in locks:
+            lock.acquire()
+        try:
+            states = {filename: self._state(filename) for filename in filenames}
+            # Пакет применяется к копиям, чтобы при ошибке не осталось частичных правок
+            drafts = {filename: copy.deepcopy(state.data) for filename, state in states.items()}
+            draft_rows = {filename: index_rows(draft) for filename, draft in drafts.items()}
+            records: Dict[str, List[Dict]] = {filename: [] for filename in filenames}
+            for filename, i, record in located:
+                try:
+                    apply_operation(drafts[filename], record, draft_rows[filename])
+                    if record["op"] not in POINT_OPERATIONS:
+                        draft_rows[filename] = index_rows(drafts[filename])
+                    records[filename].append(record)
+                except StorageError as e:
+                    results[i] = {"index": i, "success": False, "detail": e.detail}
+            if not all(result["success"] for result in results):
+                raise StorageError(status_code=400, detail={
+                    "message": "Изменения не применены: есть ошибки", "results": results
+                })
+            for filename in filenames:
+                try:
+                    self._append_journal(filename, states[filename], records[filename])
+                except Exception:
+                    self._drop_state(filename)
+                    raise
+                states[filename].data = drafts[filename]
+                self._reindex(filename, states[filename], draft_rows[filename])
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        if filenames:
+            self._committed(filenames)
+        return results
+
+    def create_section_sync(self, name: str) -> str:
+        # Уникальность названия проверяется под общей блокировкой: раздел мог создать другой воркер
+        with self._names_lock, self.shared_version.locked():
+            if self.registry.get_filename(name):
+                raise StorageError(status_code=400, detail=f"Раздел '{name}' уже существует")
+            filename = section_name_to_filename(name)
+            with self._lock(filename):
+                if os.path.exists(self._path(filename)):
+                    raise StorageError(status_code=400, detail=f"Файл '{filename}' уже существует")
+                file_data = new_section_data(name)
+                assign_row_ids(file_data)
+                self._write_base(filename, file_data)
+        self._committed([filename], structural=True)
+        return filename
+
+    def rename_section_sync(self, section: str, new_name: str) -> str:
+        """Переименование меняет реестр разделов, поэтому файл сразу переписывается целиком"""
+        with self._names_lock, self.shared_version.locked():
+            if new_name != section and self.registry.get_filename(new_name):
+                raise StorageError(status_code=400, detail=f"Раздел '{new_name}' уже существует")
+            filename = self._locate(section)
+            with self._lock(filename):
+                file_data = copy.deepcopy(self._state(filename).data)
+                apply_operation(file_data, {"op": "rename_section", "section": section, "new_name": new_name})
+                self._write_base(filename, file_data)
+        self._committed([filename], structural=True)
+        return filename
+
+    def delete_section_sync(self, section: str) -> str:
+        filename = self._locate(section)
+        with self.shared_version.locked(), self._lock(filename):
+            file_data = copy.deepcopy(self._state(filename).data)
+            remaining = None
+            if is_multi_table(file_data):
+                # Файл содержит несколько таблиц - удаляем только нужную
+                remaining = [t for t in file_data["tables"] if t.get("table_name") != section]
+                if len(remaining) == len(file_data["tables"]):
+                    raise StorageError(status_code=404, detail=f"Раздел '{section}' не найден в файле")
+            if remaining:
+                file_data["tables"] = remaining
+                self._write_base(filename, file_data)
+            else:
+                # Одна таблица или последняя таблица файла - удаляем файл вместе с журналом
+                os.remove(self._path(filename))
+                if os.path.exists(self._journal_path(filename)):
+                    os.remove(self._journal_path(filename))
+                self._drop_state(filename)
+        self._committed([filename], structural=True)
+        return filename
+
+
+section_store = SectionStore()
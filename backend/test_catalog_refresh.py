@@ -0,0 +1,95 @@
+"""
+Одиночная пересборка каталога: одновременные refresh() после правки в другом
+воркере выполняют одну сборку, остальные вызовы дожидаются её результата;
+серия request_refresh() после записей собирается наблюдателем один раз;
+если сборка упала, ожидавшие вызовы получают её ошибку, а не собирают каталог сами.
+
+Источник — таблица в памяти (фикстура table_source) с медленной загрузкой
+и счётчиком сборок; общий снимок на диске не используется (snapshot_path="").
+"""
+import threading
+import time
+
+from catalog import PlanCatalog
+
+BURST = 50
+
+
+def test_burst_is_one_rebuild(table_source):
+    source = table_source
+    source.delay = 0.2
+    catalog = PlanCatalog(source=source, snapshot_path="")
+    catalog.rebuild()
+    assert source.loads == 1
+
+    source.data_version = 2  # правка в другом воркере
+    assert catalog.is_stale()
+    start = threading.Barrier(BURST)
+    results = []
+
+    def reader():
+        start.wait()
+        results.append(catalog.refresh())
+
+    threads = [threading.Thread(target=reader) for _ in range(BURST)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert source.loads == 2
+    assert not catalog.is_stale()
+    assert len({snapshot.version for snapshot in results}) == 1
+    stats = catalog.stats()
+    assert stats["builds"] == 2
+    # Присоединились к сборке или пришли сразу после неё (снимок уже актуален)
+    assert stats["coalesced"] + stats["unchanged"] == BURST - 1
+    assert stats["coalesced"] >= BURST // 2
+    assert stats["rebuild_seconds_max"] >= 0.2
+
+
+def test_requested_refresh_runs_in_watcher(table_source):
+    source = table_source
+    source.delay = 0.2
+    catalog = PlanCatalog(poll_interval=3600, source=source, snapshot_path="")
+    catalog.rebuild()
+    catalog.start_watcher()
+    try:
+        started = time.perf_counter()
+        for i in range(10):  # серия записей: каждая только запрашивает пересборку
+            source.data_version += 1
+            catalog.request_refresh()
+        assert time.perf_counter() - started < 0.1
+        assert catalog.is_stale()
+        deadline = time.time() + 5
+        while catalog.is_stale() and time.time() < deadline:
+            time.sleep(0.05)
+        assert not catalog.is_stale()
+        assert source.loads == 2
+    finally:
+        catalog.stop_watcher()
+
+
+def test_failed_rebuild_is_not_repeated_by_followers(table_source):
+    source = table_source
+    source.delay, source.error = 0.2, OSError("диск недоступен")
+    catalog = PlanCatalog(source=source, snapshot_path="")
+    start = threading.Barrier(BURST)
+    errors = []
+
+    def reader():
+        start.wait()
+        try:
+            catalog.refresh()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(BURST)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == BURST
+    assert source.loads < BURST // 2  # одна сборка на волну ожидающих, а не по сборке на вызов
+    assert not catalog.built
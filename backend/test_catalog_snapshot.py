@@ -0,0 +1,43 @@
+"""
+Общий снимок каталога (файл, отображаемый в память): воркер, отобразивший снимок,
+читает строки по id (карточка, журнал изменений, поисковый индекс) из их записей
+в файле и не разбирает все тарифы; нестандартная выборка загружает их один раз.
+"""
+import os
+
+from catalog import PlanCatalog, normalize_fields, project_plans, render_json
+from search import CatalogSearch
+
+
+def test_mapped_snapshot_reads_rows_without_full_state(tmp_path, table_source):
+    path = os.path.join(tmp_path, ".catalog.snapshot")
+    source = table_source
+    built = PlanCatalog(source=source, snapshot_path=path).rebuild()
+    assert built.shared
+
+    worker = PlanCatalog(source=source, snapshot_path=path)
+    search = CatalogSearch()
+    worker.add_listener(search.apply)
+    mapped = worker.load_snapshot()
+    assert mapped is not None and mapped.shared
+    cursor = worker.cursor(mapped)
+    search.ensure(mapped)  # полная сборка индекса разбирает тарифы — как в фоне после старта
+
+    # Правка в другом воркере: новый снимок только отображается из файла
+    source.data_version, source.reaction = 2, "12 ч"
+    PlanCatalog(source=source, snapshot_path=path).rebuild()
+    mapped = worker.refresh()
+    assert mapped.shared and worker.stats()["mapped"] == 2
+    changes = worker.changes_since(cursor)
+    assert [row["id"] for row in changes["upserts"]] == ["r1"]
+    assert changes["upserts"][0]["plans"]["Стандарт"]["значение"] == "12 ч"
+    assert mapped.characteristic("expert", "r2")["возражения"] == "Дорого"
+    assert mapped.characteristic("Неизвестный", "r2") is None
+    assert mapped.characteristic("expert", "r3") is None
+    assert search.stats()["version"] == mapped.version
+    assert mapped._plans is None  # журнал, карточка и поиск не загрузили тарифы целиком
+
+    fields = normalize_fields("значение")
+    body = mapped.plans_response(None, None, fields=fields, plan_names=("Эксперт",))
+    assert mapped._plans is not None
+    assert bytes(body.body) == render_json({"plans": project_plans(mapped.plans[1:2], fields)})
@@ -0,0 +1,65 @@
+"""
+Компактный формат /api/plans (?format=compact): обратное преобразование
+expand_compact_plans(compact_plans(...)) возвращает те же тарифы — с болями
+(в том числе нераспознанными написаниями), строками-продолжениями, заголовками
+разделов и сокращениями в значениях; с проекцией fields — те же выбранные поля.
+"""
+from catalog import (
+    CHARACTERISTIC_FIELDS, DASHBOARD_FIELDS, compact_plans, convert_table_to_plans_format, expand_compact_plans,
+    normalize_fields, project_plans
+)
+
+TABLES = [
+    {"table_name": "srochnost", "rows": [
+        {"grouping": "Группировка", "standard": "Стандарт"},
+        {"grouping": "Стоимость", "standard": "220 000", "expert": "400 000", "optimal": "600 000",
+         "express": "900 000", "ultra": "1 350 000"},
+        {"grouping": "Сроки", "standard": "Мин 10 рд", "expert": "5 дней (60%)", "personal_pain": "Скорость"},
+        {"grouping": "", "standard": "Макс 20 рд", "expert": "Макс 10"},  # «Максимум сроков»
+        {"grouping": "Реакция", "standard": "24", "expert": "=A1", "personal_pain": "Скор, лёгкость",
+         "corporate_pain": "Безоп", "column11": "Экономия", "column14": "Сроки",
+         "objection": "Дорого", "questions": "Как быстро?", "advantages": "Быстрый ответ"},
+        {"grouping": "", "standard": "+", "expert": "-"},  # продолжение «Реакция»
+        {"grouping": "Замена", "standard": "-", "corporate_pain": "Лекость, Непонятно"},
+    ]},
+    {"table_name": "gibkost", "rows": [
+        {"grouping": "Группировка"},
+        {"grouping": "Команда", "standard": "1 человек", "expert": "2 р/д", "personal_pain": "Легкость"},
+    ]},
+]
+
+
+def sample_plans():
+    plans = []
+    for table in TABLES:
+        converted = convert_table_to_plans_format(table)
+        if not plans:
+            plans = converted
+        else:
+            for plan, more in zip(plans, converted):
+                plan["характеристики"].extend(more["характеристики"])
+    return plans
+
+
+def test_round_trip():
+    plans = sample_plans()
+    chars = plans[0]["характеристики"]
+    assert [c["характеристика"] for c in chars] == \
+        ["Стоимость", "Сроки", "Максимум сроков", "Реакция", "Реакция", "Замена", "Команда"]
+    assert [c["is_section_header"] for c in chars[:3]] == [True, True, False]
+
+    compact = compact_plans(plans, None)
+    assert "fields" not in compact
+    assert "Непонятно" in compact["pains"]  # нераспознанная категория не теряется
+    assert expand_compact_plans(compact) == plans
+    assert set(plans[0]["характеристики"][0]) == set(CHARACTERISTIC_FIELDS)
+
+
+def test_round_trip_with_projection():
+    plans = sample_plans()
+    selections = [normalize_fields(fields) for fields in
+                  ["значение", "raw_value", "личные_боли,корпоративные_боли", "сомнения,сравнение"]]
+    for selected in selections + [DASHBOARD_FIELDS]:
+        compact = compact_plans(plans, selected)
+        assert compact["fields"] == list(selected)
+        assert expand_compact_plans(compact) == project_plans(plans, selected), selected
@@ -0,0 +1,74 @@
+"""
+Сжатые варианты ответов каталога: gzip и br распаковываются в исходное тело
+(в том числе готовые ответы снимка), выбор кодировки по Accept-Encoding с q
+и identity;q=0, 304 для ETag любого сжатого варианта.
+"""
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from catalog import PlanCatalog, RenderedBody, compress_body, encoded_etag, render_body
+from main import catalog_response, negotiate_encoding
+
+BOTH = {"br": b"", "gzip": b""}
+
+
+def request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/api/plans", "headers": raw})
+
+
+def sample_body() -> RenderedBody:
+    return render_body({"plans": [{"название": "Стандарт", "характеристики": [{"значение": "24 ч"}] * 20}]})
+
+
+def test_gzip_variants_decompress_to_body(store):
+    body = sample_body()
+    assert gzip.decompress(body.encoded["gzip"]) == body.body
+    snapshot = PlanCatalog(source=store, snapshot_path="").rebuild()
+    for cached in snapshot.responses.values():
+        if "gzip" in cached.encoded:
+            assert gzip.decompress(bytes(cached.encoded["gzip"])) == bytes(cached.body)
+
+
+def test_brotli_variant_decompresses_to_body():
+    brotli = pytest.importorskip("brotli")
+    body = sample_body()
+    assert brotli.decompress(body.encoded["br"]) == body.body
+
+
+def test_incompressible_body_has_no_variants():
+    assert compress_body(b"{}") == {}
+
+
+@pytest.mark.parametrize("accept_encoding, available, expected", [
+    ("", BOTH, None),
+    ("gzip", BOTH, "gzip"),
+    ("gzip, br", BOTH, "br"),  # при равном q — br
+    ("br;q=0.5, gzip", BOTH, "gzip"),
+    ("br;q=0, gzip;q=0.1", BOTH, "gzip"),
+    ("GZIP; Q=0.8", BOTH, "gzip"),
+    ("gzip;q=0", BOTH, None),
+    ("gzip;q=abc", BOTH, None),
+    ("*", BOTH, "br"),
+    ("*;q=0.3, br;q=0", BOTH, "gzip"),
+    ("br", {"gzip": b""}, None),
+    ("identity;q=0", BOTH, "br"),
+    ("identity;q=0, br;q=0", BOTH, "gzip"),
+    ("identity;q=0", {}, None),
+    ("*;q=0", BOTH, None),
+])
+def test_negotiate_encoding(accept_encoding, available, expected):
+    assert negotiate_encoding(request(accept_encoding=accept_encoding), available) == expected
+
+
+@pytest.mark.parametrize("accept_encoding", ["", "gzip", "br", "identity;q=0"])
+def test_not_modified_for_any_encoded_etag(accept_encoding):
+    body = sample_body()
+    body = body._replace(encoded=dict(body.encoded, br=b"br-body"))
+    for tag in [body.etag] + [encoded_etag(body.etag, name) for name in body.encoded]:
+        response = catalog_response(request(if_none_match=tag, accept_encoding=accept_encoding), body)
+        assert response.status_code == 304, (tag, accept_encoding)
+        assert response.body == b""
+    assert catalog_response(request(if_none_match='"other-gzip"'), body).status_code == 200
@@ -0,0 +1,40 @@
+"""
+ETag и If-None-Match у ответов каталога (catalog_response): 304 для того же тела
+в любом варианте сжатия, списка тегов, W/ и "*", и 200 с новым телом после правки.
+"""
+from starlette.requests import Request
+
+from catalog import encoded_etag, render_body
+from main import catalog_response
+
+
+def request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/api/plans", "headers": raw})
+
+
+def test_etag_and_not_modified():
+    body = render_body({"plans": [{"название": "Стандарт", "характеристики": []}] * 50})
+    assert body.etag == render_body({"plans": [{"название": "Стандарт", "характеристики": []}] * 50}).etag
+
+    response = catalog_response(request(), body, version="e.1")
+    assert response.status_code == 200 and response.body == body.body
+    assert response.headers["etag"] == body.etag
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["x-catalog-version"] == "e.1"
+
+    gzipped = catalog_response(request(accept_encoding="gzip"), body)
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == encoded_etag(body.etag, "gzip")
+
+    # Тот же ответ в любом варианте сжатия — 304 без тела
+    for tag in [body.etag, encoded_etag(body.etag, "gzip"), "W/" + body.etag, f'"other", {body.etag}', "*"]:
+        response = catalog_response(request(if_none_match=tag, accept_encoding="gzip"), body)
+        assert response.status_code == 304, tag
+        assert response.body == b""
+        assert response.headers["etag"] == encoded_etag(body.etag, "gzip")
+
+    # После правки тело другое — старый тег не подходит
+    changed = render_body({"plans": []})
+    assert changed.etag != body.etag
+    assert catalog_response(request(if_none_match=body.etag), changed).status_code == 200
@@ -0,0 +1,59 @@
+"""
+Поток событий /api/events: подписка снимается, если поток не начался; путь потока
+не проходит через GZip; токен из параметра token не попадает в журнал доступа.
+"""
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import main
+from events import event_broadcaster
+
+
+def test_failed_start_unsubscribes():
+    async def broken_catalog():
+        raise OSError("каталог недоступен")
+
+    original = main.current_catalog
+    main.current_catalog = broken_catalog
+    try:
+        try:
+            asyncio.run(main.catalog_events(current_user=None))
+        except OSError:
+            pass
+        else:
+            raise AssertionError("ошибка каталога не дошла до клиента")
+    finally:
+        main.current_catalog = original
+    assert event_broadcaster.count() == 0
+
+
+def test_stream_path_is_not_gzipped():
+    app = FastAPI()
+    app.add_middleware(main.StreamAwareGZipMiddleware, exclude_paths=("/api/events",), minimum_size=10)
+    body = b"data: " + b"x" * 4096 + b"\n\n"
+
+    @app.get("/api/events")
+    async def events():
+        return StreamingResponse(iter([body]), media_type="text/plain")
+
+    @app.get("/api/other")
+    async def other():
+        return StreamingResponse(iter([body]), media_type="text/plain")
+
+    client = TestClient(app)
+    assert "content-encoding" not in client.get("/api/events", headers={"Accept-Encoding": "gzip"}).headers
+    assert client.get("/api/other", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+def test_token_is_redacted_in_access_log():
+    assert main.redact_url("/api/events?token=abc.def&x=1") == "/api/events?token=***&x=1"
+    assert main.redact_url("/api/events?x=1&token=abc") == "/api/events?x=1&token=***"
+    assert main.redact_url("/api/plans?pain_type=personal") == "/api/plans?pain_type=personal"
+    record = logging.LogRecord("uvicorn.access", logging.INFO, __file__, 0, '%s - "%s %s HTTP/%s" %d',
+                               ("127.0.0.1:5000", "GET", "/api/events?token=secret", "1.1", 200), None)
+    assert main.RedactTokenFilter().filter(record)
+    assert "secret" not in record.getMessage()
@@ -0,0 +1,56 @@
+"""
+Числа в значениях и шкала прогресс-бара: разбор числа и единицы (в том числе после
+расшифровки сокращений), диапазон строки и шкала тарифов, явный процент шапки "Сроки",
+передача шкалы в компактном формате /api/plans.
+"""
+from catalog import (DASHBOARD_FIELDS, compact_plans, convert_table_to_plans_format, expand_compact_plans,
+                     parse_magnitude, project_plans)
+
+HEADER = {"grouping": "Группировка", "standard": "Стандарт", "expert": "Эксперт", "optimal": "Оптима",
+          "express": "Экспресс", "ultra": "Ультра"}
+
+
+def table(*rows):
+    rows = [dict(zip(["grouping", "standard", "expert", "optimal", "express", "ultra"], row)) for row in rows]
+    return {"table_name": "srochnost", "rows": [HEADER] + rows}
+
+
+def column(plans, field, position):
+    return [plan["характеристики"][position][field] for plan in plans]
+
+
+def test_parse_magnitude():
+    assert parse_magnitude("Минимум 10 раз в день") == (10, "раз в день")
+    assert parse_magnitude("1 350 000 | 100") == (1350000, "")
+    assert parse_magnitude("1,5 часа (30%)") == (1.5, "часа")
+    assert parse_magnitude("24") == (24, "")
+    assert parse_magnitude("+") is None
+    assert parse_magnitude("по запросу") is None
+
+
+def test_row_scale():
+    plans = convert_table_to_plans_format(table(
+        ["Сроки", "Мин 10 рд", "5 дней (60%)", "-", "+", "3"],
+        ["Время реакции", "24", "12", "6", "2", "1"],
+        ["Команда", "2", "2", "2", "2", "-"],
+        ["Выезд", "-", "+", "+", "+", "+"],
+    ))
+    assert column(plans, "число", 0) == [10, 5, None, None, 3]
+    assert column(plans, "единица", 0)[:2] == ["раз в день", "дней"]
+    # Явный процент "Сроки" важнее положения в диапазоне; "3" в конце — тоже процент
+    assert column(plans, "шкала", 0) == [1.0, 0.6, None, None, 0.03]
+    assert column(plans, "диапазон", 1) == [[1, 24]] * 5
+    assert column(plans, "шкала", 1) == [1.0, 0.4783, 0.2174, 0.0435, 0.0]
+    assert column(plans, "шкала", 2) == [1.0, 1.0, 1.0, 1.0, None]  # все числа равны
+    assert column(plans, "диапазон", 3) == [None] * 5
+
+
+def test_compact_round_trip():
+    plans = convert_table_to_plans_format(table(["Время реакции", "24", "12", "6", "2", "1"],
+                                                ["Выезд", "-", "+", "+", "+", "+"]))
+    for fields in (None, DASHBOARD_FIELDS):
+        compact = compact_plans(plans, fields)
+        assert expand_compact_plans(compact) == project_plans(plans, fields)
+    rows = compact_plans(plans, DASHBOARD_FIELDS)["rows"]
+    assert rows[0][-1] == [1.0, 0.4783, 0.2174, 0.0435, 0.0]
+    assert rows[1][-1] is None  # в строке без чисел шкала не передаётся
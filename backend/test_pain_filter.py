@@ -0,0 +1,86 @@
+"""
+Сравнение фильтра болей по маскам (filter_plans_indexed) с построчным фильтром
+(filter_plans) на данных из JSON файлов test_data/ (небольшая копия разделов
+каталога) и на таблице с «грязными» написаниями категорий.
+"""
+import itertools
+import json
+import os
+
+from catalog import (
+    PAIN_CATEGORY_BITS, PainIndex, convert_table_to_plans_format,
+    filter_plans, filter_plans_indexed, merge_plans
+)
+
+# Разделы для проверки: test_data/ рядом с тестом (данные каталога в репозитории не хранятся)
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data")
+
+PAIN_TYPES = [None, "personal", "corporate"]
+
+# Варианты запроса, которые фронтенд и ручные вызовы реально присылают
+EXTRA_CATEGORY_QUERIES = [
+    "Скорость,", " , ", "лёгкость", "Безоп, Эконом", "Сроки", "Непонятно", "Скорость,Непонятно"
+]
+
+SAMPLE_TABLE = {
+    "table_name": "srochnost",
+    "rows": [
+        {"grouping": "Группировка", "standard": "Стандарт"},
+        {"grouping": "Сроки", "standard": "Мин 10 рд", "expert": "5", "personal_pain": "Скорость"},
+        {"grouping": "", "standard": "Макс 20 рд", "expert": "Макс 10"},
+        {"grouping": "Реакция", "standard": "24", "personal_pain": "Скор, лёгкость",
+         "corporate_pain": "Безоп", "column11": "Экономия", "column14": "Сроки"},
+        {"grouping": "Выезд", "standard": "+", "personal_pain": "Непонятно",
+         "corporate_pain": "Экономия, Экономия"},
+        {"grouping": "Замена", "standard": "-", "corporate_pain": "Лекость"},
+        {"grouping": "Пусто", "standard": "+"},
+    ]
+}
+
+
+def all_category_queries():
+    """Все 16 подмножеств категорий (None — без фильтра) и нестандартные варианты"""
+    names = list(PAIN_CATEGORY_BITS)
+    for size in range(len(names) + 1):
+        for subset in itertools.combinations(names, size):
+            yield ",".join(subset) or None
+    yield from EXTRA_CATEGORY_QUERIES
+
+
+def assert_same_results(plans):
+    index = PainIndex(plans[0]["характеристики"] if plans else [])
+    for pain_type in PAIN_TYPES:
+        for categories in all_category_queries():
+            if not pain_type and not categories:
+                continue  # без фильтров эндпоинт отдаёт каталог целиком
+            expected = filter_plans(plans, pain_type, categories)
+            indexed = filter_plans_indexed(plans, index, pain_type, categories)
+            if indexed is None:
+                # Нераспознанные написания обрабатываются построчным фильтром
+                continue
+            assert json.dumps(indexed, ensure_ascii=False) == json.dumps(expected, ensure_ascii=False), \
+                f"pain_type={pain_type!r}, categories={categories!r}"
+
+
+def load_fixture_plans():
+    files = []
+    for filename in sorted(os.listdir(FIXTURE_DIR)):
+        if filename.endswith(".json"):
+            with open(os.path.join(FIXTURE_DIR, filename), "r", encoding="utf-8") as f:
+                files.append(json.load(f))
+    assert files, f"Нет JSON файлов в {FIXTURE_DIR}"
+    return merge_plans(files)
+
+
+def test_indexed_filter_matches_fixture_data():
+    plans = load_fixture_plans()
+    assert plans and plans[0]["характеристики"]
+    assert_same_results(plans)
+
+
+def test_indexed_filter_matches_sample_table():
+    plans = convert_table_to_plans_format(SAMPLE_TABLE)
+    assert_same_results(plans)
+    index = PainIndex(plans[0]["характеристики"])
+    # Нераспознанная категория в запросе уходит на построчный фильтр
+    assert filter_plans_indexed(plans, index, "personal", "Непонятно") is None
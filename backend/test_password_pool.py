@@ -0,0 +1,51 @@
+"""
+Пул операций с паролями (PasswordWorkerPool): authenticate_user_async и
+create_user_async дают тот же результат, что и синхронные функции, а stats()
+показывает операции в работе и очередь, пока хеширование идёт.
+"""
+import asyncio
+import threading
+
+import auth
+from auth import (PasswordWorkerPool, UserCreate, authenticate_user, authenticate_user_async, create_user_async,
+                  get_user, verify_password)
+
+PASSWORD = "Secret@123"
+
+
+def test_async_paths_match_sync(users_file, monkeypatch):
+    monkeypatch.setattr(auth, "password_pool", PasswordWorkerPool(2))
+
+    async def scenario():
+        created = await create_user_async(UserCreate(username="ivan", email="ivan@example.com", password=PASSWORD))
+        logins = await asyncio.gather(authenticate_user_async("ivan", PASSWORD),
+                                      authenticate_user_async("ivan", "wrong"),
+                                      authenticate_user_async("nobody", PASSWORD))
+        return created, logins
+
+    created, (ok, wrong, missing) = asyncio.run(scenario())
+    assert verify_password(PASSWORD, created.hashed_password)
+    assert get_user("ivan").hashed_password == created.hashed_password
+    assert ok.model_dump() == authenticate_user("ivan", PASSWORD).model_dump()
+    assert wrong is None and authenticate_user("ivan", "wrong") is None
+    assert missing is None and authenticate_user("nobody", PASSWORD) is None
+    assert auth.password_pool.stats()["completed"] == 4
+
+
+def test_stats_while_hashing():
+    pool = PasswordWorkerPool(2)
+    release = threading.Event()
+
+    async def scenario():
+        tasks = [asyncio.create_task(pool.run(release.wait)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        busy = pool.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return busy
+
+    busy = asyncio.run(scenario())
+    assert (busy["in_flight"], busy["queue_depth"], busy["completed"]) == (5, 3, 0)
+    done = pool.stats()
+    assert (done["in_flight"], done["queue_depth"], done["completed"]) == (0, 0, 5)
+    assert done["peak_in_flight"] == 5
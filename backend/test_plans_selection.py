@@ -0,0 +1,92 @@
+"""
+Выборка разделов и тарифов в /api/plans (sections=, plans=): неизвестный тариф —
+400, неизвестный раздел — пустая выборка; совместно с format=compact и fields;
+одинаковая выборка в разном написании даёт один ключ кэша и один ETag.
+
+Каталог собирается из копии test_data/, авторизация подменена.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from catalog import PlanCatalog, expand_compact_plans, normalize_fields, project_plans
+
+
+@pytest.fixture
+def catalog(store, monkeypatch):
+    plan_catalog = PlanCatalog(source=store, snapshot_path="")
+    snapshot = plan_catalog.rebuild()
+
+    async def current_catalog():
+        return snapshot
+
+    monkeypatch.setattr(main, "plan_catalog", plan_catalog)
+    monkeypatch.setattr(main, "current_catalog", current_catalog)
+    return snapshot
+
+
+@pytest.fixture
+def client(catalog):
+    main.app.dependency_overrides[main.get_current_active_user] = lambda: None
+    try:
+        yield TestClient(main.app, headers={"Accept-Encoding": "identity"})
+    finally:
+        main.app.dependency_overrides.pop(main.get_current_active_user, None)
+
+
+def sections_of(plans):
+    return {char["раздел"] for plan in plans for char in plan["характеристики"]}
+
+
+def test_unknown_names(client):
+    response = client.get("/api/plans", params={"plans": "standard,Премиум"})
+    assert response.status_code == 400
+    assert "Премиум" in response.json()["detail"]
+
+    response = client.get("/api/plans", params={"sections": "Нет такого раздела"})
+    assert response.status_code == 200 and response.json() == {"plans": []}
+    compact = client.get("/api/plans", params={"sections": "Нет такого раздела", "format": "compact"}).json()
+    assert compact["plans"] == [] and compact["rows"] == []
+
+    # Неизвестный раздел рядом с известным не меняет выборку
+    known = client.get("/api/plans", params={"sections": "srochnost"})
+    mixed = client.get("/api/plans", params={"sections": "srochnost,Нет такого раздела"})
+    assert mixed.content == known.content
+
+
+def test_selection_with_compact_format(client):
+    params = {"sections": "srochnost,Бухгалтерия", "plans": "expert,Стандарт"}
+    plans = client.get("/api/plans", params=params).json()["plans"]
+    assert [plan["название"] for plan in plans] == ["Стандарт", "Эксперт"]
+    assert sections_of(plans) == {"Срочность", "Бухгалтерия"}
+
+    compact = client.get("/api/plans", params=dict(params, format="compact")).json()
+    assert compact["sections"] == ["Срочность", "Бухгалтерия"]
+    assert expand_compact_plans(compact) == plans
+
+    fields = "значение,личные_боли"
+    projected = client.get("/api/plans", params=dict(params, format="compact", fields=fields)).json()
+    assert expand_compact_plans(projected) == project_plans(plans, normalize_fields(fields))
+
+
+def test_selection_is_keyed_by_canonical_names(client, catalog):
+    spellings = [
+        {"sections": "srochnost,gibkost", "plans": "standard,expert"},
+        {"sections": "Гибкость команды, Срочность,srochnost", "plans": "Эксперт,standard,Стандарт"},
+    ]
+    responses = [client.get("/api/plans", params=params) for params in spellings]
+    assert responses[0].content == responses[1].content
+    assert responses[0].headers["etag"] == responses[1].headers["etag"]
+    assert len(catalog._fallback_responses) == 1  # одна запись кэша на выборку
+
+    etag = responses[0].headers["etag"]
+    assert client.get("/api/plans", params=spellings[1], headers={"If-None-Match": etag}).status_code == 304
+
+    # Другая выборка, формат или фильтр — другой ключ и другой ETag
+    others = [dict(spellings[0], plans="standard"),
+              dict(spellings[0], format="compact"),
+              dict(spellings[0], pain_type="personal"),
+              {"sections": "srochnost,gibkost"}]
+    etags = {client.get("/api/plans", params=params).headers["etag"] for params in others}
+    assert len(etags) == len(others) and etag not in etags
+    assert len(catalog._fallback_responses) == 1 + len(others)
@@ -0,0 +1,29 @@
+"""
+Готовые ответы /api/plans в снимке каталога: для каждой комбинации фильтров
+(тип боли × маска категорий) и каждого варианта PRERENDERED_VARIANTS тело
+совпадает с собранным заново через filter_plans на данных test_data/.
+"""
+from catalog import (PAIN_CATEGORY_BITS, PRERENDERED_VARIANTS, PlanCatalog, compact_plans, filter_plans,
+                     merge_plans, project_plans, render_body)
+
+
+def categories_of(query: int):
+    """Строка категорий запроса для маски (None — без категорий)"""
+    return ",".join(name for name, bit in PAIN_CATEGORY_BITS.items() if query & bit) or None
+
+
+def test_prerendered_bodies_match_fresh_render(store):
+    snapshot = PlanCatalog(source=store, snapshot_path="").rebuild()
+    plans = merge_plans(file_data for _, file_data in store.load_files())
+    assert plans and plans[0]["характеристики"]
+
+    kinds = (None, "personal", "corporate")
+    queries = range(2 ** len(PAIN_CATEGORY_BITS))
+    expected_keys = {(kind, query, compact, fields) for kind in kinds for query in queries
+                     for compact, fields in PRERENDERED_VARIANTS}
+    assert set(snapshot.responses) == expected_keys
+    for (kind, query, compact, fields), cached in snapshot.responses.items():
+        filtered = filter_plans(plans, kind, categories_of(query))
+        fresh = render_body(compact_plans(filtered, fields) if compact else {"plans": project_plans(filtered, fields)})
+        assert bytes(cached.body) == fresh.body, (kind, categories_of(query), compact, fields)
+        assert cached.etag == fresh.etag
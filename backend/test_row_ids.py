@@ -0,0 +1,101 @@
+"""
+Постоянные id строк и правки по id (/api/characteristics/{id}/...): значение,
+переименование, порядок и удаление по id, 404 для неизвестного id. Проставление
+id строкам старых файлов при чтении ждёт общую блокировку записи (её держит
+писатель другого процесса) и сохраняет id в файл.
+"""
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from conftest import FILENAME, open_store, row_by_grouping, rows
+from shared_version import SharedVersion
+from storage import StorageError
+
+
+def file_rows(data_dir: str):
+    with open(os.path.join(data_dir, FILENAME), "r", encoding="utf-8") as f:
+        return json.load(f)["rows"]
+
+
+def test_backfill_waits_for_writer_and_persists_ids(data_dir):
+    assert not any(row.get("row_id") for row in file_rows(data_dir))
+    store = open_store(data_dir)
+    # Писатель другого процесса: отдельный дескриптор файла счётчика — отдельный flock
+    writer = SharedVersion(store.shared_version.path)
+    writer.acquire()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(store.read_file(FILENAME)))
+    try:
+        reader.start()
+        reader.join(0.3)
+        assert reader.is_alive(), "id записываются в файл без общей блокировки"
+    finally:
+        writer.release()
+    reader.join(5)
+    ids = [row["row_id"] for row in result[0]["rows"]]
+    assert all(ids) and len(set(ids)) == len(ids)
+    assert [row["row_id"] for row in file_rows(data_dir)] == ids
+    assert not [name for name in os.listdir(data_dir) if name.endswith(".tmp")]
+    # Повторное открытие не меняет id
+    assert [row["row_id"] for row in rows(open_store(data_dir))] == ids
+
+
+def test_edits_by_id(data_dir, store):
+    reaction = row_by_grouping(store, "Время реакции")["row_id"]
+    visit = row_by_grouping(store, "Выезд")["row_id"]
+
+    asyncio.run(store.update_value_by_id(reaction, "48", plan_name="Стандарт"))
+    asyncio.run(store.update_value_by_id(reaction, "Скорость", field_type="personal_pain"))
+    asyncio.run(store.rename_characteristic_by_id(visit, "Выезд инженера"))
+    row = row_by_grouping(store, "Время реакции")
+    assert (row["row_id"], row["standard"], row["personal_pain"]) == (reaction, "48", "Скорость")
+    assert row_by_grouping(store, "Выезд инженера")["row_id"] == visit
+
+    # Порядок по id: перечисленные строки первыми, остальные — в прежнем порядке
+    before = [row["row_id"] for row in rows(store)]
+    asyncio.run(store.reorder_characteristics_by_id("srochnost", [visit, reaction]))
+    after = [row["row_id"] for row in rows(store)]
+    assert after[:3] == [before[0], visit, reaction]
+    assert sorted(after) == sorted(before)
+
+    asyncio.run(store.delete_characteristic_by_id(visit))
+    assert visit not in [row["row_id"] for row in rows(store)]
+    for call in (lambda: store.update_value_by_id(visit, "1", plan_name="Стандарт"),
+                 lambda: store.delete_characteristic_by_id("missing")):
+        with pytest.raises(StorageError) as error:
+            asyncio.run(call())
+        assert error.value.status_code == 404
+    with pytest.raises(StorageError) as error:  # строку заголовков удалить нельзя
+        asyncio.run(store.delete_characteristic_by_id(before[0]))
+    assert error.value.status_code == 400
+
+    # Правки по id переживают перезапуск (журнал)
+    reopened = open_store(data_dir)
+    assert row_by_grouping(reopened, "Время реакции")["standard"] == "48"
+    assert [row["row_id"] for row in rows(reopened)] == [row["row_id"] for row in rows(store)]
+
+
+def test_row_index_forgets_removed_rows(data_dir, store):
+    visit = row_by_grouping(store, "Выезд")["row_id"]
+    asyncio.run(store.delete_characteristic_by_id(visit))
+    assert visit not in store._row_files
+
+    # Файл изменён извне: id строк перестраиваются при повторном чтении
+    path = os.path.join(data_dir, FILENAME)
+    store.compact(FILENAME)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    removed = data["rows"].pop()["row_id"]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    assert removed in store._row_files
+    store.read_file(FILENAME)
+    assert removed not in store._row_files
+
+    remaining = [row["row_id"] for row in rows(store)]
+    asyncio.run(store.delete_section("srochnost"))
+    assert not any(row_id in store._row_files for row_id in remaining)
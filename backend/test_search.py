@@ -0,0 +1,89 @@
+"""
+Поиск по каталогу: нормализация слов (ё/е, окончания), префикс последнего слова,
+ранжирование и подсветка, а также совпадение индекса после точечных обновлений
+с индексом, собранным заново.
+"""
+from catalog import ChangeEntry
+from search import CatalogSearch, SearchIndex, query_words, stem
+
+PLAN_NAMES = ("Стандарт", "Эксперт")
+
+
+class Snapshot:
+    """Снимок каталога из строк {id, характеристика, ..., значения: [по тарифам]}"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.plan_names = PLAN_NAMES
+        self.row_positions = {row["id"]: i for i, row in enumerate(rows)}
+        self.plans = [
+            {"название": name, "характеристики": [
+                {"id": row["id"], "раздел": row.get("раздел", "Срочность"), "характеристика": row["характеристика"],
+                 "описание": row.get("описание", ""), "возражения": row.get("возражения", ""),
+                 "вопросы": row.get("вопросы", ""), "значение": row["значения"][i],
+                 "is_section_header": row.get("is_section_header", False)}
+                for row in rows]}
+            for i, name in enumerate(PLAN_NAMES)
+        ]
+
+    def row_values(self, row_id):
+        position = self.row_positions[row_id]
+        return tuple(plan["характеристики"][position] for plan in self.plans)
+
+
+ROWS = [
+    {"id": "h", "характеристика": "Сроки", "значения": ["", ""], "is_section_header": True},
+    {"id": "a", "характеристика": "Время реакции", "возражения": "Дорого и долго ждать",
+     "вопросы": "Как быстро нужен выезд?", "значения": ["24 часа", "4 часа"]},
+    {"id": "b", "характеристика": "Выезд инженера", "описание": "Выезд инженера на объект в день обращения",
+     "значения": ["+", "+"]},
+    {"id": "c", "раздел": "Отчётность", "характеристика": "Ежемесячный отчёт",
+     "возражения": "Отчёты никто не читает", "значения": ["-", "+"]},
+]
+
+
+def results(index, query, **kwargs):
+    return [item["id"] for item in index.search(query, **kwargs)["results"]]
+
+
+def test_normalization():
+    assert stem("скорость") == stem("скорости") == stem("скоростью")
+    assert stem("возражения") == stem("возражений")
+    assert stem("ответ") == "ответ"
+    assert [term for _, term in query_words("Отчёт ОТЧЕТЫ и отчетов")] == ["отчет"]
+
+
+def test_ranking_prefix_and_highlights():
+    index = SearchIndex.build(Snapshot(1, ROWS))
+    assert "h" not in index.docs  # заголовки разделов не индексируются
+    assert results(index, "выезда") == ["b", "a"]  # в названии характеристики — выше
+    assert results(index, "отчеты") == ["c"]
+    assert results(index, "дорог") == ["a"]  # последнее слово — префикс
+    assert results(index, "выезд дорог") == ["a", "b"]  # сначала совпали все слова
+    assert results(index, "выезд", sections=("Отчётность",)) == []
+    assert index.search("отчётность")["total"] == 0  # название раздела не индексируется
+
+    item = index.search("4 часа")["results"][0]
+    values = [h for h in item["highlights"] if h["field"] == "значение"]
+    assert [(h["plan"], h["text"], h["matches"]) for h in values] == \
+        [("Стандарт", "24 часа", [[3, 7]]), ("Эксперт", "4 часа", [[0, 1], [2, 6]])]
+
+
+def test_incremental_update_matches_full_build():
+    search = CatalogSearch()
+    search.ensure(Snapshot(1, ROWS))
+    edited = [dict(row) for row in ROWS if row["id"] != "c"]
+    edited[1] = dict(edited[1], возражения="Слишком дорого", значения=["48 часов", "4 часа"])
+    edited.append({"id": "d", "характеристика": "Гарантия", "возражения": "Ждать долго", "значения": ["1 год", "2 года"]})
+    snapshot = Snapshot(2, edited)
+    search.apply(snapshot, ChangeEntry(2, frozenset({"a", "c", "d"}), True, False))
+    assert search.version == 2
+
+    # Средняя длина документа фиксируется при полной сборке — оценки могут немного
+    # отличаться, найденные строки, их порядок и подсветка совпадают
+    def found(result):
+        return result["total"], [(item["id"], item["highlights"]) for item in result["results"]]
+
+    rebuilt = SearchIndex.build(snapshot)
+    for query in ["дорого", "ждать", "отчет", "часов", "гарант", "выезд инженер"]:
+        assert found(search.search(query)) == found(rebuilt.search(query)), query
@@ -0,0 +1,47 @@
+"""
+Реестр разделов при старте берётся из манифеста .sections.manifest: перечитываются
+только файлы, изменённые (mtime/размер) или появившиеся с его записи.
+
+Данные — копия test_data/ (фикстура data_dir).
+"""
+import json
+import os
+
+from section_registry import SectionRegistry
+
+
+def test_startup_uses_manifest(data_dir):
+    first = SectionRegistry(data_dir)
+    first.rebuild()
+    assert first.get_filename("srochnost") == "srochnost.json"
+    assert first.get_filename("Бухгалтерия") == "buhotch.json"
+    assert os.path.exists(first.manifest_path)
+
+    # Второй старт: все файлы совпадают с манифестом — ни один не читается
+    scanned = []
+    second = SectionRegistry(data_dir)
+    scan_file = second._scan_file
+    second._scan_file = lambda filename, *args: (scanned.append(filename), scan_file(filename, *args))
+    second.rebuild()
+    assert scanned == []
+    assert second.sections() == first.sections()
+
+    # Файл изменён при остановленном сервере — перечитывается только он
+    path = os.path.join(data_dir, "gibkost.json")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["table_name"] = "Гибкость"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    scanned.clear()
+    second.rebuild()
+    assert scanned == ["gibkost.json"]
+    assert second.get_filename("Гибкость") == "gibkost.json"
+    assert second.get_filename("gibkost") is None
+
+    # Повреждённый манифест — реестр собирается по файлам
+    with open(first.manifest_path, "w", encoding="utf-8") as f:
+        f.write("{")
+    third = SectionRegistry(data_dir)
+    third.rebuild()
+    assert third.get_filename("Гибкость") == "gibkost.json"
@@ -0,0 +1,52 @@
+"""
+Перенос JSON разделов в SQLite (migrate_from_json): каталог, собранный из базы,
+совпадает с каталогом из исходных файлов (convert_table_to_plans_format),
+в том числе после одинаковых правок в обоих хранилищах.
+"""
+import json
+import os
+
+from catalog import merge_plans
+from conftest import FIXTURE_DIR
+from shared_version import SharedVersion
+from sqlite_store import SqliteSectionStore
+from storage import apply_operation, assign_row_ids, update_value_op
+
+
+def fixture_files():
+    files = []
+    for filename in sorted(os.listdir(FIXTURE_DIR)):
+        with open(os.path.join(FIXTURE_DIR, filename), "r", encoding="utf-8") as f:
+            file_data = json.load(f)
+        assign_row_ids(file_data)  # id переносятся в базу как есть
+        files.append((filename, file_data))
+    return files
+
+
+def catalog_of(files):
+    return merge_plans(file_data for _, file_data in files)
+
+
+def test_migration_matches_json_catalog(tmp_path):
+    files = fixture_files()
+    store = SqliteSectionStore(os.path.join(tmp_path, "catalog.sqlite3"),
+                               shared_version=SharedVersion(os.path.join(tmp_path, ".data.version")))
+    stats = store.migrate_from_json(files)
+    assert stats == {"files": 3, "sections": 4, "characteristics": sum(
+        len(table["rows"]) for _, data in files for table in (data.get("tables") or [data]))}
+    expected = catalog_of(files)
+    assert expected and expected[0]["характеристики"]
+    assert catalog_of(store.load_files()) == expected
+    assert store.get_filename("gibkost") == "gibkost.json"
+    assert store.get_filename("Нет такого раздела") is None
+
+    # Одна и та же правка в JSON и в базе даёт одинаковый каталог
+    edits = [("srochnost", update_value_op("Максимум сроков", "Макс 30 рд", plan_name="Стандарт")),
+             ("srochnost", update_value_op("Время реакции", "Скорость, Безопасность", field_type="personal_pain")),
+             ("gibkost", {"op": "rename_characteristic", "characteristic": "Замена", "new_name": "Подмена"})]
+    by_filename = dict(files)
+    for section, op in edits:
+        filename = {"srochnost": "srochnost.json", "gibkost": "gibkost.json"}[section]
+        apply_operation(by_filename[filename], dict(op, section=section))
+        store.modify(section, op)
+    assert catalog_of(store.load_files()) == catalog_of(files)
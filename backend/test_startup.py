@@ -0,0 +1,97 @@
+"""
+Замеры запуска (StartupTimer) и готовность воркера: фазы записываются по порядку,
+отчёт печатается один раз; без /proc время жизни процесса неизвестно (None);
+/ready отвечает 503, пока warm_up() не прогрел каталог, и 200 после.
+"""
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+import pytest
+
+import main
+import startup
+from catalog import PlanCatalog
+from search import CatalogSearch
+from startup import StartupTimer, process_uptime
+
+
+def test_phases_are_recorded(capsys):
+    timer = StartupTimer(target_ms=1)
+    timer.checkpoint("import catalog")
+    with timer.phase("catalog warm start"):
+        time.sleep(0.01)
+    assert [name for name, _ in timer.phases] == ["import catalog", "catalog warm start"]
+    assert timer.phases[1][1] >= 0.01
+    assert not timer.is_ready and timer.stats()["ready_ms"] is None
+
+    timer.ready()
+    timer.ready()  # отчёт печатается один раз
+    output = capsys.readouterr().out
+    assert output.count("[STARTUP] Воркер готов") == 1
+    assert "превышает цель" in output
+    stats = timer.stats()
+    assert stats["ready"] and stats["ready_ms"] >= 10
+    assert list(stats["phases_ms"]) == ["import catalog", "catalog warm start"]
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="нет /proc")
+def test_process_uptime_from_proc():
+    uptime = process_uptime()
+    assert uptime is not None and uptime >= 0
+
+
+def test_process_uptime_without_proc(monkeypatch, capsys):
+    def missing(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(startup, "open", missing, raising=False)
+    assert process_uptime() is None
+    timer = StartupTimer()
+    assert timer.process_started_ago is None
+    timer.ready()
+    output = capsys.readouterr().out
+    assert "[STARTUP] Воркер готов" in output and "до импорта" not in output
+
+
+def test_ready_after_warm_up(store, monkeypatch):
+    plan_catalog = PlanCatalog(source=store, snapshot_path="")
+    release = threading.Event()
+
+    def slow_warm_start():
+        release.wait(5)
+        return plan_catalog.rebuild()
+
+    timer = StartupTimer()
+    monkeypatch.setattr(plan_catalog, "warm_start", slow_warm_start)
+    monkeypatch.setattr(main, "plan_catalog", plan_catalog)
+    monkeypatch.setattr(main, "section_store", store)
+    monkeypatch.setattr(main, "catalog_search", CatalogSearch())
+    monkeypatch.setattr(main, "ensure_default_admin", lambda: None)
+    monkeypatch.setattr(main, "startup_timer", timer)
+    monkeypatch.setattr(main.app.state, "catalog_ready", None, raising=False)
+
+    async def scenario():
+        main.app.state.catalog_ready = asyncio.Event()
+        warm_up = asyncio.create_task(main.warm_up())
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://worker") as client:
+            response = await client.get("/ready")
+            assert response.status_code == 503 and response.json() == {"status": "warming_up"}
+            assert (await client.get("/health")).status_code == 200  # «жив» и во время прогрева
+            release.set()
+            await warm_up
+            response = await client.get("/ready")
+            assert response.status_code == 200 and response.json() == {"status": "ready"}
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        plan_catalog.stop_watcher()
+        store.stop_compactor()
+    assert plan_catalog.built
+    assert timer.is_ready
+    assert "catalog warm start" in timer.stats()["phases_ms"]
@@ -0,0 +1,63 @@
+"""
+Журнал правок SectionStore: восстановление после сбоя до свёртки журнала,
+недописанная последняя запись журнала и журнал от прежней версии базового файла
+(сбой между заменой файла и удалением журнала).
+
+Данные — копия test_data/ (фикстура data_dir); «сбой» — новый SectionStore
+на тех же файлах без свёртки журнала старым.
+"""
+import os
+
+from conftest import FILENAME, journal_path, open_store, row_by_grouping, rows
+from storage import update_value_op
+
+
+def test_recovery_after_crash_before_compaction(data_dir, store):
+    row_id = row_by_grouping(store, "Выезд")["row_id"]
+    store.modify("srochnost", update_value_op("Время реакции", "48", plan_name="Стандарт"))
+    store.modify(None, {"op": "rename_characteristic_by_id", "row_id": row_id, "new_name": "Выезд инженера"})
+    assert os.path.exists(journal_path(data_dir))
+    del store  # сбой: журнал не свёрнут
+
+    recovered = open_store(data_dir)
+    assert row_by_grouping(recovered, "Время реакции")["standard"] == "48"
+    assert row_by_grouping(recovered, "Выезд инженера")["row_id"] == row_id
+    recovered.recover()
+    assert not os.path.exists(journal_path(data_dir))
+    # После свёртки данные в базовом файле, без журнала
+    assert row_by_grouping(open_store(data_dir), "Выезд инженера")["row_id"] == row_id
+
+
+def test_torn_last_record_is_dropped(data_dir, store):
+    store.modify("srochnost", update_value_op("Время реакции", "36", plan_name="Стандарт"))
+    store.modify("srochnost", update_value_op("Время реакции", "18", plan_name="Эксперт"))
+    # Сбой во время записи: последняя запись обрезана посередине
+    with open(journal_path(data_dir), "r+b") as f:
+        f.truncate(os.path.getsize(journal_path(data_dir)) - 20)
+    del store
+
+    recovered = open_store(data_dir)
+    row = row_by_grouping(recovered, "Время реакции")
+    assert (row["standard"], row["expert"]) == ("36", "12")
+    # Новая запись после обрезанной начинается с новой строки и читается
+    recovered.modify("srochnost", update_value_op("Время реакции", "9", plan_name="Оптима"))
+    row = row_by_grouping(open_store(data_dir), "Время реакции")
+    assert (row["standard"], row["expert"], row["optimal"]) == ("36", "12", "9")
+
+
+def test_journal_of_replaced_base_is_not_reapplied(data_dir, store):
+    count = len(rows(store))
+    store.modify("srochnost", {"op": "add_characteristic", "row": {"grouping": "Новая", "row_id": "new000000001"}})
+    with open(journal_path(data_dir), "rb") as f:
+        journal = f.read()
+    # Сбой между заменой базового файла свёрнутой версией и удалением журнала
+    assert store.compact(FILENAME)
+    with open(journal_path(data_dir), "wb") as f:
+        f.write(journal)
+    del store
+
+    recovered = open_store(data_dir)
+    assert len(rows(recovered)) == count + 1  # запись не применена второй раз
+    recovered.recover()
+    assert not os.path.exists(journal_path(data_dir))
+    assert len(rows(open_store(data_dir))) == count + 1
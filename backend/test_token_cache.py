@@ -0,0 +1,58 @@
+"""
+Кэш проверенных JWT (TokenCache): вытеснение по LRU, истечение exp,
+удаление токенов пользователя (evict_user) и повторная проверка подписи после него.
+"""
+import time
+from datetime import timedelta
+
+import auth
+from auth import TokenCache, create_access_token, decode_access_token
+
+
+def claims(username, exp=None):
+    return {"sub": username, "roles": "user", "exp": exp if exp is not None else time.time() + 60}
+
+
+def test_lru_eviction():
+    cache = TokenCache(max_size=2)
+    cache.put("a", claims("anna"))
+    cache.put("b", claims("boris"))
+    assert cache.get("a")["sub"] == "anna"  # "a" стал последним использованным
+    cache.put("c", claims("anna"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 1}
+
+
+def test_expired_token_is_dropped():
+    cache = TokenCache(max_size=10)
+    cache.put("old", claims("anna", exp=time.time() - 1))
+    assert cache.get("old") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_evict_user():
+    cache = TokenCache(max_size=10)
+    cache.put("a1", claims("anna"))
+    cache.put("a2", claims("anna"))
+    cache.put("b1", claims("boris"))
+    cache.evict_user("anna")
+    assert cache.get("a1") is None and cache.get("a2") is None
+    assert cache.get("b1")["sub"] == "boris"
+
+
+def test_decode_uses_cache_and_revalidates_after_evict():
+    token = create_access_token({"sub": "cache-test", "roles": "admin"}, expires_delta=timedelta(minutes=5))
+    hits = auth.token_cache.hits
+    first = decode_access_token(token)
+    second = decode_access_token(token)
+    assert first == second and first["sub"] == "cache-test"
+    assert auth.token_cache.hits == hits + 1
+    second["roles"] = "user"  # вызывающий получает копию — кэш не меняется
+    assert decode_access_token(token)["roles"] == "admin"
+
+    auth.token_cache.evict_user("cache-test")
+    misses = auth.token_cache.misses
+    assert decode_access_token(token)["sub"] == "cache-test"  # подпись проверена заново
+    assert auth.token_cache.misses == misses + 1
+    assert decode_access_token(token + "x") is None
@@ -0,0 +1,50 @@
+"""
+Пакетное обновление ячеек (/api/update-values -> SectionStore.update_values):
+пакет применяется целиком или не применяется совсем — при ошибке в одном
+элементе не меняются ни данные в памяти, ни файлы и журналы.
+"""
+import asyncio
+import os
+
+import pytest
+
+from conftest import open_store, row_by_grouping
+from storage import JOURNAL_SUFFIX, StorageError
+
+
+def disk_state(data_dir: str):
+    """Содержимое файлов и журналов каталога данных"""
+    state = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith(".json") or name.endswith(JOURNAL_SUFFIX):
+            with open(os.path.join(data_dir, name), "rb") as f:
+                state[name] = f.read()
+    return state
+
+
+def test_batch_is_all_or_nothing(data_dir, store):
+    row_id = row_by_grouping(store, "Выезд")["row_id"]
+    before = disk_state(data_dir)
+    updates = [
+        {"section": "srochnost", "characteristic": "Время реакции", "new_value": "48", "plan_name": "Стандарт"},
+        {"row_id": row_id, "new_value": "-", "plan_name": "Ультра"},
+        {"section": "srochnost", "characteristic": "Нет такой", "new_value": "1", "plan_name": "Стандарт"},
+        {"section": "Нет раздела", "characteristic": "Выезд", "new_value": "1", "plan_name": "Стандарт"},
+    ]
+    with pytest.raises(StorageError) as error:
+        asyncio.run(store.update_values(updates))
+    assert error.value.status_code == 400
+    assert [result["success"] for result in error.value.detail["results"]] == [True, True, False, False]
+    assert disk_state(data_dir) == before
+    assert row_by_grouping(store, "Время реакции")["standard"] == "24"
+    assert row_by_grouping(store, "Выезд")["ultra"] == "+"
+
+    # Без ошибок — все правки, одна запись журнала на файл за пакет
+    results = asyncio.run(store.update_values(updates[:2] + [
+        {"section": "gibkost", "characteristic": "Замена", "new_value": "+", "plan_name": "Ультра"}]))
+    assert all(result["success"] for result in results)
+    assert row_by_grouping(store, "Время реакции")["standard"] == "48"
+    assert row_by_grouping(store, "Выезд")["ultra"] == "-"
+    with open(os.path.join(data_dir, "srochnost.json" + JOURNAL_SUFFIX), encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 3  # заголовок и две правки
+    assert row_by_grouping(open_store(data_dir), "Время реакции")["standard"] == "48"
@@ -0,0 +1,97 @@
+"""
+Справочник пользователей (UserDirectory): запись UserRecord даёт того же User,
+что и прежнее чтение users.json; save_users() сразу обновляет справочник,
+правка файла в обход API видна после STAT_INTERVAL; индекс по email после
+смены email и удаления пользователя; проверка email в create_user по файлу.
+"""
+import json
+import time
+
+import pytest
+
+import auth
+from auth import User, UserCreate, UserRecord, UserRole, create_user, get_user, save_users, update_user
+
+
+def user_data(username, email, role="user"):
+    return {"username": username, "email": email, "full_name": None, "hashed_password": "hash",
+            "role": role, "is_active": True, "created_at": "2024-01-01T00:00:00"}
+
+
+def validated_user(username, data):
+    """User, как его собирал get_user() до справочника"""
+    role = data.get("role", UserRole.USER)
+    if isinstance(role, str):
+        role = UserRole.USER if role == "user" else UserRole.ADMIN
+    return User(
+        username=data.get("username", username),
+        email=data.get("email"),
+        full_name=data.get("full_name"),
+        hashed_password=data.get("hashed_password", ""),
+        role=role,
+        is_active=data.get("is_active", True),
+        created_at=data.get("created_at")
+    )
+
+
+def write_external(path, users):
+    """Правка users.json другим воркером или вручную"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(users, f, ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize("username, data", [
+    ("ivan", user_data("ivan", "ivan@example.com")),
+    ("root", user_data("root", None, role="admin")),
+    ("old", {"hashed_password": "hash"}),  # запись без username, роли и флага активности
+    ("off", dict(user_data("off", "off@example.com"), is_active=False, full_name="Отключён")),
+])
+def test_record_matches_validated_user(username, data):
+    user = UserRecord(username, data).to_user()
+    expected = validated_user(username, data)
+    assert user.model_dump() == expected.model_dump()
+    assert isinstance(user.role, UserRole)
+
+
+def test_save_users_reloads_directory(users_file):
+    save_users({"ivan": user_data("ivan", "ivan@example.com")})
+    assert get_user("ivan").email == "ivan@example.com"
+    # Без ожидания STAT_INTERVAL: справочник перестроен самим save_users()
+    save_users({"ivan": user_data("ivan", "ivan@example.com"), "petr": user_data("petr", "petr@example.com")})
+    assert get_user("petr").username == "petr"
+    assert auth.user_directory.get_by_email("petr@example.com").username == "petr"
+
+
+def test_external_edit_is_picked_up_after_interval(users_file, monkeypatch):
+    monkeypatch.setattr(auth.user_directory, "STAT_INTERVAL", 0.2)
+    save_users({"ivan": user_data("ivan", "ivan@example.com")})
+    write_external(users_file, {"ivan": user_data("ivan", "ivan@example.com"),
+                                "petr": user_data("petr", "petr@example.com")})
+    assert get_user("petr") is None  # файл проверяется не чаще раза в STAT_INTERVAL
+    time.sleep(0.25)
+    assert get_user("petr").email == "petr@example.com"
+
+
+def test_email_index_after_change_and_delete(users_file):
+    save_users({"ivan": user_data("ivan", "ivan@example.com"), "petr": user_data("petr", "petr@example.com")})
+    directory = auth.user_directory
+
+    user = get_user("ivan")
+    user.email = "ivan@corp.example.com"
+    update_user(user)
+    assert directory.get_by_email("ivan@example.com") is None
+    assert directory.get_by_email("ivan@corp.example.com").username == "ivan"
+
+    save_users({"ivan": user_data("ivan", "ivan@corp.example.com")})
+    assert directory.get("petr") is None
+    assert directory.get_by_email("petr@example.com") is None
+
+
+def test_create_user_checks_email_in_file(users_file):
+    save_users({"ivan": user_data("ivan", "ivan@example.com")})
+    # Пользователь создан другим воркером только что: справочник его ещё не видит
+    write_external(users_file, {"ivan": user_data("ivan", "ivan@example.com"),
+                                "petr": user_data("petr", "petr@example.com")})
+    assert auth.user_directory.get_by_email("petr@example.com") is None
+    with pytest.raises(ValueError, match="email"):
+        create_user(UserCreate(username="pavel", email="petr@example.com", password="Secret@123"))
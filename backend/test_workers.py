@@ -0,0 +1,112 @@
+"""
+Согласованность данных между воркерами: два процесса uvicorn на общем каталоге
+данных (HPV_DATA_DIR во временной папке). Правка через один воркер сразу видна
+при чтении через другой.
+
+Фоновый наблюдатель каталога отключён (CATALOG_POLL_INTERVAL=3600), поэтому
+тест проверяет именно сверку общего счётчика версий на каждом запросе.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ADMIN = {"username": "admin", "password": "Admin@2024!Secure#Pass"}
+SECTION = "Проверка воркеров"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_worker(data_dir: str, log_path: str):
+    port = free_port()
+    env = dict(os.environ, HPV_DATA_DIR=data_dir, STORAGE_BACKEND="json", CATALOG_POLL_INTERVAL="3600")
+    log = open(log_path, "wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return process, log, f"http://127.0.0.1:{port}"
+
+
+def wait_ready(url: str, process, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Воркер {url} завершился при старте")
+        try:
+            if httpx.get(url + "/ready").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Воркер {url} не стал готов за {timeout} с")
+
+
+def login(client: httpx.Client):
+    response = client.post("/api/login", json=ADMIN)
+    assert response.status_code == 200, response.text
+    client.headers["Authorization"] = "Bearer " + response.json()["access_token"]
+
+
+def section_names(client: httpx.Client):
+    return [section["name"] for section in client.get("/api/sections").json()["sections"]]
+
+
+def plan_values(client: httpx.Client, plan: str):
+    """{характеристика: значение} тарифа по /api/plans"""
+    for item in client.get("/api/plans").json()["plans"]:
+        if item["название"] == plan:
+            return {char["характеристика"]: char for char in item["характеристики"]}
+    return {}
+
+
+def test_edit_in_one_worker_visible_in_another():
+    data_dir = tempfile.mkdtemp(prefix="hpv-workers-")
+    workers = [start_worker(data_dir, os.path.join(data_dir, f"worker{i}.log")) for i in range(2)]
+    try:
+        for process, _, url in workers:
+            wait_ready(url, process)
+        (_, _, url_a), (_, _, url_b) = workers
+        with httpx.Client(base_url=url_a) as a, httpx.Client(base_url=url_b) as b:
+            login(a)
+            login(b)
+
+            # Раздел, созданный через A, виден в B и доступен B для записи
+            assert a.post("/api/sections", json={"name": SECTION}).status_code == 200
+            assert SECTION in section_names(b)
+            response = b.post(f"/api/sections/{SECTION}/characteristics", json={"name": "Срок ответа", "standard": "24"})
+            assert response.status_code == 200, response.text
+            row_id = response.json()["id"]
+
+            # Характеристика, добавленная через B, сразу есть в каталоге A
+            char = plan_values(a, "Стандарт").get("Срок ответа")
+            assert char is not None and char["id"] == row_id
+
+            # Правки по очереди через разные воркеры читаются из другого воркера
+            for i, (writer, reader) in enumerate([(a, b), (b, a), (a, b)]):
+                value = f"{i + 1} час"
+                response = writer.put(f"/api/characteristics/{row_id}/value",
+                                      json={"new_value": value, "plan_name": "Стандарт"})
+                assert response.status_code == 200, response.text
+                assert plan_values(reader, "Стандарт")["Срок ответа"]["значение"] == value
+
+            # Удаление через B: раздел пропадает из A
+            assert b.delete(f"/api/sections/{SECTION}").status_code == 200
+            assert SECTION not in section_names(a)
+            assert "Срок ответа" not in plan_values(a, "Стандарт")
+    finally:
+        for process, log, _ in workers:
+            process.terminate()
+            process.wait(timeout=10)
+            log.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
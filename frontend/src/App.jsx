@@ -4,6 +4,107 @@ import './App.css'
 // В dev используем пустой base — запросы идут на тот же хост, Vite проксирует /api на бэкенд (без CORS)
 const API_BASE = import.meta.env.VITE_API_URL ?? (import.meta.env.DEV ? '' : '')
 
+// Кэш ответов каталога по URL: отправляем ETag последнего ответа, на 304 отдаём сохранённые данные
+const etagCache = new Map()
+
+const fetchWithEtag = async (url, options = {}) => {
+  const cached = etagCache.get(url)
+  const headers = { ...options.headers }
+  if (cached) headers['If-None-Match'] = cached.etag
+  const response = await fetch(url, { ...options, headers, cache: 'no-store' })
+  if (response.status === 304 && cached) {
+    return { ok: true, status: 200, headers: response.headers, json: async () => cached.data }
+  }
+  if (!response.ok) return response
+  const data = await response.json()
+  const etag = response.headers.get('ETag')
+  if (etag) etagCache.set(url, { etag, data })
+  return { ok: true, status: response.status, headers: response.headers, json: async () => data }
+}
+
+// Компактный формат /api/plans?format=compact -> обычный список тарифов
+// (каждая характеристика приходит один раз, значения тарифов — массивом, боли — кодами;
+// при проекции ?fields= приходят только нужные колонки)
+const CHARACTERISTIC_FIELDS = ['id', 'раздел', 'характеристика', 'описание', 'значение', 'возражения',
+  'сравнение', 'сомнения', 'личные_боли', 'корпоративные_боли', 'вопросы', 'is_section_header', 'raw_value',
+  'число', 'единица', 'шкала', 'диапазон']
+const COMPACT_NUMERIC_COLUMNS = { 'число': 'числа', 'единица': 'единицы', 'шкала': 'шкалы' }
+
+const expandCompactPlans = (data) => {
+  if (!data || data.format !== 'compact') return data.plans || []
+  const { sections, pains, columns, rows } = data
+  const fields = data.fields || CHARACTERISTIC_FIELDS
+  const plans = data.plans.map(plan => ({ ...plan, характеристики: [] }))
+  const painsText = codes => codes.map(code => pains[code]).join(', ')
+  const decode = (field, row, i) => {
+    switch (field) {
+      case 'раздел': return sections[row.раздел]
+      case 'личные_боли':
+      case 'корпоративные_боли': return painsText(row[field])
+      case 'значение': return row.значения[i]
+      case 'raw_value': return row.raw_values ? row.raw_values[i] : row.значения[i]
+      case 'число':
+      case 'единица':
+      case 'шкала': {
+        const values = row[COMPACT_NUMERIC_COLUMNS[field]]
+        return values ? values[i] : null
+      }
+      case 'сравнение': return ''
+      case 'сомнения': return row.вопросы
+      default: return row[field]
+    }
+  }
+  for (const values of rows) {
+    const row = {}
+    columns.forEach((column, c) => { row[column] = values[c] })
+    plans.forEach((plan, i) => {
+      const char = {}
+      for (const field of fields) char[field] = decode(field, row, i)
+      plan.характеристики.push(char)
+    })
+  }
+  return plans
+}
+
+// Поля для таблицы; возражения показываются только в карточке и подгружаются при её открытии.
+// "шкала" — положение значения среди тарифов (0–1), посчитанное сервером для прогресс-бара
+const DASHBOARD_FIELDS = ['id', 'раздел', 'характеристика', 'описание', 'значение', 'личные_боли',
+  'корпоративные_боли', 'вопросы', 'is_section_header', 'шкала']
+
+// Поиск по каталогу (/api/search): задержка перед запросом при наборе и подписи полей в результатах
+const SEARCH_DEBOUNCE_MS = 150
+const SEARCH_FIELD_LABELS = {
+  'характеристика': 'Характеристика',
+  'описание': 'Преимущества',
+  'возражения': 'Возражение',
+  'вопросы': 'Вопросы'
+}
+
+// Фрагмент с подсветкой совпадений: matches — [начало, конец) в тексте фрагмента
+const renderHighlight = (text, matches) => {
+  const parts = []
+  let pos = 0
+  matches.forEach(([start, end], i) => {
+    if (start > pos) parts.push(text.slice(pos, start))
+    parts.push(<mark key={i}>{text.slice(start, end)}</mark>)
+    pos = end
+  })
+  if (pos < text.length) parts.push(text.slice(pos))
+  return parts
+}
+
+// Применить изменения из /api/plans/changes к списку тарифов:
+// upserts — строки с новыми значениями по тарифам, removed — удалённые id, order — новый порядок id
+const applyPlanChanges = (plans, changes) => plans.map(plan => {
+  const byId = new Map(plan.характеристики.map(char => [char.id, char]))
+  changes.removed.forEach(id => byId.delete(id))
+  changes.upserts.forEach(row => {
+    if (row.plans[plan.название]) byId.set(row.id, row.plans[plan.название])
+  })
+  const order = changes.order || plan.характеристики.map(char => char.id)
+  return { ...plan, характеристики: order.filter(id => byId.has(id)).map(id => byId.get(id)) }
+})
+
 function App() {
   const [loading, setLoading] = useState(true)
   // Отдельные категории для каждого типа боли
@@ -11,6 +112,7 @@ function App() {
   const [corporateCategories, setCorporateCategories] = useState([]) // Категории для корпоративных болей
   const [selectedSection, setSelectedSection] = useState(null)
   const [allPlans, setAllPlans] = useState([])
+  const catalogVersion = useRef(null)  // версия каталога для /api/plans/changes
   const [modalData, setModalData] = useState(null)
   const [tooltip, setTooltip] = useState({ show: false, text: '', x: 0, y: 0 })
   const [showAdvantages, setShowAdvantages] = useState(true)
@@ -54,6 +156,8 @@ function App() {
   const [dragOverChar, setDragOverChar] = useState(null)
   const [renamingChar, setRenamingChar] = useState(null) // Переименование характеристики
   const [renameCharValue, setRenameCharValue] = useState('')
+  const [searchQuery, setSearchQuery] = useState('')
+  const [searchResults, setSearchResults] = useState(null) // null — поиск не выполнялся
 
   const categories = ['Легкость', 'Безопасность', 'Экономия', 'Скорость']
 
@@ -140,6 +244,47 @@ function App() {
     }
   }, [isAuthenticated])
 
+  // Поток событий каталога: правки других пользователей подтягиваются без перезагрузки страницы
+  useEffect(() => {
+    if (!isAuthenticated || typeof EventSource === 'undefined') return
+    const authToken = token || localStorage.getItem('token')
+    if (!authToken) return
+    const source = new EventSource(`${API_BASE}/api/events?token=${encodeURIComponent(authToken)}`)
+    source.addEventListener('catalog', (e) => {
+      const event = JSON.parse(e.data)
+      // resync тоже решается через syncPlans: он сам перейдёт на полную загрузку, если нужно
+      if (catalogVersion.current && event.version !== catalogVersion.current) {
+        syncPlans()
+      }
+    })
+    return () => source.close()
+  }, [isAuthenticated])
+
+  // Поиск по мере набора: запрос уходит после паузы, устаревший ответ отменяется
+  useEffect(() => {
+    const query = searchQuery.trim()
+    if (!isAuthenticated || !query) {
+      setSearchResults(null)
+      return
+    }
+    const controller = new AbortController()
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${API_BASE}/api/search?q=${encodeURIComponent(query)}&limit=10`, {
+          headers: { 'Authorization': `Bearer ${token}` },
+          signal: controller.signal
+        })
+        if (response.ok) setSearchResults(await response.json())
+      } catch (error) {
+        if (error.name !== 'AbortError') console.error('Ошибка поиска:', error)
+      }
+    }, SEARCH_DEBOUNCE_MS)
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
+    }
+  }, [searchQuery, isAuthenticated])
+
   // Страховка: если загрузка зависла — через 12 сек снимаем оверлей, чтобы интерфейс был кликабельным
   useEffect(() => {
     if (!loading || !isAuthenticated) return
@@ -264,6 +409,7 @@ function App() {
 
   const handleLogout = () => {
     localStorage.removeItem('token')
+    etagCache.clear()
     setToken(null)
     setIsAuthenticated(false)
     setUser(null)
@@ -327,7 +473,7 @@ function App() {
   // Функции для управления разделами
   const fetchSections = async () => {
     try {
-      const response = await fetch(`${API_BASE}/api/sections`, {
+      const response = await fetchWithEtag(`${API_BASE}/api/sections`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -355,7 +501,7 @@ function App() {
       if (response.ok) {
         setNewSectionName('')
         await fetchSections()
-        await fetchAllPlans()
+        await syncPlans()
       } else {
         const error = await response.json()
         alert(error.detail || 'Ошибка создания раздела')
@@ -377,7 +523,7 @@ function App() {
       })
       if (response.ok) {
         await fetchSections()
-        await fetchAllPlans()
+        await syncPlans()
         if (selectedSectionForEdit === sectionName) {
           setSelectedSectionForEdit(null)
         }
@@ -417,7 +563,7 @@ function App() {
       })
       if (response.ok) {
         await fetchSections()
-        await fetchAllPlans()
+        await syncPlans()
         if (selectedSectionForEdit === oldName) {
           setSelectedSectionForEdit(renameSectionValue.trim())
         }
@@ -459,7 +605,7 @@ function App() {
         })
         setShowAddCharacteristic(false)
         await fetchSections()
-        await fetchAllPlans()
+        await syncPlans()
         // Обновляем список характеристик
         await fetchSectionCharacteristics(sectionName)
       } else {
@@ -486,7 +632,7 @@ function App() {
       )
       if (response.ok) {
         await fetchSections()
-        await fetchAllPlans()
+        await syncPlans()
         // Обновляем список характеристик если раздел выбран
         if (selectedSectionForEdit === sectionName) {
           await fetchSectionCharacteristics(sectionName)
@@ -503,7 +649,7 @@ function App() {
 
   const fetchSectionCharacteristics = async (sectionName) => {
     try {
-      const response = await fetch(`${API_BASE}/api/sections/${encodeURIComponent(sectionName)}/characteristics`, {
+      const response = await fetchWithEtag(`${API_BASE}/api/sections/${encodeURIComponent(sectionName)}/characteristics`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -548,7 +694,7 @@ function App() {
       if (response.ok) {
         cancelRenameChar()
         await fetchSections()
-        await fetchAllPlans()
+        await syncPlans()
         await fetchSectionCharacteristics(sectionName)
       } else {
         const error = await response.json()
@@ -560,6 +706,9 @@ function App() {
     }
   }
 
+  // Ключ характеристики в списке раздела: id строки, для старых данных — название
+  const charKey = (char) => char.id || char.name
+
   const handleCharDragStart = (e, charName) => {
     if (!isAdmin) return
     setDraggedChar(charName)
@@ -582,8 +731,8 @@ function App() {
     if (!isAdmin || !draggedChar || draggedChar === targetCharName || !selectedSectionForEdit) return
     
     const newOrder = [...sectionCharacteristics]
-    const draggedIndex = newOrder.findIndex(c => c.name === draggedChar)
-    const targetIndex = newOrder.findIndex(c => c.name === targetCharName)
+    const draggedIndex = newOrder.findIndex(c => charKey(c) === draggedChar)
+    const targetIndex = newOrder.findIndex(c => charKey(c) === targetCharName)
     
     if (draggedIndex === -1 || targetIndex === -1) return
     
@@ -594,18 +743,19 @@ function App() {
     setDraggedChar(null)
     setDragOverChar(null)
     
-    // Сохраняем новый порядок на сервере
+    // Сохраняем новый порядок на сервере (по id, чтобы строки с одинаковым названием не терялись)
+    const byId = newOrder.every(c => c.id)
     try {
-      const response = await fetch(`${API_BASE}/api/sections/${encodeURIComponent(selectedSectionForEdit)}/characteristics/reorder`, {
+      const response = await fetch(`${API_BASE}/api/sections/${encodeURIComponent(selectedSectionForEdit)}/characteristics/${byId ? 'reorder-by-id' : 'reorder'}`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`
         },
-        body: JSON.stringify({ order: newOrder.map(c => c.name) })
+        body: JSON.stringify({ order: newOrder.map(c => byId ? c.id : c.name) })
       })
       if (response.ok) {
-        await fetchAllPlans()
+        await syncPlans()
       }
     } catch (error) {
       console.error('Ошибка при сохранении порядка:', error)
@@ -730,30 +880,34 @@ function App() {
         }
       }
       
-      // Отправляем все обновления
-      for (const update of updates) {
-        const response = await fetch(`${API_BASE}/api/update-value`, {
+      // Отправляем все обновления одним запросом (применяются все или ни одного)
+      if (updates.length > 0) {
+        const response = await fetch(`${API_BASE}/api/update-values`, {
           method: 'PUT',
           headers: {
             'Content-Type': 'application/json',
             'Authorization': `Bearer ${token}`
           },
-          body: JSON.stringify(update)
+          // По id строки сервер находит её без поиска по названию
+          body: JSON.stringify(modalData.id ? updates.map(u => ({ ...u, row_id: modalData.id })) : updates)
         })
         if (!response.ok) {
-          throw new Error(`Ошибка при сохранении: ${response.statusText}`)
+          const error = await response.json().catch(() => ({}))
+          const failed = (error.detail?.results || []).filter(r => !r.success).map(r => r.detail)
+          throw new Error(failed.length > 0 ? failed.join('; ') : `Ошибка при сохранении: ${response.statusText}`)
         }
       }
       
       // Перезагружаем данные
-      await fetchAllPlans()
+      await syncPlans()
       
       // Обновляем модальное окно
       const updatedChar = getAllCharacteristics().find(
-        c => c.раздел === modalData.раздел && c.характеристика === modalData.характеристика
+        c => modalData.id ? c.id === modalData.id : (c.раздел === modalData.раздел && c.характеристика === modalData.характеристика)
       )
       if (updatedChar) {
-        setModalData(updatedChar)
+        // Возражения в данных таблицы не приходят и в карточке не редактируются
+        setModalData({ ...updatedChar, возражения: modalData.возражения })
       }
       
       setEditingInModal(false)
@@ -775,7 +929,10 @@ function App() {
     if (!confirm(confirmMsg)) return
     
     try {
-      const response = await fetch(`${API_BASE}/api/sections/${encodeURIComponent(modalData.раздел)}/characteristics/${encodeURIComponent(modalData.характеристика)}`, {
+      const deleteUrl = modalData.id
+        ? `${API_BASE}/api/characteristics/${encodeURIComponent(modalData.id)}`
+        : `${API_BASE}/api/sections/${encodeURIComponent(modalData.раздел)}/characteristics/${encodeURIComponent(modalData.характеристика)}`
+      const response = await fetch(deleteUrl, {
         method: 'DELETE',
         headers: {
           'Authorization': `Bearer ${token}`
@@ -783,7 +940,7 @@ function App() {
       })
       
       if (response.ok) {
-        await fetchAllPlans()
+        await syncPlans()
         closeModal()
       } else {
         const error = await response.json()
@@ -804,7 +961,7 @@ function App() {
   const fetchAllPlans = async () => {
     setLoading(true)
     try {
-      const response = await fetch(`${API_BASE}/api/plans`, {
+      const response = await fetchWithEtag(`${API_BASE}/api/plans?format=compact&fields=${encodeURIComponent(DASHBOARD_FIELDS.join(','))}`, {
         headers: {
           'Authorization': `Bearer ${token || localStorage.getItem('token')}`
         }
@@ -818,7 +975,8 @@ function App() {
         throw new Error('Ошибка загрузки данных')
       }
       const data = await response.json()
-      setAllPlans(data.plans || [])
+      catalogVersion.current = response.headers?.get('X-Catalog-Version') || null
+      setAllPlans(expandCompactPlans(data))
     } catch (error) {
       console.error('Ошибка при загрузке всех тарифов:', error)
     } finally {
@@ -826,6 +984,27 @@ function App() {
     }
   }
 
+  // После правок загружаем только изменения; если версия устарела — весь каталог
+  const syncPlans = async () => {
+    const since = catalogVersion.current
+    if (!since) return fetchAllPlans()
+    try {
+      const response = await fetch(`${API_BASE}/api/plans/changes?since=${encodeURIComponent(since)}&fields=${encodeURIComponent(DASHBOARD_FIELDS.join(','))}`, {
+        headers: {
+          'Authorization': `Bearer ${token || localStorage.getItem('token')}`
+        }
+      })
+      if (!response.ok) return fetchAllPlans()
+      const changes = await response.json()
+      if (changes.resync) return fetchAllPlans()
+      catalogVersion.current = changes.version
+      setAllPlans(prev => applyPlanChanges(prev, changes))
+    } catch (error) {
+      console.error('Ошибка при загрузке изменений:', error)
+      return fetchAllPlans()
+    }
+  }
+
   const togglePersonalCategory = (category) => {
     setPersonalCategories(prev => 
       prev.includes(category)
@@ -882,14 +1061,37 @@ function App() {
     setTooltip({ show: false, text: '', x: 0, y: 0 })
   }
 
-  const openModal = (char) => {
+  const openModal = async (char) => {
     setModalData(char)
+    const planName = allPlans[0]?.название
+    if (!char.id || !planName) return
+    // Возражения не входят в данные таблицы — берём полную характеристику
+    try {
+      const response = await fetch(`${API_BASE}/api/plans/${encodeURIComponent(planName)}/characteristics/${encodeURIComponent(char.id)}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`
+        }
+      })
+      if (!response.ok) return
+      const detail = await response.json()
+      setModalData(prev => (prev && prev.id === char.id)
+        ? { ...prev, возражения: detail.возражения || '', сомнения: detail.сомнения || '' }
+        : prev)
+    } catch (error) {
+      console.error('Ошибка при загрузке характеристики:', error)
+    }
   }
 
   const closeModal = () => {
     setModalData(null)
   }
 
+  const openSearchResult = (result) => {
+    const char = getAllCharacteristics().find(item => item.id === result.id)
+    setSearchQuery('')
+    if (char) openModal(char)
+  }
+
 
   // Получаем список всех разделов
   const getAllSections = () => {
@@ -969,9 +1171,11 @@ function App() {
     
     allPlans.forEach(plan => {
       plan.характеристики.forEach(char => {
-        const key = `${char.раздел}|${char.характеристика}`
+        // Строки с одинаковым названием различаются по id
+        const key = char.id || `${char.раздел}|${char.характеристика}`
         if (!charMap.has(key)) {
           charMap.set(key, {
+            id: char.id,
             раздел: char.раздел,
             характеристика: char.характеристика,
             описание: char.описание,
@@ -982,11 +1186,11 @@ function App() {
             вопросы: char.вопросы || '',
             is_section_header: char.is_section_header || false,
             значения: {},
-            raw_значения: {}
+            шкалы: {}
           })
         }
         charMap.get(key).значения[plan.название] = char.значение || '-'
-        charMap.get(key).raw_значения[plan.название] = char.raw_value || char.значение || '-'
+        charMap.get(key).шкалы[plan.название] = char.шкала ?? null
       })
     })
     
@@ -1129,61 +1333,7 @@ function App() {
     return /^\d+$/.test(trimmed)
   }
 
-  // Функция для извлечения числового значения из строки
-  const extractNumber = (value) => {
-    if (!value || value === '-' || value === '+') return null
-    const match = value.match(/(\d+)/)
-    return match ? parseFloat(match[1]) : null
-  }
-
-  // Функция для расчета прогресса (для стоимости и числовых значений)
-  const calculateProgress = (value, allValues, isPrice = false) => {
-    if (!value || value === '-' || value === '+') return null
-    
-    // Для чистых чисел используем прямое значение
-    let currentNum = null
-    if (typeof value === 'number') {
-      currentNum = value
-    } else if (typeof value === 'string') {
-      const trimmed = value.trim()
-      if (/^\d+$/.test(trimmed)) {
-        currentNum = parseFloat(trimmed)
-      } else {
-        currentNum = extractNumber(value)
-      }
-    } else {
-      currentNum = extractNumber(value)
-    }
-    
-    if (currentNum === null) return null
-    
-    const numbers = allValues
-      .map(v => {
-        if (typeof v === 'number') return v
-        if (typeof v === 'string' && /^\d+$/.test(v.trim())) {
-          return parseFloat(v.trim())
-        }
-        return extractNumber(v)
-      })
-      .filter(n => n !== null && !isNaN(n))
-    
-    if (numbers.length === 0) return null
-    
-    const max = Math.max(...numbers)
-    const min = Math.min(...numbers)
-    
-    if (max === min) return 100
-    
-    if (isPrice) {
-      // Для стоимости: чем больше, тем больше прогресс (больше стоимость = больше заполнение)
-      return ((currentNum - min) / (max - min)) * 100
-    } else {
-      // Для остальных: чем больше, тем лучше (больше число = больше прогресс)
-      return ((currentNum - min) / (max - min)) * 100
-    }
-  }
-
-  const formatValue = (value, char, planName, allPlans) => {
+  const formatValue = (value, char, planName) => {
     if (!value || value === '-') return <span className="value-empty">—</span>
     if (value === '+') return <span className="value-check">✓</span>
     
@@ -1195,38 +1345,20 @@ function App() {
     // Проверяем, является ли значение числовым в разделе "Срочность"
     const isSrochnostNumeric = char.раздел === 'Срочность' && isPureNumber(value)
     
-    // Для шапки "Сроки" - парсим процент из значения
-    // Формат: "текст (75%)" или "текст | 75" или просто "75"
-    let srokiProgress = null
+    // Для шапки "Сроки" процент может быть указан в значении: "текст (75%)" или "текст | 75"
+    // (сервер уже учёл его в шкале) — в ячейке показываем только текст
     let displayValue = value
-    if (isSroki) {
-      // Ищем процент в формате (XX%) или | XX или просто число в конце
-      const percentMatch = value.match(/\((\d+)%?\)/) || value.match(/\|\s*(\d+)/) || value.match(/(\d+)%?\s*$/)
-      if (percentMatch) {
-        srokiProgress = parseInt(percentMatch[1])
-        // Убираем процент из отображаемого значения если он в скобках или после |
-        if (value.includes('(') || value.includes('|')) {
-          displayValue = value.replace(/\s*\(\d+%?\)/, '').replace(/\s*\|\s*\d+%?/, '').trim()
-        }
-      }
+    if (isSroki && (value.includes('(') || value.includes('|'))) {
+      displayValue = value.replace(/\s*\(\d+%?\)/, '').replace(/\s*\|\s*\d+%?/, '').trim()
     }
     // Для шапки "Стоимость" не показываем в ячейке значение прогресс-бара (| 100), только текст цены
     if (isPrice && typeof value === 'string' && value.includes('|')) {
       displayValue = value.replace(/\s*\|\s*\d+%?\s*$/, '').trim()
     }
     
-    // Получаем все raw значения для расчета прогресса (используем raw_значения если есть)
-    const allValues = allPlans.map(p => {
-      const rawVal = char.raw_значения && char.raw_значения[p.название]
-      return rawVal || char.значения[p.название]
-    })
-    
-    // Используем raw значение для расчета прогресса
-    const rawValue = char.raw_значения && char.raw_значения[planName]
-    const valueForProgress = rawValue || value
-    const progress = isSroki && srokiProgress !== null 
-      ? srokiProgress 
-      : calculateProgress(valueForProgress, allValues, isPrice)
+    // Шкала посчитана сервером при сборке каталога (min/max числа по тарифам строки)
+    const score = char.шкалы ? char.шкалы[planName] : null
+    const progress = score === null || score === undefined ? null : score * 100
     
     // Показываем прогресс-бар для «Сроки» и числовых значений в разделе «Срочность»; для «Стоимость» — только текст
     const showProgress = (isSroki || isSrochnostNumeric) && progress !== null
@@ -1666,13 +1798,13 @@ function App() {
                       </div>
                       {sectionCharacteristics.map(char => (
                         <div 
-                          key={char.name}
-                          className={`characteristic-item ${draggedChar === char.name ? 'dragging' : ''} ${dragOverChar === char.name ? 'drag-over' : ''}`}
+                          key={charKey(char)}
+                          className={`characteristic-item ${draggedChar === charKey(char) ? 'dragging' : ''} ${dragOverChar === charKey(char) ? 'drag-over' : ''}`}
                           draggable={isAdmin}
-                          onDragStart={(e) => handleCharDragStart(e, char.name)}
-                          onDragOver={(e) => handleCharDragOver(e, char.name)}
+                          onDragStart={(e) => handleCharDragStart(e, charKey(char))}
+                          onDragOver={(e) => handleCharDragOver(e, charKey(char))}
                           onDragLeave={handleCharDragLeave}
-                          onDrop={() => handleCharDrop(char.name)}
+                          onDrop={() => handleCharDrop(charKey(char))}
                           onDragEnd={handleCharDragEnd}
                         >
                           <span className="char-drag-handle">⋮⋮</span>
@@ -1892,6 +2024,45 @@ function App() {
             </label>
           </div>
 
+          <div className="header-search">
+            <input
+              type="search"
+              className="header-search-input"
+              placeholder="Поиск: возражение, вопрос, характеристика…"
+              value={searchQuery}
+              onChange={(e) => setSearchQuery(e.target.value)}
+              onKeyDown={(e) => { if (e.key === 'Escape') setSearchQuery('') }}
+            />
+            {searchResults && (
+              <div className="search-results">
+                {searchResults.results.length === 0 && (
+                  <div className="search-empty">Ничего не найдено</div>
+                )}
+                {searchResults.results.map(result => (
+                  <button
+                    key={result.id || result.характеристика}
+                    className="search-result"
+                    onClick={() => openSearchResult(result)}
+                  >
+                    <span className="search-result-title">
+                      {result.характеристика}
+                      <span className="search-result-section">{result.раздел}</span>
+                    </span>
+                    {result.highlights.filter(h => h.field !== 'характеристика').slice(0, 2).map((h, i) => (
+                      <span key={i} className="search-result-snippet">
+                        <span className="search-result-field">{h.plan || SEARCH_FIELD_LABELS[h.field]}:</span>{' '}
+                        {renderHighlight(h.text, h.matches)}
+                      </span>
+                    ))}
+                  </button>
+                ))}
+                {searchResults.total > searchResults.results.length && (
+                  <div className="search-empty">Показаны {searchResults.results.length} из {searchResults.total}</div>
+                )}
+              </div>
+            )}
+          </div>
+
           <div className="header-user">
             <span className="user-name">{user?.username}</span>
             {user?.role === 'admin' && (
@@ -2066,7 +2237,7 @@ function App() {
                         )}
                         {allPlans.map(plan => (
                           <td key={plan.название} className={`cell-plan section-header-cell sticky-header-cell`}>
-                            {formatValue(char.значения[plan.название], char, plan.название, allPlans)}
+                            {formatValue(char.значения[plan.название], char, plan.название)}
                           </td>
                         ))}
                       </tr>
@@ -2178,7 +2349,7 @@ function App() {
                             key={plan.название} 
                             className={`cell-plan ${isHeader ? 'section-header-cell' : ''}`}
                           >
-                            {formatValue(char.значения[plan.название], char, plan.название, allPlans)}
+                            {formatValue(char.значения[plan.название], char, plan.название)}
                           </td>
                         ))}
                       </tr>